@@ -0,0 +1 @@
+"""Load and latency benchmarks of the api, run with `python -m benchmarks`."""
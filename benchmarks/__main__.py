@@ -0,0 +1,106 @@
+"""
+Run the api benchmarks.
+
+    python -m benchmarks --users 50 --notes-per-user 200 --concurrency 1 8 32
+
+The benchmarks create their own database, seed it, send the requests of
+each scenario at each concurrency level, write the results as JSON and
+exit with status 1 when a result regresses past the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=20, help='Number of seeded users.')
+    parser.add_argument('--notes-per-user', type=int, default=100, help='Number of seeded notes of each user.')
+    parser.add_argument('--words-per-note', type=int, default=20, help='Number of words of each seeded note.')
+    parser.add_argument(
+        '--scenarios',
+        nargs='+',
+        default=['list', 'detail', 'search', 'share', 'signup', 'login'],
+        help='Scenarios to run.',
+    )
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help='Numbers of concurrent clients.')
+    parser.add_argument('--requests', type=int, default=200, help='Number of measured requests of each run.')
+    parser.add_argument('--warmup', type=int, default=20, help='Number of requests sent before each run.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random data and requests.')
+    parser.add_argument('--output', default='benchmark-results.json', help='File of the JSON results.')
+    parser.add_argument('--baseline', default=str(BASELINE), help='File of the JSON baseline.')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.25,
+        help='Allowed relative difference of the latency and throughput with the baseline.',
+    )
+    parser.add_argument('--save-baseline', action='store_true', help='Save the results as the new baseline.')
+    parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database after the run.')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+    import django
+    django.setup()
+
+    from benchmarks import harness
+
+    unknown = set(args.scenarios) - set(harness.SCENARIOS)
+    if unknown:
+        sys.exit('Unknown scenarios: {0}'.format(', '.join(sorted(unknown))))
+
+    with harness.benchmark_database(args.keepdb):
+        data = harness.seed(args.users, args.notes_per_user, args.words_per_note, args.seed)
+        results = []
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                result = harness.run_scenario(
+                    name, data, concurrency, args.requests, args.warmup, args.seed,
+                )
+                results.append(result)
+                print(
+                    '{scenario:<8} x{concurrency:<4} p50 {p50_ms:>9.2f} ms  p95 {p95_ms:>9.2f} ms  '
+                    'p99 {p99_ms:>9.2f} ms  {throughput_rps:>9.1f} rps  '
+                    '{queries_mean:>5.1f} queries  {errors} errors'.format(**vars(result)),
+                )
+
+    report = harness.as_json(results, {
+        'users': args.users,
+        'notes_per_user': args.notes_per_user,
+        'words_per_note': args.words_per_note,
+        'requests': args.requests,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+    })
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(report, indent=2))
+        print('Saved the baseline {0}'.format(args.baseline))
+        return 0
+
+    baseline = Path(args.baseline)
+    if not baseline.exists():
+        print('No baseline {0}, nothing to compare'.format(baseline))
+        return 0
+    regressions = harness.compare(
+        report['results'],
+        json.loads(baseline.read_text())['results'],
+        args.tolerance,
+    )
+    for regression in regressions:
+        print('REGRESSION {0}'.format(regression))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
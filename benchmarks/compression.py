@@ -0,0 +1,128 @@
+"""
+Compare the compression of the note lists by payload size.
+
+    python -m benchmarks.compression --sizes 1 10 100 1000 10000
+
+Each payload is the JSON of the first notes of the fast read path, as
+sent by the note list. It is compressed in each available encoding, at
+its level of `COMPRESSION_LEVELS`: bytes on the wire against CPU time.
+"""
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+@dataclass
+class CompressionResult:
+    """Measures of one encoding of a payload over the repeats of a run."""
+
+    encoding: str
+    notes: int
+    size: int
+    compressed_size: int
+    best_ms: float
+    mean_ms: float
+
+
+def payload(notes: int) -> bytes:
+    """Render the JSON of the first notes of the database."""
+    from core.metrics import TimedJSONRenderer
+    from notes.models import Note
+    from notes.serializers import NoteSerializer
+
+    rows = NoteSerializer.as_values(Note.objects.order_by('id'))[:notes]
+    return TimedJSONRenderer().render(list(rows))
+
+
+def measure(encodings: List[str], sizes: List[int], repeat: int) -> List[CompressionResult]:
+    """
+    Time the compression of the payloads of the notes of the database.
+
+    Args:
+        encodings: names of the encodings of `core.compression.available_codecs()`
+        sizes: numbers of notes of the payloads
+        repeat: number of timed runs of each encoding, after one warmup run
+
+    Returns:
+        the best and mean time of each encoding of each payload, with its sizes
+    """
+    from core import compression
+
+    results = []
+    for notes in sizes:
+        data = payload(notes)
+        for encoding in encodings:
+            codec = compression.get_codec(encoding)
+            compressed_size = len(codec.compress(data))
+            durations = []
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                codec.compress(data)
+                durations.append((time.perf_counter() - start_time) * 1000)
+            results.append(CompressionResult(
+                encoding=encoding,
+                notes=notes,
+                size=len(data),
+                compressed_size=compressed_size,
+                best_ms=min(durations),
+                mean_ms=sum(durations) / len(durations),
+            ))
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.compression',
+        description=__doc__.split('\n\n')[0],
+    )
+    parser.add_argument(
+        '--sizes',
+        type=int,
+        nargs='+',
+        default=[1, 10, 100, 1000, 10000],
+        help='Numbers of notes of the payloads.',
+    )
+    parser.add_argument('--words-per-note', type=int, default=20, help='Number of words of each seeded note.')
+    parser.add_argument('--encodings', nargs='+', help='Encodings to compare, by default the available ones.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs of each encoding.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random data.')
+    parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database after the run.')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+    import django
+    django.setup()
+
+    from benchmarks import harness
+    from core import compression
+
+    encodings = args.encodings or list(compression.available_codecs())
+    unknown = set(encodings) - set(compression.available_codecs())
+    if unknown:
+        sys.exit('Unavailable encodings: {0}'.format(', '.join(sorted(unknown))))
+
+    with harness.benchmark_database(args.keepdb):
+        harness.seed(1, max(args.sizes), args.words_per_note, args.seed)
+        results = measure(encodings, sorted(args.sizes), args.repeat)
+
+    for result in results:
+        print(
+            '{encoding:<5} {notes:>6} notes  {size:>10} -> {compressed_size:>9} bytes  x{ratio:>5.2f}  '
+            'best {best_ms:>8.3f} ms  mean {mean_ms:>8.3f} ms  {throughput:>7.1f} MB/s'.format(
+                ratio=result.size / result.compressed_size,
+                throughput=result.size / 1000 / max(result.best_ms, 1e-6),
+                **vars(result),
+            ),
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,437 @@
+"""Seeding, scenarios, measures and baseline comparison of the api benchmarks."""
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from notes import search
+from notes.models import Note
+
+PASSWORD = 'bench-password'
+
+WORDS = (
+    'alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel',
+    'india', 'juliett', 'kilo', 'lima', 'mike', 'november', 'oscar', 'papa',
+    'quebec', 'romeo', 'sierra', 'tango', 'uniform', 'victor', 'whiskey',
+    'xray', 'yankee', 'zulu',
+)
+
+
+@dataclass
+class Dataset:
+    """The seeded users, with their tokens and the ids of their notes."""
+
+    usernames: List[str]
+    tokens: List[str]
+    note_ids: List[List[int]]
+
+
+@contextmanager
+def benchmark_database(keepdb: bool = False) -> Iterator[None]:
+    """
+    Run a benchmark on its own database, created and destroyed like a test database.
+
+    Args:
+        keepdb: keep the database after the run
+    """
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+def seed(users: int, notes_per_user: int, words_per_note: int = 20, seed: int = 0) -> Dataset:
+    """
+    Create the users, their tokens and notes of a benchmark.
+
+    Args:
+        users: number of users
+        notes_per_user: number of notes of each user
+        words_per_note: number of words of each note
+        seed: seed of the random contents
+
+    Returns:
+        the seeded dataset
+    """
+    rng = random.Random(seed)
+    # Hash the password once, hashing it for each user would dominate the seeding.
+    password = make_password(PASSWORD)
+    usernames = ['bench_user_{index}'.format(index=index) for index in range(users)]
+    User.objects.bulk_create(
+        [
+            User(username=username, email='{0}@bench.test'.format(username), password=password)
+            for username in usernames
+        ],
+        batch_size=1000,
+    )
+    user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+    Token.objects.bulk_create(
+        [Token(key=Token.generate_key(), user_id=user_ids[username]) for username in usernames],
+        batch_size=1000,
+    )
+    tokens = dict(Token.objects.values_list('user_id', 'key'))
+
+    for username in usernames:
+        Note.objects.bulk_create(
+            [
+                Note(
+                    user_id=user_ids[username],
+                    content=' '.join(rng.choice(WORDS) for _ in range(words_per_note)),
+                )
+                for _ in range(notes_per_user)
+            ],
+            batch_size=1000,
+        )
+    search.get_backend().rebuild()
+
+    note_ids: Dict[int, List[int]] = {}
+    for note_id, user_id in Note.objects.values_list('id', 'user_id').order_by('id'):
+        note_ids.setdefault(user_id, []).append(note_id)
+    return Dataset(
+        usernames=usernames,
+        tokens=[tokens[user_ids[username]] for username in usernames],
+        note_ids=[note_ids.get(user_ids[username], []) for username in usernames],
+    )
+
+
+# A scenario builds a request from a random generator, the dataset and a
+# unique sequence number: (method, path, data, token or None).
+Request = Tuple[str, str, Optional[dict], Optional[str]]
+Scenario = Callable[[random.Random, Dataset, int], Request]
+
+# Sequence numbers are unique across the runs, e.g. for the signup usernames.
+_numbers = itertools.count()
+_numbers_lock = threading.Lock()
+
+
+def note_list(rng: random.Random, data: Dataset, number: int) -> Request:
+    """GET the note list of a random user."""
+    user = rng.randrange(len(data.usernames))
+    return 'get', reverse('notes:notes-notes'), None, data.tokens[user]
+
+
+def note_detail(rng: random.Random, data: Dataset, number: int) -> Request:
+    """GET a random note of a random user."""
+    user = rng.randrange(len(data.usernames))
+    note_id = rng.choice(data.note_ids[user])
+    return 'get', reverse('notes:notes-note', kwargs={'id': note_id}), None, data.tokens[user]
+
+
+def note_search(rng: random.Random, data: Dataset, number: int) -> Request:
+    """GET the search of a random word prefix by a random user."""
+    user = rng.randrange(len(data.usernames))
+    query = rng.choice(WORDS)[:rng.randint(2, 5)]
+    return 'get', reverse('notes:notes-search', kwargs={'query': query}), None, data.tokens[user]
+
+
+def note_share(rng: random.Random, data: Dataset, number: int) -> Request:
+    """POST the share of a random note with another random user."""
+    user, recipient = rng.sample(range(len(data.usernames)), 2)
+    note_id = rng.choice(data.note_ids[user])
+    return (
+        'post',
+        reverse('notes:notes-share', kwargs={'id': note_id}),
+        {'username': data.usernames[recipient]},
+        data.tokens[user],
+    )
+
+
+def signup(rng: random.Random, data: Dataset, number: int) -> Request:
+    """POST the signup of a new user."""
+    username = 'bench_signup_{number}'.format(number=number)
+    return (
+        'post',
+        reverse('users:user-signup'),
+        {
+            'username': username,
+            'email': '{0}@bench.test'.format(username),
+            'password': PASSWORD,
+            'first_name': 'bench',
+            'last_name': 'signup',
+        },
+        None,
+    )
+
+
+def login(rng: random.Random, data: Dataset, number: int) -> Request:
+    """POST the login of a random user with its username."""
+    username = rng.choice(data.usernames)
+    return (
+        'post',
+        reverse('users:user-login'),
+        {'username': username, 'password': PASSWORD},
+        None,
+    )
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    'list': note_list,
+    'detail': note_detail,
+    'search': note_search,
+    'share': note_share,
+    'signup': signup,
+    'login': login,
+}
+
+
+@dataclass
+class Result:
+    """Measures of a scenario at a concurrency level."""
+
+    scenario: str
+    concurrency: int
+    requests: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    throughput_rps: float
+    queries_mean: float
+    queries_max: int
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Get a percentile of values, by the nearest rank method.
+
+    Args:
+        values: the values, not empty
+        percent: the percentile, between 0 and 100
+
+    Returns:
+        the smallest value greater than or equal to `percent` % of the values
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+@dataclass
+class HttpResponse:
+    """Status of a response received by `HttpClient`."""
+
+    status_code: int
+    streaming: bool = False
+
+
+class HttpClient:
+    """Client sending the requests of the scenarios to a running server, like `django.test.Client`."""
+
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url.rstrip('/')
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        data: Optional[dict] = None,
+        content_type: Optional[str] = None,
+        **extra: str,
+    ) -> HttpResponse:
+        headers = {'Content-Type': content_type} if content_type else {}
+        if 'HTTP_AUTHORIZATION' in extra:
+            headers['Authorization'] = extra['HTTP_AUTHORIZATION']
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(data).encode('utf-8') if data is not None else None,
+            headers=headers,
+            method=method.upper(),
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return HttpResponse(response.status)
+        except urllib.error.HTTPError as error:
+            error.read()
+            return HttpResponse(error.code)
+
+    def get(self, path: str, **extra: Any) -> HttpResponse:
+        return self.request('get', path, **extra)
+
+    def post(self, path: str, **extra: Any) -> HttpResponse:
+        return self.request('post', path, **extra)
+
+
+class QueryCounter:
+    """Execute wrapper counting the queries of a database connection."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute: Callable, sql: str, params: Any, many: bool, context: dict) -> Any:
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_scenario(
+    name: str,
+    data: Dataset,
+    concurrency: int,
+    requests: int,
+    warmup: int = 0,
+    seed: int = 0,
+    base_url: Optional[str] = None,
+) -> Result:
+    """
+    Send the requests of a scenario from concurrent clients and measure them.
+
+    The requests go through the whole Django stack in this process, each
+    client thread with its own database connection, or to the server of
+    `base_url`, whose queries are not counted.
+
+    Args:
+        name: name of the scenario, a key of `SCENARIOS`
+        data: the seeded dataset
+        concurrency: number of concurrent clients
+        requests: number of measured requests
+        warmup: number of requests sent before the measures
+        seed: seed of the random requests
+        base_url: url of a running server, e.g. `http://127.0.0.1:8899`
+
+    Returns:
+        the measures of the scenario
+    """
+    scenario = SCENARIOS[name]
+    lock = threading.Lock()
+    latencies: List[float] = []
+    queries: List[int] = []
+    statuses: Dict[str, int] = {}
+
+    def send(client: Any, rng: random.Random, counter: QueryCounter) -> Tuple[float, int, int]:
+        with _numbers_lock:
+            number = next(_numbers)
+        method, path, body, token = scenario(rng, data, number)
+        extra = {'HTTP_AUTHORIZATION': 'Token {key}'.format(key=token)} if token else {}
+        if body is not None:
+            extra.update(data=body, content_type='application/json')
+        counter.count = 0
+        start = time.perf_counter()
+        response = getattr(client, method)(path, **extra)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return time.perf_counter() - start, counter.count, response.status_code
+
+    def worker(index: int, count: int, measured: bool) -> None:
+        client = HttpClient(base_url) if base_url else Client(raise_request_exception=False)
+        rng = random.Random('{seed}:{name}:{index}:{measured}'.format(
+            seed=seed, name=name, index=index, measured=measured,
+        ))
+        counter = QueryCounter()
+        try:
+            with connection.execute_wrapper(counter):
+                for _ in range(count):
+                    latency, query_count, status = send(client, rng, counter)
+                    if measured:
+                        with lock:
+                            latencies.append(latency)
+                            queries.append(query_count)
+                            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        finally:
+            connection.close()
+
+    def run(total: int, measured: bool) -> float:
+        shares = [total // concurrency + (index < total % concurrency) for index in range(concurrency)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [
+                executor.submit(worker, index, count, measured)
+                for index, count in enumerate(shares)
+            ]:
+                future.result()
+        return time.perf_counter() - start
+
+    if warmup:
+        run(warmup, measured=False)
+    elapsed = run(requests, measured=True)
+
+    return Result(
+        scenario=name,
+        concurrency=concurrency,
+        requests=requests,
+        errors=sum(count for status, count in statuses.items() if int(status) >= 400),
+        p50_ms=round(percentile(latencies, 50) * 1000, 3),
+        p95_ms=round(percentile(latencies, 95) * 1000, 3),
+        p99_ms=round(percentile(latencies, 99) * 1000, 3),
+        mean_ms=round(sum(latencies) / len(latencies) * 1000, 3),
+        throughput_rps=round(requests / elapsed, 3),
+        queries_mean=round(sum(queries) / len(queries), 3),
+        queries_max=max(queries),
+        statuses=statuses,
+    )
+
+
+def compare(
+    results: List[dict],
+    baseline: List[dict],
+    tolerance: float,
+) -> List[str]:
+    """
+    Compare results with a baseline.
+
+    A result regresses when it has errors, when its p95 latency is above or
+    its throughput below the baseline by more than the tolerance, or when
+    it runs more queries per request than the baseline.
+
+    Args:
+        results: the results, as saved by `as_json()`
+        baseline: the baseline results, in the same format
+        tolerance: allowed relative difference of latency and throughput, e.g. 0.2
+
+    Returns:
+        a description of each regression, empty if there is none
+    """
+    baselines = {(result['scenario'], result['concurrency']): result for result in baseline}
+    regressions = []
+    for result in results:
+        label = '{scenario} x{concurrency}'.format(**result)
+        if result['errors']:
+            regressions.append('{label}: {errors} errors'.format(label=label, **result))
+        base = baselines.get((result['scenario'], result['concurrency']))
+        if base is None:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append('{label}: p95 {now} ms > baseline {then} ms'.format(
+                label=label, now=result['p95_ms'], then=base['p95_ms'],
+            ))
+        if result['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append('{label}: throughput {now} rps < baseline {then} rps'.format(
+                label=label, now=result['throughput_rps'], then=base['throughput_rps'],
+            ))
+        if result['queries_max'] > base['queries_max']:
+            regressions.append('{label}: {now} queries > baseline {then} queries'.format(
+                label=label, now=result['queries_max'], then=base['queries_max'],
+            ))
+    return regressions
+
+
+def as_json(results: List[Result], meta: dict) -> dict:
+    """Get the machine readable report of results."""
+    return {
+        'meta': {
+            'database': connection.vendor,
+            'notes_cache': settings.CACHES[settings.NOTES_CACHE_ALIAS]['BACKEND'],
+            **meta,
+        },
+        'results': [asdict(result) for result in results],
+    }
@@ -0,0 +1,133 @@
+"""
+Compare the serialization paths of the note lists.
+
+    python -m benchmarks.serialization --notes 10000
+
+Each path reads the same notes from the database and encodes them:
+`NoteSerializer` on the model instances then JSON, the fast read path of
+`NoteSerializer.as_values()` then JSON, the same rows in MessagePack, and
+the summaries of `view=summary` in JSON.
+"""
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class SerializationResult:
+    """Measures of one serialization path over the repeats of a run."""
+
+    path: str
+    notes: int
+    best_ms: float
+    mean_ms: float
+    size: int
+
+
+def serialization_paths() -> Dict[str, Callable[[], bytes]]:
+    """Get the serialization paths of all the notes, by name."""
+    from core.metrics import TimedJSONRenderer
+    from core.renderers import MessagePackRenderer
+    from notes.models import Note
+    from notes.serializers import NoteSerializer, NoteSummarySerializer
+
+    json_renderer = TimedJSONRenderer()
+    msgpack_renderer = MessagePackRenderer()
+    notes = Note.objects.all()
+    return {
+        'serializer+json': lambda: json_renderer.render(NoteSerializer(notes, many=True).data),
+        'values+json': lambda: json_renderer.render(list(NoteSerializer.as_values(notes))),
+        'values+msgpack': lambda: msgpack_renderer.render(list(NoteSerializer.as_values(notes))),
+        'summary+json': lambda: json_renderer.render(
+            [NoteSummarySerializer.represent_row(row) for row in NoteSummarySerializer.as_values(notes)],
+        ),
+    }
+
+
+def measure(paths: List[str], repeat: int) -> List[SerializationResult]:
+    """
+    Time the serialization paths on the notes of the database.
+
+    Args:
+        paths: names of the paths of `serialization_paths()`
+        repeat: number of timed runs of each path, after one warmup run
+
+    Returns:
+        the best and mean time of each path, with the size of its output
+    """
+    from notes.models import Note
+
+    available = serialization_paths()
+    count = Note.objects.count()
+    results = []
+    for path in paths:
+        serialize = available[path]
+        size = len(serialize())
+        durations = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            serialize()
+            durations.append((time.perf_counter() - start_time) * 1000)
+        results.append(SerializationResult(
+            path=path,
+            notes=count,
+            best_ms=min(durations),
+            mean_ms=sum(durations) / len(durations),
+            size=size,
+        ))
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.serialization',
+        description=__doc__.split('\n\n')[0],
+    )
+    parser.add_argument('--notes', type=int, default=10000, help='Number of seeded notes.')
+    parser.add_argument('--words-per-note', type=int, default=20, help='Number of words of each seeded note.')
+    parser.add_argument(
+        '--paths',
+        nargs='+',
+        default=['serializer+json', 'values+json', 'values+msgpack', 'summary+json'],
+        help='Serialization paths to compare.',
+    )
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs of each path.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random data.')
+    parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database after the run.')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+    import django
+    django.setup()
+
+    from benchmarks import harness
+
+    unknown = set(args.paths) - set(serialization_paths())
+    if unknown:
+        sys.exit('Unknown paths: {0}'.format(', '.join(sorted(unknown))))
+
+    with harness.benchmark_database(args.keepdb):
+        harness.seed(1, args.notes, args.words_per_note, args.seed)
+        results = measure(args.paths, args.repeat)
+
+    reference = results[0]
+    for result in results:
+        print(
+            '{path:<16} {notes} notes  best {best_ms:>9.2f} ms  mean {mean_ms:>9.2f} ms  '
+            '{size:>10} bytes  x{speedup:.2f}'.format(
+                speedup=reference.best_ms / result.best_ms,
+                **vars(result),
+            ),
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Compare the development server with the production server.
+
+    python -m benchmarks.servers --servers runserver gunicorn --concurrency 1 8 32
+
+Each server is started on the seeded benchmark database, the requests of
+the scenarios are sent over HTTP, then the server is stopped with SIGTERM,
+the graceful shutdown of gunicorn.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def server_command(server: str, bind: str) -> List[str]:
+    """Get the command line of a server."""
+    if server == 'runserver':
+        return [sys.executable, 'manage.py', 'runserver', '--noreload', bind]
+    return [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py']
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    """Wait until the readiness probe of a server answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('The server exited with status {0}'.format(process.returncode))
+        try:
+            with urllib.request.urlopen(base_url + '/api/ready', timeout=1):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError('The server is not ready after {0} seconds'.format(timeout))
+
+
+def start_server(server: str, port: int, database: str, workers: int) -> subprocess.Popen:
+    """
+    Start a server on the benchmark database.
+
+    Args:
+        server: `runserver` or `gunicorn`
+        port: port of the server on 127.0.0.1
+        database: name of the benchmark database
+        workers: number of gunicorn workers
+
+    Returns:
+        the process of the server, ready
+    """
+    bind = '127.0.0.1:{port}'.format(port=port)
+    env: Dict[str, str] = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': 'benchmarks.settings',
+        'SQL_DATABASE': database,
+        'SERVER_BIND': bind,
+        'SERVER_WORKERS': str(workers),
+    }
+    process = subprocess.Popen(
+        server_command(server, bind),
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready('http://' + bind, process)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.servers', description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--servers',
+        nargs='+',
+        choices=['runserver', 'gunicorn'],
+        default=['runserver', 'gunicorn'],
+        help='Servers to compare.',
+    )
+    parser.add_argument('--workers', type=int, default=4, help='Number of gunicorn workers.')
+    parser.add_argument('--port', type=int, default=8899, help='Port of the servers.')
+    parser.add_argument('--users', type=int, default=20, help='Number of seeded users.')
+    parser.add_argument('--notes-per-user', type=int, default=100, help='Number of seeded notes of each user.')
+    parser.add_argument('--scenarios', nargs='+', default=['list', 'detail', 'search'], help='Scenarios to run.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help='Numbers of concurrent clients.')
+    parser.add_argument('--requests', type=int, default=200, help='Number of measured requests of each run.')
+    parser.add_argument('--warmup', type=int, default=20, help='Number of requests sent before each run.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random data and requests.')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+    import django
+    django.setup()
+
+    from django.db import connection
+
+    from benchmarks import harness
+
+    unknown = set(args.scenarios) - set(harness.SCENARIOS)
+    if unknown:
+        sys.exit('Unknown scenarios: {0}'.format(', '.join(sorted(unknown))))
+
+    with harness.benchmark_database():
+        data = harness.seed(args.users, args.notes_per_user, seed=args.seed)
+        database = str(connection.settings_dict['NAME'])
+        connection.close()
+        for server in args.servers:
+            process = start_server(server, args.port, database, args.workers)
+            try:
+                for name in args.scenarios:
+                    for concurrency in args.concurrency:
+                        result = harness.run_scenario(
+                            name, data, concurrency, args.requests, args.warmup, args.seed,
+                            base_url='http://127.0.0.1:{port}'.format(port=args.port),
+                        )
+                        print(
+                            '{server:<10} {scenario:<8} x{concurrency:<4} p50 {p50_ms:>9.2f} ms  '
+                            'p95 {p95_ms:>9.2f} ms  p99 {p99_ms:>9.2f} ms  {throughput_rps:>9.1f} rps  '
+                            '{errors} errors'.format(server=server, **vars(result)),
+                        )
+            finally:
+                stop_server(process)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
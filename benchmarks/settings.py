@@ -0,0 +1,28 @@
+"""
+Settings of the benchmarks: the project settings on a dedicated database.
+
+The database is the one configured by the SQL_* environment variables
+(SQLite by default, or a local MySQL), the benchmarks create and drop
+their own database `BENCH_DATABASE` next to it.
+"""
+from core.settings import *  # noqa: F401,F403
+
+DATABASES['default']['TEST'] = {
+    'NAME': os.environ.get(
+        "BENCH_DATABASE",
+        os.path.join(BASE_DIR, 'bench.sqlite3')
+        if 'sqlite' in DATABASES['default']['ENGINE'] else 'bench_mydb',
+    ),
+}
+if 'sqlite' in DATABASES['default']['ENGINE']:
+    # Concurrent writers wait for the lock instead of failing at once.
+    DATABASES['default']['OPTIONS'] = {'timeout': 30}
+
+# The throttles would reject most of the benchmark requests.
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {
+        'high': '1000000/second',
+        'low': '1000000/second',
+    },
+}
@@ -0,0 +1,129 @@
+"""
+Compare the storage of large note contents by codec.
+
+    python -m benchmarks.storage --notes 500 --words-per-note 2000
+
+The notes are stored again with each codec by `compress_notes`, then the
+size of the stored contents is measured, with the time to load all the
+notes by the fast read path, and to load and render them in JSON: the
+contents are decompressed when they are rendered.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+
+@dataclass
+class StorageResult:
+    """Measures of the notes stored with one codec."""
+
+    codec: str
+    notes: int
+    stored_size: int
+    load_ms: float
+    read_ms: float
+
+
+def best_ms(function: Callable[[], object], repeat: int) -> float:
+    """Get the best time of a function over its repeats, after one warmup run."""
+    function()
+    durations = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start_time) * 1000)
+    return min(durations)
+
+
+def measure(codecs: List[str], repeat: int) -> List[StorageResult]:
+    """
+    Store the notes of the database with each codec and time their reads.
+
+    Args:
+        codecs: names of the codecs of `notes.fields.available_codecs()`, empty to store as is
+        repeat: number of timed runs of each read
+
+    Returns:
+        the stored size and the read times of each codec
+    """
+    from django.core.management import call_command
+    from django.db.models import Sum, TextField
+    from django.db.models.functions import Cast, Length
+    from django.test.utils import override_settings
+
+    from core.metrics import TimedJSONRenderer
+    from notes.models import Note
+    from notes.serializers import NoteSerializer
+
+    renderer = TimedJSONRenderer()
+    results = []
+    for codec in codecs:
+        with override_settings(NOTES_CONTENT_CODEC=codec):
+            call_command('compress_notes', stdout=io.StringIO())
+            stored_size = Note.objects.aggregate(
+                size=Sum(Length(Cast('content', TextField()))),
+            )['size'] or 0
+            results.append(StorageResult(
+                codec=codec or 'none',
+                notes=Note.objects.count(),
+                stored_size=stored_size,
+                load_ms=best_ms(lambda: list(NoteSerializer.as_values(Note.objects.all())), repeat),
+                read_ms=best_ms(
+                    lambda: renderer.render(list(NoteSerializer.as_values(Note.objects.all()))),
+                    repeat,
+                ),
+            ))
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.storage',
+        description=__doc__.split('\n\n')[0],
+    )
+    parser.add_argument('--notes', type=int, default=500, help='Number of seeded notes.')
+    parser.add_argument('--words-per-note', type=int, default=2000, help='Number of words of each seeded note.')
+    parser.add_argument('--codecs', nargs='+', help='Codecs to compare, by default none and the available ones.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs of each read.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random data.')
+    parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database after the run.')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+    import django
+    django.setup()
+
+    from benchmarks import harness
+    from notes import fields
+
+    codecs = args.codecs or ['', *fields.available_codecs()]
+    unknown = set(codecs) - {'', *fields.available_codecs()}
+    if unknown:
+        sys.exit('Unavailable codecs: {0}'.format(', '.join(sorted(unknown))))
+
+    with harness.benchmark_database(args.keepdb):
+        harness.seed(1, args.notes, args.words_per_note, args.seed)
+        results = measure(codecs, args.repeat)
+
+    reference = results[0]
+    for result in results:
+        print(
+            '{codec:<5} {notes} notes  {stored_size:>11} stored  x{ratio:>5.2f}  '
+            'load {load_ms:>9.2f} ms  load+render {read_ms:>9.2f} ms'.format(
+                ratio=reference.stored_size / max(result.stored_size, 1),
+                **vars(result),
+            ),
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
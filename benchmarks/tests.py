@@ -0,0 +1,96 @@
+import json
+import pytest
+
+from typing import Any
+
+from benchmarks import compression, harness, serialization, storage
+from benchmarks.__main__ import BASELINE
+
+
+class TestBenchmarkHarness:  # unit tests
+    """Test the measures and the baseline comparison of the benchmarks"""
+
+    def test_percentile(self) -> None:
+        """Ensure percentiles use the nearest rank."""
+        values = [float(value) for value in range(1, 101)]
+        assert harness.percentile(values, 50) == 50.0
+        assert harness.percentile(values, 95) == 95.0
+        assert harness.percentile(values, 99) == 99.0
+        assert harness.percentile([3.0], 99) == 3.0
+
+    def test_compare(self) -> None:
+        """Ensure the regressions past the tolerance are reported."""
+        base = {
+            'scenario': 'list', 'concurrency': 8, 'errors': 0,
+            'p95_ms': 10.0, 'throughput_rps': 100.0, 'queries_max': 2,
+        }
+        assert harness.compare([dict(base, p95_ms=11.0)], [base], 0.2) == []
+        regressions = harness.compare(
+            [dict(base, p95_ms=13.0, throughput_rps=70.0, queries_max=3, errors=1)],
+            [base],
+            0.2,
+        )
+        assert len(regressions) == 4
+        assert harness.compare([dict(base, scenario='login')], [base], 0.2) == []
+
+
+@pytest.mark.django_db(transaction=True)
+class TestBenchmarkRun:  # integration tests
+    """Test a small benchmark run, the client threads only see committed data"""
+
+    @pytest.mark.parametrize('name', sorted(harness.SCENARIOS))
+    def test_run_scenario(self, name: str, settings: Any) -> None:
+        """Test every scenario runs without errors."""
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}
+        data = harness.seed(users=3, notes_per_user=2)
+        result = harness.run_scenario(name, data, concurrency=1, requests=4)
+        assert result.requests == 4
+        assert result.errors == 0
+        assert result.queries_max > 0
+
+    @pytest.mark.parametrize('name', sorted(harness.SCENARIOS))
+    def test_baseline_queries(self, name: str, settings: Any) -> None:
+        """Ensure a scenario runs no more queries than its baseline, regenerated with the changes of its queries."""
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}
+        # As `python -m benchmarks`: the jobs are left to the workers, the caches are warm.
+        settings.JOBS_EAGER = False
+        data = harness.seed(users=3, notes_per_user=2)
+        result = harness.run_scenario(name, data, concurrency=1, requests=4, warmup=20)
+        baseline = json.loads(BASELINE.read_text())['results']
+        assert result.queries_max <= max(base['queries_max'] for base in baseline if base['scenario'] == name)
+
+    def test_measure_serialization(self) -> None:
+        """Test the serialization paths encode the same notes."""
+        harness.seed(users=1, notes_per_user=3)
+        results = serialization.measure(sorted(serialization.serialization_paths()), repeat=1)
+        assert [result.notes for result in results] == [3, 3, 3, 3]
+        sizes = {result.path: result.size for result in results}
+        assert sizes['serializer+json'] == sizes['values+json']
+        assert sizes['values+msgpack'] < sizes['values+json']
+
+    def test_measure_compression(self) -> None:
+        """Test the payloads are compressed by size."""
+        harness.seed(users=1, notes_per_user=20)
+        results = compression.measure(['gzip'], [1, 20], repeat=1)
+        assert [result.notes for result in results] == [1, 20]
+        assert results[0].size < results[1].size
+        assert results[1].compressed_size < results[1].size
+
+    def test_measure_storage(self, settings: Any) -> None:
+        """Test the contents are stored smaller with a codec."""
+        settings.NOTES_CONTENT_COMPRESSION_MIN_SIZE = 100
+        harness.seed(users=1, notes_per_user=3, words_per_note=100)
+        results = storage.measure(['', 'zlib'], repeat=1)
+        assert [result.codec for result in results] == ['none', 'zlib']
+        assert results[1].stored_size < results[0].stored_size
+
+    def test_run_scenario_over_http(self, live_server: Any, settings: Any) -> None:
+        """Test a scenario runs against a running server."""
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}
+        data = harness.seed(users=2, notes_per_user=2)
+        result = harness.run_scenario('list', data, concurrency=2, requests=4, base_url=live_server.url)
+        assert result.requests == 4
+        assert result.errors == 0
+        assert result.statuses == {'200': 4}
@@ -1,6 +1,14 @@
+import importlib
+from typing import Any, Iterator
+
 import pytest
+from django.core.cache import caches
+from django.urls import clear_url_caches
 from rest_framework.test import APIClient
 
+from core import throttling
+from users.authentication import token_cache
+
 
 @pytest.fixture()
 def api_client() -> APIClient:
@@ -10,4 +18,49 @@ def api_client() -> APIClient:
     Returns:
         an instance of `APIClient`
     """
-    return APIClient()
\ No newline at end of file
+    return APIClient()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches() -> None:
+    """
+    Clearing all the caches before each test, and the in-process token
+    cache and throttle state.
+
+    The ids of users and notes are reused between tests, so a cached
+    response of a previous test could be served otherwise.
+    """
+    for cache in caches.all():
+        cache.clear()
+    token_cache.clear()
+    throttling.local_state.clear()
+
+
+@pytest.fixture(autouse=True)
+def eager_jobs(settings: Any) -> None:
+    """
+    Running the background jobs in the process enqueueing them.
+
+    The api tests see the side effects of the writes without a worker,
+    the tests of the queue turn it off.
+    """
+    settings.JOBS_EAGER = True
+
+
+@pytest.fixture()
+def async_views(settings: Any) -> Iterator[None]:
+    """
+    Routing the api to the async views during a test.
+
+    The urls are chosen when `core.urls` is imported, so it is reloaded
+    with `ASYNC_VIEWS` set, then again without it after the test.
+    """
+    def reload_urls() -> None:
+        importlib.reload(importlib.import_module('core.urls'))
+        clear_url_caches()
+
+    settings.ASYNC_VIEWS = True
+    reload_urls()
+    yield
+    settings.ASYNC_VIEWS = False
+    reload_urls()
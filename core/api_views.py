@@ -0,0 +1,84 @@
+import logging
+from typing import Any
+
+from django.db import DatabaseError, connections
+
+from rest_framework import status
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsApiView(APIView):
+    """Api view for the request metrics of this process"""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests from `api/metrics`.
+
+        Args:
+            request: Http request.
+
+        Returns:
+            Http response with the request counts, query counts and timing
+            histograms of this process, by view name.
+        """
+        return Response(metrics.registry.snapshot())
+
+
+class HealthApiView(APIView):
+    """Api view for the liveness probe: the process serves requests"""
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = []
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests from `api/health`.
+
+        Args:
+            request: Http request.
+
+        Returns:
+            Http response with the status `ok`, without any query.
+        """
+        return Response({'status': 'ok'})
+
+
+class ReadyApiView(HealthApiView):
+    """Api view for the readiness probe: the process can reach its databases"""
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests from `api/ready`.
+
+        Args:
+            request: Http request.
+
+        Returns:
+            Http response with the status of each database, 503 if one of
+            them is unreachable. The errors are only logged, the probe is
+            anonymous.
+        """
+        databases = {}
+        for connection in connections.all():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                databases[connection.alias] = 'ok'
+            except DatabaseError:
+                logger.exception('The database %s is unreachable.', connection.alias)
+                databases[connection.alias] = 'unavailable'
+        ready = all(database == 'ok' for database in databases.values())
+        return Response(
+            {'status': 'ok' if ready else 'unavailable', 'databases': databases},
+            status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
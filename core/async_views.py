@@ -0,0 +1,77 @@
+"""Base of the api views with coroutine handlers, served under ASGI."""
+import asyncio
+from typing import Any
+
+from asgiref.sync import sync_to_async
+
+from django.db.models import Model, QuerySet
+from django.http import Http404, HttpRequest
+from django.http.response import HttpResponseBase
+
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    `APIView` whose handlers are coroutines.
+
+    Django serves the view without a thread when all its handlers are
+    coroutines. Authentication, permissions and throttling still are
+    synchronous in Django REST framework: they run in a thread before the
+    handler, so the handler finds `request.user` already loaded.
+    """
+
+    async def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        """
+        Async version of `APIView.dispatch()`.
+
+        Args:
+            request: Http request
+            args: varied amount of non-keyword arguments
+            kwargs: varied amount of keyword arguments
+
+        Returns:
+            Http response of the handler
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+async def aget_object_or_404(queryset: QuerySet, **kwargs: Any) -> Model:
+    """
+    Async version of `rest_framework.generics.get_object_or_404()`.
+
+    Args:
+        queryset: the queryset to get the object from
+        kwargs: the lookup of the object
+
+    Raises:
+        Http404: If the object does not exist or the lookup is invalid.
+
+    Returns:
+        the model instance
+    """
+    try:
+        return await queryset.aget(**kwargs)
+    except (queryset.model.DoesNotExist, TypeError, ValueError):
+        raise Http404
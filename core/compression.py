@@ -0,0 +1,187 @@
+"""
+Compression of the responses, negotiated with `Accept-Encoding`.
+
+gzip is always available, brotli (`br`) and zstandard (`zstd`) when the
+`brotli` and `zstandard` packages are installed. The encoding is the one
+with the highest quality for the client, by `COMPRESSION_ENCODINGS` order
+between equals. The bodies under `COMPRESSION_MIN_SIZE` bytes are sent as
+is: their headers outweigh the saving. The streamed responses are
+compressed chunk by chunk, each chunk is flushed so the client still gets
+the notes as they are read.
+"""
+import gzip
+import re
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Type
+
+from django.conf import settings
+from django.http import HttpRequest
+from django.http.response import HttpResponseBase
+from django.utils.cache import patch_vary_headers
+
+from core.metrics import timer
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+class Codec:
+    """Compression of the bodies in one content encoding."""
+
+    name = ''
+    default_level = 0
+
+    def __init__(self, level: Optional[int] = None) -> None:
+        self.level = self.default_level if level is None else level
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Compress a sequence of chunks, flushing the output of each chunk."""
+        raise NotImplementedError
+
+
+class GzipCodec(Codec):
+    name = 'gzip'
+    # Level 6 compresses the pages of notes 10% smaller at 4 times the CPU time.
+    default_level = 4
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+class BrotliCodec(Codec):
+    name = 'br'
+    default_level = 4
+
+    def compress(self, data: bytes) -> bytes:
+        return brotli.compress(data, quality=self.level)
+
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        compressor = brotli.Compressor(quality=self.level)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class ZstdCodec(Codec):
+    name = 'zstd'
+    default_level = 3
+
+    def compress(self, data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def available_codecs() -> Dict[str, Type[Codec]]:
+    """Get the codecs whose package is installed, by encoding name."""
+    codecs: List[Type[Codec]] = [GzipCodec]
+    if brotli is not None:
+        codecs.append(BrotliCodec)
+    if zstandard is not None:
+        codecs.append(ZstdCodec)
+    return {codec.name: codec for codec in codecs}
+
+
+def get_codec(name: str) -> Codec:
+    """Get the codec of an encoding, at its level of `COMPRESSION_LEVELS`."""
+    return available_codecs()[name](settings.COMPRESSION_LEVELS.get(name))
+
+
+def select_encoding(accept_encoding: str, encodings: Iterable[str]) -> Optional[str]:
+    """
+    Select the encoding of a response from the `Accept-Encoding` of its request.
+
+    Args:
+        accept_encoding: the header value, e.g. `gzip, br;q=0.9, *;q=0`
+        encodings: the encodings of the server, by preference
+
+    Returns:
+        the accepted encoding of the highest quality, None to send the body as is
+    """
+    qualities: Dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        match = re.search(r'q=([0-9.]+)', params)
+        try:
+            qualities[name] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            qualities[name] = 0.0
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_response(request: HttpRequest, response: HttpResponseBase) -> HttpResponseBase:
+    """
+    Compress the body of a response in the encoding negotiated with its request.
+
+    Args:
+        request: Http request, with its `Accept-Encoding`
+        response: Http response, compressed in place
+
+    Returns:
+        the response
+    """
+    if (
+        response.has_header('Content-Encoding')
+        or response.status_code in (204, 304)
+        or 'no-transform' in response.get('Cache-Control', '')
+        or not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE
+    ):
+        return response
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encodings = [name for name in settings.COMPRESSION_ENCODINGS if name in available_codecs()]
+    encoding = select_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), encodings)
+    if encoding is None:
+        return response
+
+    codec = get_codec(encoding)
+    if response.streaming:
+        response.streaming_content = codec.compress_stream(response.streaming_content)
+        del response['Content-Length']
+    else:
+        with timer('compress'):
+            content = codec.compress(response.content)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+
+    # The compressed body is not the byte-for-byte representation of the ETag.
+    if response.has_header('ETag') and not response['ETag'].startswith('W/'):
+        response['ETag'] = 'W/' + response['ETag']
+    response['Content-Encoding'] = encoding
+    return response
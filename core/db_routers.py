@@ -0,0 +1,75 @@
+"""
+Routing of the queries between the primary database and its read replicas.
+
+`core.middleware.replica_routing_middleware` pins each request: the safe
+requests (GET, HEAD, OPTIONS), e.g. the note list, detail and search,
+read from a replica, the others and every write use the primary. After a
+write, the requests of the same client stay on the primary for
+`SQL_REPLICA_STICKY_SECONDS`, so the client reads its own writes while
+the replicas catch up.
+"""
+import contextvars
+import hashlib
+import random
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.models import Model
+from django.http import HttpRequest
+
+PRIMARY = 'default'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_use_primary: contextvars.ContextVar[bool] = contextvars.ContextVar('use_primary', default=True)
+
+
+def use_primary(value: bool) -> contextvars.Token:
+    """Pin the queries of the current context to the primary, or let them read from a replica."""
+    return _use_primary.set(value)
+
+
+def reset(token: contextvars.Token) -> None:
+    """Reset the pin set by `use_primary()`."""
+    _use_primary.reset(token)
+
+
+def _sticky_key(request: HttpRequest) -> Optional[str]:
+    credentials = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return 'db:sticky:{digest}'.format(digest=hashlib.md5(credentials.encode('utf-8')).hexdigest())
+
+
+def is_sticky(request: HttpRequest) -> bool:
+    """Check if the client of a request wrote recently."""
+    key = _sticky_key(request)
+    return key is not None and caches[settings.SQL_REPLICA_STICKY_CACHE_ALIAS].get(key) is not None
+
+
+def stick(request: HttpRequest) -> None:
+    """Keep the reads of the client of a request on the primary for `SQL_REPLICA_STICKY_SECONDS`."""
+    key = _sticky_key(request)
+    if key is not None:
+        caches[settings.SQL_REPLICA_STICKY_CACHE_ALIAS].set(key, 1, settings.SQL_REPLICA_STICKY_SECONDS)
+
+
+class PrimaryReplicaRouter:
+    """Database router of the reads to `DATABASE_REPLICAS`, and the writes to the primary."""
+
+    def db_for_read(self, model: type, **hints: Any) -> str:
+        # The reads of a transaction see its writes only on the primary.
+        if _use_primary.get() or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model: type, **hints: Any) -> str:
+        return PRIMARY
+
+    def allow_relation(self, obj1: Model, obj2: Model, **hints: Any) -> bool:
+        # The replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, model_name: Optional[str] = None, **hints: Any) -> bool:
+        return db == PRIMARY
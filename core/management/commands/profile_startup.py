@@ -0,0 +1,178 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+# Run in a new interpreter: the startup of a worker up to its first
+# response, then its requests to the liveness probe with and without the
+# middlewares. The requests are WSGI calls, the test client would add its
+# own imports.
+WORKER_SCRIPT = '''
+import io, json, sys, time
+
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+setup = time.perf_counter()
+
+
+def call(handler):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/health', 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+    }
+    statuses = []
+    response = handler(environ, lambda status, headers: statuses.append(status))
+    b''.join(response)
+    response.close()
+    if not statuses[0].startswith('200'):
+        raise SystemExit('GET /api/health: ' + statuses[0])
+
+
+def measure(handler, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        call(handler)
+    return (time.perf_counter() - start) * 1000 / count
+
+
+call(application)
+first_request = time.perf_counter()
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+count = int(sys.argv[1])
+measure(application, min(count, 100))
+request_ms = measure(application, count)
+settings.MIDDLEWARE = []
+bare = WSGIHandler()
+measure(bare, min(count, 100))
+bare_ms = measure(bare, count)
+print(json.dumps({
+    'setup_ms': (setup - start) * 1000,
+    'first_request_ms': (first_request - setup) * 1000,
+    'request_ms': request_ms,
+    'middleware_ms': request_ms - bare_ms,
+}))
+'''
+
+
+class Import(NamedTuple):
+    name: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_import_times(output: str) -> List[Import]:
+    """
+    Parse the report of `python -X importtime`.
+
+    Args:
+        output: the standard error of the interpreter
+
+    Returns:
+        the imported modules, in the order of the report
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except (IndexError, ValueError):
+            # The header line.
+            continue
+        imports.append(Import(fields[2].strip(), self_us, cumulative_us))
+    return imports
+
+
+class Command(BaseCommand):
+    """Profile the startup of the workers."""
+
+    help = (
+        'Start a worker on each settings module, e.g. core.settings and core.settings_api, '
+        'and report its cold start time, up to its first response, its slowest imports, '
+        'and the time of a request to the liveness probe and of its middlewares.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            'modules',
+            nargs='*',
+            help='The settings modules, by default the current one.',
+        )
+        parser.add_argument('--runs', type=int, default=5, help='Number of started workers per module.')
+        parser.add_argument('--requests', type=int, default=1000, help='Number of measured requests per worker.')
+        parser.add_argument('--top', type=int, default=15, help='Number of reported imports.')
+        parser.add_argument(
+            '--sort',
+            choices=['cumulative', 'self'],
+            default='self',
+            help='Rank the imports by their time with or without the modules they import.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['runs'] < 1 or options['requests'] < 1:
+            raise CommandError('--runs and --requests must be positive.')
+        for module in options['modules'] or [os.environ['DJANGO_SETTINGS_MODULE']]:
+            runs = [self.start_worker(module, options['requests'])[0] for _ in range(options['runs'])]
+            timings = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+            self.stdout.write(self.style.SUCCESS(
+                '{module}: cold start {cold_start:.1f} ms (setup {setup_ms:.1f} ms, first request '
+                '{first_request_ms:.1f} ms), request {request_ms:.3f} ms, middlewares {middleware_ms:.3f} ms'.format(
+                    module=module,
+                    cold_start=timings['setup_ms'] + timings['first_request_ms'],
+                    **timings,
+                ),
+            ))
+            # -X importtime slows the imports down: one more worker reports them.
+            _, imports = self.start_worker(module, options['requests'], import_times=True)
+            self.stdout.write('  {count} modules imported, slowest by {sort} time:'.format(
+                count=len(imports), sort=options['sort'],
+            ))
+            key = 'cumulative_us' if options['sort'] == 'cumulative' else 'self_us'
+            for module_import in sorted(imports, key=lambda item: getattr(item, key), reverse=True)[:options['top']]:
+                self.stdout.write('  {time:>9.1f} ms  {name}'.format(
+                    time=getattr(module_import, key) / 1000, name=module_import.name,
+                ))
+
+    @staticmethod
+    def start_worker(
+        module: str,
+        requests: int,
+        import_times: bool = False,
+    ) -> Tuple[Dict[str, float], List[Import]]:
+        """
+        Start a worker on a settings module in a new interpreter.
+
+        Args:
+            module: the settings module
+            requests: the number of measured requests
+            import_times: whether to report the imports, with `-X importtime`
+
+        Returns:
+            the timings of the worker, and its imports if reported
+
+        Raises:
+            CommandError: the worker failed
+        """
+        options = ['-X', 'importtime'] if import_times else []
+        process = subprocess.run(
+            [sys.executable, *options, '-c', WORKER_SCRIPT, str(requests)],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': module},
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            errors = [line for line in process.stderr.splitlines() if not line.startswith('import time:')]
+            raise CommandError('The worker on {module} failed: {error}'.format(module=module, error='\n'.join(errors)))
+        return json.loads(process.stdout.splitlines()[-1]), parse_import_times(process.stderr)
@@ -0,0 +1,216 @@
+"""
+Per-request timings of the api, aggregated in process by view.
+
+`core.middleware.request_metrics_middleware` starts the measures of each
+request. The SQL queries are counted by an execute wrapper installed on
+every database connection, the serializers, the renderer and the
+throttles of Django REST framework time themselves with `timer()`.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+from rest_framework import renderers
+
+# Upper bounds of the histogram buckets, in milliseconds.
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@dataclass
+class RequestMetrics:
+    """Measures of one request."""
+
+    sql_count: int = 0
+    sql_ms: float = 0.0
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+
+    def add(self, name: str, duration_ms: float) -> None:
+        self.timings_ms[name] = self.timings_ms.get(name, 0.0) + duration_ms
+
+
+_current: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    'request_metrics', default=None,
+)
+# Set while a serializer is timed, so nested serializers are not counted twice.
+_in_serializer: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    'in_serializer', default=False,
+)
+
+
+def start() -> contextvars.Token:
+    """Start the measures of a request in the current context."""
+    return _current.set(RequestMetrics())
+
+
+def current() -> Optional[RequestMetrics]:
+    """Get the measures of the current request, None outside of a request."""
+    return _current.get()
+
+
+def stop(token: contextvars.Token) -> None:
+    """Stop the measures started by `start()`."""
+    _current.reset(token)
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """
+    Add the duration of a block to a timing of the current request.
+
+    Args:
+        name: name of the timing, e.g. `serializer`
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, (time.perf_counter() - start_time) * 1000)
+
+
+def record_query(execute: Callable, sql: str, params: Any, many: bool, context: dict) -> Any:
+    """Execute wrapper counting and timing the SQL queries of the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start_time = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_count += 1
+        metrics.sql_ms += (time.perf_counter() - start_time) * 1000
+
+
+def install_query_recorder(connection: BaseDatabaseWrapper, **kwargs: Any) -> None:
+    """Install `record_query()` on a database connection, once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    """Counts of durations in the buckets of `BUCKETS_MS`, plus their count and sum."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, quantile: float) -> Optional[float]:
+        """Get the upper bound of the bucket of a quantile, None above the last bucket."""
+        rank = quantile * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative: List[int] = []
+        for count in self.counts[:-1]:
+            cumulative.append((cumulative[-1] if cumulative else 0) + count)
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'mean': round(self.sum / self.count, 3) if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([str(bound) for bound in BUCKETS_MS] + ['+Inf'], cumulative + [self.count])),
+        }
+
+
+class Registry:
+    """Thread safe aggregates of the request measures, by view name."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._views: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, view_name: str, status_code: int, total_ms: float, metrics: RequestMetrics) -> None:
+        values = {'total': total_ms, 'sql': metrics.sql_ms, **metrics.timings_ms}
+        with self._lock:
+            view = self._views.setdefault(view_name, {
+                'requests': 0,
+                'statuses': {},
+                'queries': Histogram(),
+                'timings': {},
+            })
+            view['requests'] += 1
+            status = '{0}xx'.format(status_code // 100)
+            view['statuses'][status] = view['statuses'].get(status, 0) + 1
+            # Query counts share the buckets of the durations.
+            view['queries'].observe(metrics.sql_count)
+            for name, value in values.items():
+                view['timings'].setdefault(name, Histogram()).observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the aggregates.
+
+        Returns:
+            by view name, the number of requests, their status classes, the
+            histogram of their SQL query counts and the histograms of their
+            timings in milliseconds
+        """
+        with self._lock:
+            return {
+                view_name: {
+                    'requests': view['requests'],
+                    'statuses': dict(view['statuses']),
+                    'queries': view['queries'].snapshot(),
+                    'timings_ms': {
+                        name: histogram.snapshot() for name, histogram in view['timings'].items()
+                    },
+                }
+                for view_name, view in self._views.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._views.clear()
+
+
+registry = Registry()
+
+
+class TimedSerializerMixin:
+    """Serializer mixin adding its validation and representation times to `serializer`."""
+
+    def _timed(self, method: Callable, *args: Any) -> Any:
+        if _in_serializer.get():
+            return method(*args)
+        token = _in_serializer.set(True)
+        try:
+            with timer('serializer'):
+                return method(*args)
+        finally:
+            _in_serializer.reset(token)
+
+    def run_validation(self, *args: Any) -> Any:
+        return self._timed(super().run_validation, *args)
+
+    def to_representation(self, instance: Any) -> Any:
+        return self._timed(super().to_representation, instance)
+
+
+class TimedJSONRenderer(renderers.JSONRenderer):
+    """`JSONRenderer` adding its time to `render`."""
+
+    def render(self, *args: Any, **kwargs: Any) -> bytes:
+        with timer('render'):
+            return super().render(*args, **kwargs)
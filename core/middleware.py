@@ -0,0 +1,155 @@
+"""Project middlewares."""
+import asyncio
+import time
+from typing import Callable
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest
+from django.http.response import HttpResponseBase
+from django.utils.decorators import sync_and_async_middleware
+
+from core import compression, db_routers, metrics
+
+connection_created.connect(metrics.install_query_recorder)
+
+
+def _server_timing(total_ms: float, request_metrics: metrics.RequestMetrics) -> str:
+    entries = [
+        'sql;dur={dur:.3f};desc="{count} queries"'.format(
+            dur=request_metrics.sql_ms,
+            count=request_metrics.sql_count,
+        ),
+    ]
+    entries += [
+        '{name};dur={dur:.3f}'.format(name=name, dur=duration)
+        for name, duration in request_metrics.timings_ms.items()
+    ]
+    entries.append('total;dur={dur:.3f}'.format(dur=total_ms))
+    return ', '.join(entries)
+
+
+def _send_server_timing(request: HttpRequest) -> bool:
+    if not settings.REQUEST_METRICS_SERVER_TIMING:
+        return False
+    # The timings tell the queries of the views apart: only for the staff in production.
+    user = getattr(request, 'user', None)
+    return settings.DEBUG or (user is not None and user.is_staff)
+
+
+def _finish(
+    request: HttpRequest,
+    response: HttpResponseBase,
+    start_time: float,
+    request_metrics: metrics.RequestMetrics,
+    server_timing: bool,
+) -> None:
+    total_ms = (time.perf_counter() - start_time) * 1000
+    match = request.resolver_match
+    view_name = match.view_name if match else '<unresolved>'
+    metrics.registry.record(view_name, response.status_code, total_ms, request_metrics)
+    if server_timing:
+        response['Server-Timing'] = _server_timing(total_ms, request_metrics)
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response: Callable) -> Callable:
+    """
+    Measure each request: its SQL queries, the time of the serializers, the
+    renderer and the throttles of Django REST framework, and its wall time.
+
+    The measures are aggregated by view name in `core.metrics.registry` and,
+    with `REQUEST_METRICS_SERVER_TIMING`, sent to the staff users in the
+    `Server-Timing` header.
+    The content of streaming responses is produced after the measures.
+    """
+    for connection in connections.all():
+        metrics.install_query_recorder(connection)
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request: HttpRequest) -> HttpResponseBase:
+            start_time = time.perf_counter()
+            token = metrics.start()
+            try:
+                response = await get_response(request)
+                # The user of the session may not be loaded yet.
+                server_timing = bool(settings.REQUEST_METRICS_SERVER_TIMING) and await sync_to_async(
+                    _send_server_timing,
+                )(request)
+                _finish(request, response, start_time, metrics.current(), server_timing)
+            finally:
+                metrics.stop(token)
+            return response
+    else:
+        def middleware(request: HttpRequest) -> HttpResponseBase:
+            start_time = time.perf_counter()
+            token = metrics.start()
+            try:
+                response = get_response(request)
+                _finish(request, response, start_time, metrics.current(), _send_server_timing(request))
+            finally:
+                metrics.stop(token)
+            return response
+
+    return middleware
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response: Callable) -> Callable:
+    """
+    Route the reads of the safe requests to the read replicas, see `core.db_routers`.
+
+    The other requests use the primary, and their client reads from the
+    primary for `SQL_REPLICA_STICKY_SECONDS` after them. Without
+    `DATABASE_REPLICAS` every request uses the primary.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return get_response
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request: HttpRequest) -> HttpResponseBase:
+            write = request.method not in db_routers.SAFE_METHODS
+            primary = write or await sync_to_async(db_routers.is_sticky)(request)
+            token = db_routers.use_primary(primary)
+            try:
+                response = await get_response(request)
+            finally:
+                db_routers.reset(token)
+            if write:
+                await sync_to_async(db_routers.stick)(request)
+            return response
+    else:
+        def middleware(request: HttpRequest) -> HttpResponseBase:
+            write = request.method not in db_routers.SAFE_METHODS
+            token = db_routers.use_primary(write or db_routers.is_sticky(request))
+            try:
+                response = get_response(request)
+            finally:
+                db_routers.reset(token)
+            if write:
+                db_routers.stick(request)
+            return response
+
+    return middleware
+
+
+@sync_and_async_middleware
+def compression_middleware(get_response: Callable) -> Callable:
+    """
+    Compress the responses in the encoding negotiated with `Accept-Encoding`,
+    see `core.compression`.
+
+    The bodies under `COMPRESSION_MIN_SIZE` bytes are sent as is, the
+    streamed responses are compressed chunk by chunk.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request: HttpRequest) -> HttpResponseBase:
+            return compression.compress_response(request, await get_response(request))
+    else:
+        def middleware(request: HttpRequest) -> HttpResponseBase:
+            return compression.compress_response(request, get_response(request))
+
+    return middleware
@@ -0,0 +1,29 @@
+"""
+Binary renderer of the api, selected with `Accept: application/msgpack`.
+
+The `msgpack` package packs the data, the types which it does not know go
+through the encoder of the JSON renderer.
+"""
+from typing import Any, Optional
+
+import msgpack
+
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.metrics import timer
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Renderer of the data in MessagePack, more compact and faster to parse than JSON."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data: Any, accepted_media_type: Optional[str] = None, renderer_context: Any = None) -> bytes:
+        if data is None:
+            return b''
+        with timer('render'):
+            return msgpack.packb(data, default=JSONEncoder().default)
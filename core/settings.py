@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 
+import json
 import os
 from decouple import config
 
@@ -48,11 +49,16 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
+    'core',
+    'jobs',
     'notes',
     'users',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.request_metrics_middleware',
+    'core.middleware.replica_routing_middleware',
+    'core.middleware.compression_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,13 +88,21 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+# Serve the api with the async views, for ASGI workers (core.asgi)
+ASYNC_VIEWS = int(os.environ.get("ASYNC_VIEWS", default=0))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.metrics.TimedJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        "rest_framework.throttling.ScopedRateThrottle"
+        'core.throttling.SlidingWindowScopedRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'high': '30/minute',
@@ -96,6 +110,61 @@ REST_FRAMEWORK = {
     }
 }
 
+# Throttle counters: in the cache THROTTLE_CACHE_ALIAS, shared by the
+# processes on a memcached or redis backend. THROTTLE_USER_RATES overrides
+# the rates by username, as JSON: {"partner": {"high": "300/minute"}}
+THROTTLE_CACHE_ALIAS = os.environ.get("THROTTLE_CACHE_ALIAS", default='default')
+THROTTLE_USER_RATES = json.loads(os.environ.get("THROTTLE_USER_RATES", default='{}'))
+
+# Compression of the responses: the encodings by preference, among the
+# available ones (br and zstd need the brotli and zstandard packages), the
+# size under which the bodies are sent as is, and the levels by encoding
+# as JSON: {"gzip": 4, "br": 4, "zstd": 3}
+COMPRESSION_ENCODINGS = os.environ.get("COMPRESSION_ENCODINGS", default='zstd,gzip,br').split(',')
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", default=1024))
+COMPRESSION_LEVELS = json.loads(os.environ.get("COMPRESSION_LEVELS", default='{}'))
+
+# Send the timings and the number of SQL queries of each request in the
+# Server-Timing response header, to the staff users only unless DEBUG is on
+REQUEST_METRICS_SERVER_TIMING = int(os.environ.get("REQUEST_METRICS_SERVER_TIMING", default=0))
+
+# Notes list pagination and streaming
+NOTES_PAGE_SIZE = int(os.environ.get("NOTES_PAGE_SIZE", default=100))
+NOTES_MAX_PAGE_SIZE = int(os.environ.get("NOTES_MAX_PAGE_SIZE", default=1000))
+NOTES_STREAM_CHUNK_SIZE = int(os.environ.get("NOTES_STREAM_CHUNK_SIZE", default=500))
+
+# Last page of the search results, their pages are fetched by offset
+NOTES_SEARCH_MAX_PAGE = int(os.environ.get("NOTES_SEARCH_MAX_PAGE", default=1000))
+
+# Maximum number of items in a request to api/notes/batch
+NOTES_BATCH_MAX_SIZE = int(os.environ.get("NOTES_BATCH_MAX_SIZE", default=1000))
+
+# Notes search backend, selected by the database engine when empty:
+# 'notes.search.SQLiteFTS5Backend', 'notes.search.MySQLFullTextBackend'
+# or 'notes.search.TokenIndexBackend'
+NOTES_SEARCH_BACKEND = os.environ.get("NOTES_SEARCH_BACKEND", default='')
+
+# Compression of the large note contents in the database: the codec, 'zlib'
+# or 'zstd' (zstandard package), empty to store them as is, and the size in
+# bytes from which a content is compressed. The full-text indexes of the
+# database cannot read the compressed contents: with a codec, the search
+# uses 'notes.search.TokenIndexBackend' unless NOTES_SEARCH_BACKEND is set.
+# Run compress_notes after a change, then rebuild_search_index
+NOTES_CONTENT_CODEC = os.environ.get("NOTES_CONTENT_CODEC", default='')
+NOTES_CONTENT_COMPRESSION_MIN_SIZE = int(os.environ.get("NOTES_CONTENT_COMPRESSION_MIN_SIZE", default=4096))
+
+# Background jobs run by `manage.py run_jobs`, see jobs.queue. JOBS_EAGER
+# runs them in the process enqueueing them instead, without any worker.
+# The number of runs of a job before it fails, the delay in seconds before
+# its first retry, doubled at each retry, the number of jobs claimed at
+# once by a worker, and the number of seconds after which the jobs claimed
+# by a stopped worker are claimed again
+JOBS_EAGER = int(os.environ.get("JOBS_EAGER", default=0))
+JOBS_MAX_ATTEMPTS = int(os.environ.get("JOBS_MAX_ATTEMPTS", default=5))
+JOBS_RETRY_DELAY = int(os.environ.get("JOBS_RETRY_DELAY", default=10))
+JOBS_CLAIM_SIZE = int(os.environ.get("JOBS_CLAIM_SIZE", default=1000))
+JOBS_CLAIM_TIMEOUT = int(os.environ.get("JOBS_CLAIM_TIMEOUT", default=600))
+
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
@@ -108,12 +177,105 @@ DATABASES = {
         "PASSWORD": os.environ.get("SQL_PASSWORD", "111"),
         "HOST": os.environ.get("SQL_HOST", "localhost"),
         "PORT": os.environ.get("SQL_PORT", "3306"),
+        # Seconds a connection is kept between requests, 0 to close it after each request
+        "CONN_MAX_AGE": int(os.environ.get("SQL_CONN_MAX_AGE", default=60)),
+        # Check a kept connection before reusing it in a new request
+        "CONN_HEALTH_CHECKS": bool(int(os.environ.get("SQL_CONN_HEALTH_CHECKS", default=1))),
         'TEST': {
             'NAME': 'test_mydb',
         },
     }
 }
 
+# Read replicas: the reads of the safe requests go to one of them, see core.db_routers.
+# SQL_REPLICA_HOSTS is a comma separated list of host[:port], with the
+# credentials and the database of the primary.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.environ.get("SQL_REPLICA_HOSTS", default='').split(','))):
+    host, _, port = replica.strip().partition(':')
+    alias = 'replica_{index}'.format(index=index)
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        "HOST": host,
+        "PORT": port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['core.db_routers.PrimaryReplicaRouter']
+
+# Seconds the reads of a client stay on the primary after its write, so it reads its writes
+# in the cache SQL_REPLICA_STICKY_CACHE_ALIAS, shared by the processes on a memcached or redis backend
+SQL_REPLICA_STICKY_SECONDS = int(os.environ.get("SQL_REPLICA_STICKY_SECONDS", default=5))
+SQL_REPLICA_STICKY_CACHE_ALIAS = os.environ.get("SQL_REPLICA_STICKY_CACHE_ALIAS", default='default')
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# CACHE_BACKEND and CACHE_LOCATION set the cache shared by the processes,
+# e.g. django.core.cache.backends.redis.RedisCache and redis://redis:6379/0
+# (with the redis package): the default local-memory backend is private to
+# each process, see gunicorn.conf.py. The notes cache uses the same backend
+# unless NOTES_CACHE_BACKEND and NOTES_CACHE_LOCATION are set. The
+# local-memory backend evicts the least recently used entries above MAX_ENTRIES.
+LOCMEM_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", default=LOCMEM_CACHE_BACKEND)
+CACHE_LOCATION = os.environ.get("CACHE_LOCATION", default='')
+NOTES_CACHE_BACKEND = os.environ.get("NOTES_CACHE_BACKEND", default=CACHE_BACKEND)
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+    },
+    'notes': {
+        'BACKEND': NOTES_CACHE_BACKEND,
+        'LOCATION': os.environ.get(
+            "NOTES_CACHE_LOCATION",
+            default="notes" if NOTES_CACHE_BACKEND == LOCMEM_CACHE_BACKEND else CACHE_LOCATION,
+        ),
+        # The entries of the notes do not collide with the default cache on the same server.
+        'KEY_PREFIX': 'notes',
+    },
+}
+if NOTES_CACHE_BACKEND == LOCMEM_CACHE_BACKEND:
+    CACHES['notes']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get("NOTES_CACHE_MAX_ENTRIES", default=10000)),
+        'CULL_FREQUENCY': 10,
+    }
+
+NOTES_CACHE_ALIAS = 'notes'
+NOTES_CACHE_TTL = int(os.environ.get("NOTES_CACHE_TTL", default=300))
+
+# Token authentication cache: tokens cached in each process (LRU), and in
+# the cache AUTH_TOKEN_CACHE_ALIAS shared by the processes when it is set,
+# by default the default cache when it is shared (CACHE_BACKEND)
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", default=10000))
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get("AUTH_TOKEN_CACHE_TTL", default=60))
+AUTH_TOKEN_CACHE_ALIAS = os.environ.get(
+    "AUTH_TOKEN_CACHE_ALIAS",
+    default='' if CACHE_BACKEND == LOCMEM_CACHE_BACKEND else 'default',
+)
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/4.1/topics/auth/passwords/
+# The first hasher hashes the passwords, PASSWORD_HASHER selects it. The
+# passwords of the other hashers, or of another cost, are rehashed at login.
+
+PASSWORD_HASH_ITERATIONS = int(os.environ.get("PASSWORD_HASH_ITERATIONS", default=390000))
+PASSWORD_HASHERS = list(dict.fromkeys([
+    os.environ.get("PASSWORD_HASHER", default='users.hashers.PBKDF2PasswordHasher'),
+    'users.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]))
+
+# Number of threads checking the passwords of the logins
+AUTH_HASHER_WORKERS = int(os.environ.get("AUTH_HASHER_WORKERS", default=os.cpu_count() or 1))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -0,0 +1,312 @@
+import gzip
+import io
+import pytest
+
+from http import HTTPStatus
+from decimal import Decimal
+from typing import Any, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory
+from django.urls import resolve, reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core import compression, db_routers, metrics, renderers, throttling
+from core.management.commands.profile_startup import Import, parse_import_times
+from core.middleware import replica_routing_middleware
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics() -> None:
+    """Resetting the metrics of the previous tests."""
+    metrics.registry.reset()
+
+
+class TestCoreUrls:  # unit tests
+    """Test the core api urls"""
+
+    def test_metrics(self) -> None:
+        """Ensure metrics url is defined."""
+        path = '/api/metrics'
+        assert reverse('metrics') == path
+        assert resolve(path).view_name == 'metrics'
+
+    def test_health_and_ready(self) -> None:
+        """Ensure health and ready urls are defined."""
+        assert reverse('health') == '/api/health'
+        assert resolve('/api/ready').view_name == 'ready'
+
+
+class TestHistogram:  # unit tests
+    """Test the histograms of the metrics"""
+
+    def test_histogram(self) -> None:
+        """Ensure the values are counted in their buckets."""
+        histogram = metrics.Histogram()
+        for value in [0.5, 3, 3, 40, 20000]:
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+        assert snapshot['count'] == 5
+        assert snapshot['buckets']['1'] == 1
+        assert snapshot['buckets']['5'] == 3
+        assert snapshot['buckets']['50'] == 4
+        assert snapshot['buckets']['+Inf'] == 5
+        assert snapshot['p50'] == 5
+        assert snapshot['p99'] is None
+
+
+@pytest.mark.django_db()
+class TestProbes:  # integration tests
+    """Test the health and readiness probes"""
+
+    def test_health(self, api_client: APIClient, django_assert_num_queries: Any) -> None:
+        """Test the health probe answers without authentication nor query."""
+        with django_assert_num_queries(0):
+            response = api_client.get(reverse('health'))
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == {'status': 'ok'}
+
+    def test_ready(self, api_client: APIClient, monkeypatch: Any, caplog: Any) -> None:
+        """Test the readiness probe checks the database."""
+        response = api_client.get(reverse('ready'))
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == {'status': 'ok', 'databases': {'default': 'ok'}}
+
+        def fail(*args: Any, **kwargs: Any) -> None:
+            raise OperationalError('unreachable')
+
+        monkeypatch.setattr(connection, 'cursor', fail)
+        response = api_client.get(reverse('ready'))
+        assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+        assert response.data['databases'] == {'default': 'unavailable'}
+        assert 'unreachable' not in response.content.decode()
+        assert 'unreachable' in caplog.text
+
+
+class TestStartupProfile:  # integration tests
+    """Test the api-only settings and the startup profiler"""
+
+    def test_parse_import_times(self) -> None:
+        """Ensure the report of -X importtime is parsed."""
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |     django.utils\n'
+            'import time:      1500 |       1620 |   django.conf\n'
+            'Traceback (most recent call last):\n'
+        )
+        assert parse_import_times(output) == [
+            Import('django.utils', 120, 120),
+            Import('django.conf', 1500, 1620),
+        ]
+
+    def test_profile_startup(self) -> None:
+        """Test an api-only worker starts and serves the health probe."""
+        stdout = io.StringIO()
+        call_command('profile_startup', 'core.settings_api', '--runs', '1', '--requests', '10', '--top', '3', stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        assert lines[0].startswith('core.settings_api: cold start ')
+        assert 'modules imported' in lines[1]
+        assert len(lines) == 5
+
+
+class TestCompression:  # unit tests
+    """Test the compression of the responses"""
+
+    def test_select_encoding(self) -> None:
+        """Ensure the encoding of the highest quality is selected, by server preference between equals."""
+        encodings = ['zstd', 'gzip', 'br']
+        assert compression.select_encoding('gzip, deflate, br', encodings) == 'gzip'
+        assert compression.select_encoding('gzip, deflate, br, zstd', encodings) == 'zstd'
+        assert compression.select_encoding('gzip;q=0.5, br', encodings) == 'br'
+        assert compression.select_encoding('*;q=0.1, gzip;q=0', encodings) == 'zstd'
+        assert compression.select_encoding('identity', encodings) is None
+        assert compression.select_encoding('', encodings) is None
+
+    def test_compress_response(self, settings: Any) -> None:
+        """Ensure the small bodies and the no-transform responses are sent as is."""
+        settings.COMPRESSION_MIN_SIZE = 100
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+
+        response = compression.compress_response(request, HttpResponse(b'a' * 99))
+        assert not response.has_header('Content-Encoding')
+        assert not response.has_header('Vary')
+        response = HttpResponse(b'a' * 100)
+        response['Cache-Control'] = 'no-transform'
+        assert not compression.compress_response(request, response).has_header('Content-Encoding')
+
+        response = compression.compress_response(request, HttpResponse(b'a' * 100))
+        assert response['Content-Encoding'] == 'gzip'
+        assert response['Vary'] == 'Accept-Encoding'
+        assert gzip.decompress(response.content) == b'a' * 100
+
+    @pytest.mark.parametrize('encoding, package', [('br', 'brotli'), ('zstd', 'zstandard')])
+    def test_optional_codecs(self, encoding: str, package: str) -> None:
+        """Test the optional encodings, when their package is installed."""
+        pytest.importorskip(package)
+        codec = compression.get_codec(encoding)
+        data = b'{"id": 1, "content": "note"}' * 100
+        assert len(codec.compress(data)) < len(data)
+        assert b''.join(codec.compress_stream([data, data]))
+
+
+class TestReplicaRouting:  # unit tests
+    """Test the routing of the reads to the replicas"""
+
+    def test_router(self, settings: Any) -> None:
+        """Ensure the reads use a replica unless pinned to the primary, the writes the primary."""
+        settings.DATABASE_REPLICAS = ['replica_0']
+        router = db_routers.PrimaryReplicaRouter()
+        token = db_routers.use_primary(False)
+        try:
+            assert router.db_for_read(User) == 'replica_0'
+            assert router.db_for_write(User) == 'default'
+        finally:
+            db_routers.reset(token)
+        assert router.db_for_read(User) == 'default'
+        assert router.allow_migrate('default', 'notes')
+        assert not router.allow_migrate('replica_0', 'notes')
+
+    def test_middleware(self, settings: Any) -> None:
+        """Ensure a client reads from the primary after its write."""
+        settings.DATABASE_REPLICAS = ['replica_0']
+        pinned = []
+
+        def get_response(request: Any) -> HttpResponse:
+            pinned.append(db_routers._use_primary.get())
+            return HttpResponse()
+
+        middleware = replica_routing_middleware(get_response)
+        factory = RequestFactory()
+        headers = {'HTTP_AUTHORIZATION': 'Token abc'}
+        middleware(factory.get('/api/notes/', **headers))
+        middleware(factory.post('/api/notes/', **headers))
+        middleware(factory.get('/api/notes/', **headers))
+        middleware(factory.get('/api/notes/', HTTP_AUTHORIZATION='Token other'))
+        assert pinned == [False, True, True, False]
+
+
+class TestMessagePackRenderer:  # unit tests
+    """Test the MessagePack renderer"""
+
+    def test_render(self) -> None:
+        """Ensure the data is packed in the MessagePack format."""
+        renderer = renderers.MessagePackRenderer()
+        assert renderer.render({'id': 1, 'content': 'a'}) == b'\x82\xa2id\x01\xa7content\xa1a'
+        assert renderer.render([None, True, -1, 300, 1.5]) == (
+            b'\x95\xc0\xc3\xff\xcd\x01\x2c\xcb\x3f\xf8' + bytes(6)
+        )
+        assert renderer.render(Decimal('2.5')) == renderer.render(2.5)
+        assert renderer.render(None) == b''
+
+
+class TestSlidingWindowThrottle:  # unit tests
+    """Test the sliding window rate limits"""
+
+    class View:
+        throttle_scope = 'high'
+
+    def allow(self, user: Any, now: float) -> Tuple[bool, Optional[float]]:
+        """Check a request of a user at a time."""
+        request = APIRequestFactory().get('/')
+        request.user = user
+        throttle = throttling.SlidingWindowScopedRateThrottle()
+        throttle.timer = lambda: now
+        throttle.THROTTLE_RATES = {'high': '3/minute'}
+        allowed = throttle.allow_request(request, self.View())
+        return allowed, throttle.wait()
+
+    def test_sliding_window(self, admin_user: User) -> None:
+        """Ensure the previous window counts for its share still in the sliding window."""
+        start = 600.0  # the start of a window of a minute
+        assert [self.allow(admin_user, start + second)[0] for second in range(4)] == [True, True, True, False]
+
+        # The client retries after the wait, the rejection is known in process.
+        assert self.allow(admin_user, start + 4) == (False, 56)
+        # Half of the 3 requests of the previous window count after 30 seconds.
+        assert self.allow(admin_user, start + 90)[0]
+        allowed, wait = self.allow(admin_user, start + 91)
+        assert not allowed
+        assert wait == pytest.approx(9)
+        assert self.allow(admin_user, start + 100)[0]
+
+    def test_user_rates(self, admin_user: User, settings: Any) -> None:
+        """Ensure a user has its own rate of a scope."""
+        settings.THROTTLE_USER_RATES = {admin_user.username: {'high': '5/minute'}}
+        assert [self.allow(admin_user, 600.0 + second)[0] for second in range(6)] == [True] * 5 + [False]
+        other_user = User.objects.create(username='other_user')
+        assert [self.allow(other_user, 600.0 + second)[0] for second in range(4)] == [True] * 3 + [False]
+
+
+class TestRequestMetricsMiddleware:  # integration tests
+    """Test the measures of the requests"""
+
+    def test_server_timing(self, api_client: APIClient, admin_user: User, settings: Any) -> None:
+        """Test the timings are sent in the Server-Timing header to the staff users, when enabled."""
+        api_client.force_login(user=admin_user)
+        response = api_client.post(reverse('notes:notes-notes'), {'content': 'test1'}, format='json')
+        assert 'Server-Timing' not in response
+
+        settings.REQUEST_METRICS_SERVER_TIMING = 1
+        response = api_client.post(reverse('notes:notes-notes'), {'content': 'test1'}, format='json')
+        timing = response['Server-Timing']
+        assert 'sql;dur=' in timing
+        assert 'serializer;dur=' in timing
+        assert 'render;dur=' in timing
+        assert 'throttle;dur=' in timing
+        assert 'total;dur=' in timing
+
+        api_client.force_login(user=User.objects.create(username='user1'))
+        response = api_client.post(reverse('notes:notes-notes'), {'content': 'test1'}, format='json')
+        assert 'Server-Timing' not in response
+        settings.DEBUG = True
+        response = api_client.post(reverse('notes:notes-notes'), {'content': 'test1'}, format='json')
+        assert 'Server-Timing' in response
+
+    def test_metrics(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api metrics aggregate the requests by view name."""
+        api_client.force_login(user=admin_user)
+        api_client.get(reverse('notes:notes-notes'))
+        api_client.get(reverse('notes:notes-notes'))
+        api_client.get(reverse('notes:notes-note', kwargs={'id': 123}))
+
+        response = api_client.get(reverse('metrics'))
+        assert response.status_code == HTTPStatus.OK
+        notes = response.data['notes:notes-notes']
+        assert notes['requests'] == 2
+        assert notes['statuses'] == {'2xx': 2}
+        assert notes['queries']['count'] == 2
+        assert notes['queries']['sum'] > 0
+        assert notes['timings_ms']['total']['count'] == 2
+        assert response.data['notes:notes-note']['statuses'] == {'4xx': 1}
+
+    @pytest.mark.django_db()
+    def test_metrics_needs_admin(self, api_client: APIClient) -> None:
+        """Test the api metrics is only for the admins."""
+        user = User.objects.create(username='user1')
+        api_client.force_login(user=user)
+        response = api_client.get(reverse('metrics'))
+        assert response.status_code == HTTPStatus.FORBIDDEN
+
+    @pytest.mark.usefixtures('async_views')
+    def test_async_views(self, admin_user: User, settings: Any) -> None:
+        """Test the queries of the async views are measured."""
+        settings.REQUEST_METRICS_SERVER_TIMING = 1
+        token = Token.objects.create(user=admin_user)
+
+        async def send() -> Any:
+            return await AsyncClient().get(
+                reverse('notes:notes-notes'),
+                authorization='Token {key}'.format(key=token.key),
+            )
+
+        response = async_to_sync(send)()
+        assert response.status_code == HTTPStatus.OK
+        assert 'desc="0 queries"' not in response['Server-Timing']
@@ -0,0 +1,181 @@
+"""
+Sliding window rate limits of the `throttle_scope` of the api views.
+
+Each (scope, user) counts its requests in fixed windows of the duration
+of its rate, in the cache `THROTTLE_CACHE_ALIAS`: shared by the worker
+processes with a memcached or redis backend. A request is allowed while
+the count of the current window, plus the count of the previous window
+weighted by its share still in the sliding window, is within the rate.
+One `incr` per request, instead of the timestamp list of DRF's throttle
+rewritten on each request.
+
+Each process remembers the clients it rejected until they may retry, and
+the counts of the previous windows, which do not change anymore: those
+requests do not reach the cache.
+"""
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+
+from rest_framework import throttling
+from rest_framework.request import Request
+
+from core.metrics import timer
+
+# Above this number of keys, the expired entries of the local state are dropped.
+LOCAL_MAX_KEYS = 10000
+
+
+class LocalState:
+    """Thread safe state of the throttles in this process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # key -> time until which its requests are rejected
+        self._blocked: Dict[str, float] = {}
+        # key -> (window, count) of the last previous window read from the cache
+        self._previous: Dict[str, Tuple[int, int]] = {}
+
+    def blocked_for(self, key: str, now: float) -> Optional[float]:
+        """Get the remaining seconds of a rejected key, None when it is not blocked."""
+        with self._lock:
+            until = self._blocked.get(key)
+        return until - now if until is not None and until > now else None
+
+    def block(self, key: str, until: float, now: float) -> None:
+        with self._lock:
+            if len(self._blocked) >= LOCAL_MAX_KEYS:
+                self._blocked = {name: value for name, value in self._blocked.items() if value > now}
+            self._blocked[key] = until
+
+    def previous_count(self, key: str, window: int) -> Optional[int]:
+        with self._lock:
+            entry = self._previous.get(key)
+        return entry[1] if entry is not None and entry[0] == window else None
+
+    def set_previous_count(self, key: str, window: int, count: int) -> None:
+        with self._lock:
+            if len(self._previous) >= LOCAL_MAX_KEYS:
+                self._previous = {name: value for name, value in self._previous.items() if value[0] >= window}
+            self._previous[key] = (window, count)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._blocked.clear()
+            self._previous.clear()
+
+
+local_state = LocalState()
+
+
+class SlidingWindowScopedRateThrottle(throttling.ScopedRateThrottle):
+    """
+    `ScopedRateThrottle` counting in a sliding window, with per-user rates.
+
+    `THROTTLE_USER_RATES` overrides the rates of `DEFAULT_THROTTLE_RATES`
+    by username, e.g. `{"partner": {"high": "300/minute"}}`.
+    """
+
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self) -> None:
+        # The rate depends on the view and the user, it is set by allow_request().
+        self.wait_time: Optional[float] = None
+
+    def get_cache(self) -> BaseCache:
+        """Get the cache of the counters."""
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def get_user_rate(self, request: Request) -> Optional[str]:
+        """Get the rate of the scope for the user, by default the rate of the scope."""
+        user = request.user
+        if user and user.is_authenticated:
+            rates = settings.THROTTLE_USER_RATES.get(user.get_username(), {})
+            if self.scope in rates:
+                return rates[self.scope]
+        return self.get_rate()
+
+    def allow_request(self, request: Request, view: Any) -> bool:
+        with timer('throttle'):
+            self.scope = getattr(view, self.scope_attr, None)
+            if not self.scope:
+                return True
+            self.rate = self.get_user_rate(request)
+            self.num_requests, self.duration = self.parse_rate(self.rate)
+            if self.rate is None:
+                return True
+            key = self.get_cache_key(request, view)
+            if key is None:
+                return True
+            return self.allow_key(key)
+
+    def allow_key(self, key: str) -> bool:
+        """
+        Count a request of a key if it is within the rate.
+
+        Args:
+            key: the key of the scope and the client
+
+        Returns:
+            whether the request is allowed
+        """
+        now = self.timer()
+        blocked_for = local_state.blocked_for(key, now)
+        if blocked_for is not None:
+            self.wait_time = blocked_for
+            return False
+
+        cache = self.get_cache()
+        window = int(now // self.duration)
+        elapsed = now - window * self.duration
+        current_key = '{key}:{window}'.format(key=key, window=window)
+        current = self.increment(cache, current_key)
+        previous = local_state.previous_count(key, window - 1)
+        if previous is None:
+            previous = cache.get('{key}:{window}'.format(key=key, window=window - 1), 0)
+            if elapsed > 1:
+                # The other processes are done with the previous window.
+                local_state.set_previous_count(key, window - 1, previous)
+
+        weight = 1 - elapsed / self.duration
+        if previous * weight + current <= self.num_requests:
+            return True
+
+        # A rejected request is not counted.
+        cache.decr(current_key)
+        self.wait_time = self.get_wait(previous, current - 1, elapsed)
+        local_state.block(key, now + self.wait_time, now)
+        return False
+
+    def increment(self, cache: BaseCache, key: str) -> int:
+        """Increment the counter of a window, created for two windows."""
+        try:
+            return cache.incr(key)
+        except ValueError:
+            if cache.add(key, 1, timeout=2 * self.duration):
+                return 1
+            return cache.incr(key)
+
+    def get_wait(self, previous: int, current: int, elapsed: float) -> float:
+        """
+        Get the seconds until one more request is within the rate.
+
+        Args:
+            previous: the count of the previous window
+            current: the count of the current window
+            elapsed: the seconds elapsed in the current window
+
+        Returns:
+            the seconds to wait
+        """
+        remaining = self.duration - elapsed
+        if current + 1 > self.num_requests or not previous:
+            return remaining
+        # previous * (1 - (elapsed + wait) / duration) + current + 1 <= num_requests
+        wait = self.duration * (1 - (self.num_requests - current - 1) / previous) - elapsed
+        return min(max(wait, 0.0), remaining)
+
+    def wait(self) -> Optional[float]:
+        return self.wait_time
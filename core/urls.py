@@ -13,12 +13,29 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
+from django.conf import settings
 from django.urls import path
 from django.urls.conf import include
 
+from core import api_views
+
+# With ASYNC_VIEWS the api is served by the async views, for ASGI workers.
+if settings.ASYNC_VIEWS:
+    notes_urls, users_urls = 'notes.async_urls', 'users.async_urls'
+else:
+    notes_urls, users_urls = 'notes.urls', 'users.urls'
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('api/', include(('notes.urls', 'notes'), namespace='notes')),
-    path('api/', include(('users.urls', 'users'), namespace='users')),
+    path('api/metrics', api_views.MetricsApiView.as_view(), name='metrics'),
+    path('api/health', api_views.HealthApiView.as_view(), name='health'),
+    path('api/ready', api_views.ReadyApiView.as_view(), name='ready'),
+    path('api/', include((notes_urls, 'notes'), namespace='notes')),
+    path('api/', include((users_urls, 'users'), namespace='users')),
 ]
+
+# The api-only workers (core.settings_api) do not install nor import the admin.
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
@@ -0,0 +1,71 @@
+"""
+Gunicorn configuration of the production server: `gunicorn --config gunicorn.conf.py`.
+
+Serves `core.wsgi` with sync or threaded workers, or `core.asgi` with
+uvicorn workers when `ASYNC_VIEWS` is set. Send HUP to the master for a
+graceful reload: new workers start, the old ones finish their requests.
+"""
+import multiprocessing
+import os
+
+ASYNC_VIEWS = int(os.environ.get("ASYNC_VIEWS", default=0))
+
+bind = os.environ.get("SERVER_BIND", default='0.0.0.0:8888')
+wsgi_app = 'core.asgi:application' if ASYNC_VIEWS else 'core.wsgi:application'
+
+# Processes, and threads of each process for the WSGI workers.
+workers = int(os.environ.get("SERVER_WORKERS", default=multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("SERVER_THREADS", default=1))
+if ASYNC_VIEWS:
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Recycle the workers after a number of requests, with a jitter so they do
+# not all restart at once: bounds the growth of their memory.
+max_requests = int(os.environ.get("SERVER_MAX_REQUESTS", default=1000))
+max_requests_jitter = int(os.environ.get("SERVER_MAX_REQUESTS_JITTER", default=100))
+
+# Import the project once in the master, the forked workers share it.
+preload_app = bool(int(os.environ.get("SERVER_PRELOAD", default=1)))
+
+timeout = int(os.environ.get("SERVER_TIMEOUT", default=30))
+graceful_timeout = int(os.environ.get("SERVER_GRACEFUL_TIMEOUT", default=30))
+keepalive = int(os.environ.get("SERVER_KEEPALIVE", default=5))
+
+accesslog = os.environ.get("SERVER_ACCESS_LOG", default=None)
+errorlog = '-'
+
+
+def on_starting(server):
+    """Warn when several workers would each keep their own copy of the caches the api shares."""
+    if workers < 2:
+        return
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    from django.conf import settings
+    aliases = {
+        'default',
+        settings.NOTES_CACHE_ALIAS,
+        settings.THROTTLE_CACHE_ALIAS,
+        settings.SQL_REPLICA_STICKY_CACHE_ALIAS,
+        settings.AUTH_TOKEN_CACHE_ALIAS,
+    }
+    local = sorted(
+        alias for alias in aliases - {''}
+        if settings.CACHES[alias]['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache'
+    )
+    if local:
+        server.log.warning(
+            'The caches %s are local to each of the %d workers: the invalidations of the notes cache, '
+            'the rate limits and the replica stickiness do not reach the other workers. '
+            'Set CACHE_BACKEND and CACHE_LOCATION to a redis or memcached server.',
+            ', '.join(local), workers,
+        )
+        if int(os.environ.get("SERVER_REQUIRE_SHARED_CACHE", default=0)):
+            raise SystemExit('Refusing to start {0} workers on local caches.'.format(workers))
+
+
+def post_fork(server, worker):
+    """Drop the database connections inherited from the master, each worker opens its own."""
+    from django.db import connections
+    connections.close_all()
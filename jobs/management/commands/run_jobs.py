@@ -0,0 +1,69 @@
+import signal
+import threading
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from jobs import queue
+from jobs.worker import EXECUTORS, Worker
+
+
+class Command(BaseCommand):
+    """Run the background jobs."""
+
+    help = (
+        'Run the background jobs enqueued by the api until stopped by SIGINT or SIGTERM, '
+        'the current jobs are finished first.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--executor',
+            choices=EXECUTORS,
+            default='thread',
+            help='Run the batches on a pool of threads, of processes for CPU bound tasks, or inline.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=2,
+            help='Number of threads or processes of the pool.',
+        )
+        parser.add_argument(
+            '--tasks',
+            nargs='+',
+            help='Only run the jobs of these tasks.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Number of seconds between two polls of an empty queue.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Stop when no job is due.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be positive.')
+        for name in options['tasks'] or []:
+            try:
+                queue.get_task(name)
+            except LookupError as error:
+                raise CommandError(str(error))
+
+        stop = threading.Event()
+        if not options['once']:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stop.set())
+
+        with Worker(options['executor'], options['concurrency'], options['tasks']) as worker:
+            if not options['once']:
+                self.stdout.write('Worker {name} started'.format(name=worker.name))
+            done, failed = worker.run(stop, options['poll_interval'], once=options['once'])
+        self.stdout.write(self.style.SUCCESS(
+            'Ran {done} jobs, {failed} failed'.format(done=done, failed=failed),
+        ))
@@ -0,0 +1,84 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Background job of a task, run by the `run_jobs` workers.
+
+    A job is deleted once its task succeeded. A failed job is retried
+    until it has run `max_attempts` times, then kept with the error.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        FAILED = 'failed', 'Failed'
+
+    task = models.CharField(
+        verbose_name='Task',
+        max_length=100,
+    )
+
+    # The pending jobs of a task with the same key are coalesced.
+    key = models.CharField(
+        verbose_name='Key',
+        max_length=100,
+        blank=True,
+        default='',
+    )
+
+    payload = models.JSONField(
+        verbose_name='Payload',
+        default=dict,
+    )
+
+    status = models.CharField(
+        verbose_name='Status',
+        max_length=7,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+
+    attempts = models.PositiveIntegerField(
+        verbose_name='Attempts',
+        default=0,
+    )
+
+    run_at = models.DateTimeField(
+        verbose_name='Run at',
+        default=timezone.now,
+    )
+
+    claimed_by = models.CharField(
+        verbose_name='Claimed by',
+        max_length=100,
+        blank=True,
+        default='',
+    )
+
+    claimed_at = models.DateTimeField(
+        verbose_name='Claimed at',
+        null=True,
+        blank=True,
+    )
+
+    error = models.TextField(
+        verbose_name='Error',
+        blank=True,
+        default='',
+    )
+
+    created_at = models.DateTimeField(
+        verbose_name='Created at',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        indexes = [
+            # The workers claim the pending jobs due first.
+            models.Index(fields=['status', 'run_at'], name='jobs_job_status_run_at_idx'),
+            models.Index(fields=['task', 'key', 'status'], name='jobs_job_task_key_status_idx'),
+        ]
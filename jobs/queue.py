@@ -0,0 +1,242 @@
+"""
+Background jobs of the expensive side effects of the writes, stored in the database.
+
+A task is a function registered with `register()` in the `tasks` module
+of an app. The request handlers `enqueue()` its payloads: the jobs are
+inserted in their transaction, so they are committed, or rolled back,
+with their writes, and the `run_jobs` workers run them afterwards.
+
+A task receives the payloads of its jobs in batches of up to its
+`batch_size`. The jobs of a task with a `key` are coalesced: a job is not
+enqueued again while one of its key is pending, e.g. a note updated ten
+times before a worker gets to it is reindexed once. A failed batch is run
+again job by job, and the failed jobs are retried after `JOBS_RETRY_DELAY`
+seconds, doubled at each attempt, until they have run `max_attempts` times.
+
+With `JOBS_EAGER`, the tasks run in the process enqueueing them instead.
+"""
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import groupby
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job
+
+
+@dataclass
+class Task:
+    """A registered task, see `register()`."""
+
+    name: str
+    function: Callable[[List[dict]], None]
+    batch_size: int
+    key: Optional[Callable[[dict], str]]
+    max_attempts: Optional[int]
+
+    def get_max_attempts(self) -> int:
+        return self.max_attempts or settings.JOBS_MAX_ATTEMPTS
+
+    def get_key(self, payload: dict) -> str:
+        return self.key(payload) if self.key is not None else ''
+
+    def run(self, payloads: List[dict]) -> None:
+        """Run the task on payloads, the last one of each key only."""
+        if self.key is not None:
+            payloads = list({self.get_key(payload): payload for payload in payloads}.values())
+        self.function(payloads)
+
+    def enqueue(self, *payloads: dict) -> None:
+        """Enqueue jobs of the task, see `enqueue()`."""
+        enqueue(self.name, *payloads)
+
+    async def aenqueue(self, *payloads: dict) -> None:
+        """Async version of `enqueue()`."""
+        await aenqueue(self.name, *payloads)
+
+
+_registry: Dict[str, Task] = {}
+
+
+def register(
+    name: str,
+    batch_size: int = 1,
+    key: Optional[Callable[[dict], str]] = None,
+    max_attempts: Optional[int] = None,
+) -> Callable[[Callable[[List[dict]], None]], Task]:
+    """
+    Register a function as a task.
+
+    Args:
+        name: name of the task, stored in its jobs
+        batch_size: maximum number of payloads the function receives at once
+        key: function getting the key of a payload, the pending jobs of a key are
+            coalesced; None to run every job
+        max_attempts: number of runs of a job before it fails, `JOBS_MAX_ATTEMPTS` by default
+
+    Returns:
+        a decorator of the function taking a list of payloads, returning its `Task`
+    """
+    def decorator(function: Callable[[List[dict]], None]) -> Task:
+        task = Task(name, function, batch_size, key, max_attempts)
+        _registry[name] = task
+        return task
+
+    return decorator
+
+
+def get_task(name: str) -> Task:
+    """
+    Get a registered task.
+
+    Raises:
+        LookupError: If no task has this name.
+    """
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError('Unknown task {name}.'.format(name=name)) from None
+
+
+def enqueue(name: str, *payloads: dict) -> None:
+    """
+    Enqueue the jobs of a task, or run it now with `JOBS_EAGER`.
+
+    Args:
+        name: name of the task
+        payloads: the JSON serializable payload of each job
+    """
+    task = get_task(name)
+    if not payloads:
+        return
+    if settings.JOBS_EAGER:
+        task.run(list(payloads))
+        return
+
+    jobs = {}
+    for index, payload in enumerate(payloads):
+        key = task.get_key(payload)
+        jobs[key if task.key is not None else index] = Job(task=name, key=key, payload=payload)
+    with transaction.atomic():
+        if task.key is not None:
+            # Locked until the commit, so a worker can not claim a pending
+            # job and read the data before the writes it coalesces.
+            pending = Job.objects.filter(task=name, key__in=list(jobs), status=Job.Status.PENDING)
+            if connection.features.has_select_for_update:
+                pending = pending.select_for_update()
+            for key in pending.values_list('key', flat=True):
+                jobs.pop(key, None)
+        Job.objects.bulk_create(jobs.values(), batch_size=1000)
+
+
+# The transaction is only reachable from a synchronous context.
+aenqueue = sync_to_async(enqueue)
+
+
+def claim(worker: str, limit: int, names: Optional[Iterable[str]] = None) -> List[Job]:
+    """
+    Claim the due pending jobs for a worker.
+
+    Args:
+        worker: unique name of the worker
+        limit: maximum number of jobs to claim
+        names: only claim the jobs of these tasks, None for all the tasks
+
+    Returns:
+        the claimed jobs, their attempts counted
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = Job.objects.filter(status=Job.Status.PENDING, run_at__lte=now).order_by('run_at', 'id')
+        if names is not None:
+            due = due.filter(task__in=list(names))
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:limit])
+        # Without SKIP LOCKED, the jobs claimed by another worker meanwhile are not pending anymore.
+        Job.objects.filter(id__in=ids, status=Job.Status.PENDING).update(
+            status=Job.Status.RUNNING,
+            claimed_by=worker,
+            claimed_at=now,
+            attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(id__in=ids, status=Job.Status.RUNNING, claimed_by=worker).order_by('id'))
+
+
+def make_batches(jobs: Iterable[Job]) -> List[List[int]]:
+    """Split jobs into the batches of their tasks, by job id."""
+    batches = []
+    for name, group in groupby(sorted(jobs, key=lambda job: (job.task, job.id)), key=lambda job: job.task):
+        ids = [job.id for job in group]
+        batch_size = _registry[name].batch_size if name in _registry else 1
+        batches.extend(ids[start:start + batch_size] for start in range(0, len(ids), batch_size))
+    return batches
+
+
+def run_batch(job_ids: List[int]) -> Tuple[int, int]:
+    """
+    Run a batch of claimed jobs of one task.
+
+    The jobs are deleted in the transaction of the task when it succeeds.
+    When it fails, a batch of several jobs is run again job by job, and
+    each failed job is retried later or marked as failed after its last
+    attempt.
+
+    Args:
+        job_ids: ids of the jobs, see `make_batches()`
+
+    Returns:
+        the numbers of succeeded and failed jobs
+    """
+    jobs = list(Job.objects.filter(id__in=job_ids, status=Job.Status.RUNNING).order_by('id'))
+    if not jobs:
+        return 0, 0
+    try:
+        # The writes of the task are committed with the deletion of its jobs.
+        with transaction.atomic():
+            get_task(jobs[0].task).run([job.payload for job in jobs])
+            Job.objects.filter(id__in=[job.id for job in jobs]).delete()
+    except Exception:
+        if len(jobs) > 1:
+            results = [run_batch([job.id]) for job in jobs]
+            return sum(done for done, _ in results), sum(failed for _, failed in results)
+        fail(jobs[0], traceback.format_exc())
+        return 0, 1
+    return len(jobs), 0
+
+
+def fail(job: Job, error: str) -> None:
+    """Retry a failed job later, or mark it as failed after its last attempt."""
+    max_attempts = _registry[job.task].get_max_attempts() if job.task in _registry else 1
+    if job.attempts < max_attempts:
+        job.status = Job.Status.PENDING
+        job.run_at = timezone.now() + timedelta(seconds=settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1))
+    else:
+        job.status = Job.Status.FAILED
+    job.error = error
+    job.claimed_by = ''
+    job.claimed_at = None
+    job.save(update_fields=['status', 'run_at', 'error', 'claimed_by', 'claimed_at'])
+
+
+def release_stale(timeout: int) -> int:
+    """
+    Release the jobs claimed for too long, e.g. by a stopped worker, to be claimed again.
+
+    Args:
+        timeout: number of seconds after which a claimed job is released
+
+    Returns:
+        the number of released jobs
+    """
+    return Job.objects.filter(
+        status=Job.Status.RUNNING,
+        claimed_at__lt=timezone.now() - timedelta(seconds=timeout),
+    ).update(status=Job.Status.PENDING, claimed_by='', claimed_at=None)
@@ -0,0 +1,135 @@
+import io
+import pytest
+import threading
+
+from datetime import timedelta
+from typing import Any, List
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from jobs import queue
+from jobs.models import Job
+from jobs.worker import Worker
+
+calls: List[List[dict]] = []
+
+
+@queue.register('tests.record', batch_size=2)
+def record(payloads: List[dict]) -> None:
+    calls.append(payloads)
+    if any(payload.get('fail') for payload in payloads):
+        raise ValueError('failed payload')
+
+
+@queue.register('tests.keyed', batch_size=10, key=lambda payload: str(payload['id']), max_attempts=2)
+def keyed(payloads: List[dict]) -> None:
+    calls.append(payloads)
+
+
+@pytest.fixture(autouse=True)
+def queued_jobs(settings: Any) -> None:
+    """Enqueueing the jobs for the workers, and resetting the calls of the test tasks."""
+    settings.JOBS_EAGER = False
+    calls.clear()
+
+
+def run_due_jobs(executor: str = 'inline') -> tuple:
+    with Worker(executor, concurrency=2) as worker:
+        return worker.run(threading.Event(), poll_interval=0, once=True)
+
+
+@pytest.mark.django_db()
+class TestJobQueue:  # integration tests
+    """Test the background jobs queue"""
+
+    def test_enqueue_and_run_in_batches(self) -> None:
+        """Test the jobs of a task are run in batches, then deleted."""
+        queue.enqueue('tests.record', *[{'id': index} for index in range(5)])
+        assert Job.objects.filter(status=Job.Status.PENDING).count() == 5
+        assert calls == []
+
+        assert run_due_jobs() == (5, 0)
+        assert calls == [[{'id': 0}, {'id': 1}], [{'id': 2}, {'id': 3}], [{'id': 4}]]
+        assert not Job.objects.exists()
+
+    def test_coalesce_keyed_jobs(self) -> None:
+        """Test a keyed job is not enqueued again while it is pending."""
+        queue.enqueue('tests.keyed', {'id': 1}, {'id': 2}, {'id': 1})
+        queue.enqueue('tests.keyed', {'id': 2}, {'id': 3})
+        assert sorted(Job.objects.values_list('key', flat=True)) == ['1', '2', '3']
+
+        run_due_jobs()
+        assert calls == [[{'id': 1}, {'id': 2}, {'id': 3}]]
+
+        # A running job does not coalesce the later writes.
+        queue.enqueue('tests.keyed', {'id': 1})
+        job = queue.claim('worker', limit=10)[0]
+        queue.enqueue('tests.keyed', {'id': 1})
+        assert Job.objects.filter(key='1').count() == 2
+        assert queue.run_batch([job.id]) == (1, 0)
+
+    def test_eager_jobs(self, settings: Any) -> None:
+        """Test the tasks run at once with JOBS_EAGER."""
+        settings.JOBS_EAGER = True
+        queue.enqueue('tests.keyed', {'id': 1}, {'id': 1})
+        assert calls == [[{'id': 1}]]
+        assert not Job.objects.exists()
+
+    def test_retry_failed_jobs(self, settings: Any) -> None:
+        """Test a failed batch is run job by job, and the failed jobs are retried then failed."""
+        settings.JOBS_MAX_ATTEMPTS = 2
+        queue.enqueue('tests.record', {'id': 1}, {'id': 2, 'fail': True})
+
+        assert run_due_jobs() == (1, 1)
+        assert calls == [[{'id': 1}, {'id': 2, 'fail': True}], [{'id': 1}], [{'id': 2, 'fail': True}]]
+        job = Job.objects.get()
+        assert job.status == Job.Status.PENDING
+        assert job.attempts == 1
+        assert job.run_at > timezone.now()
+        assert 'ValueError: failed payload' in job.error
+
+        # Not due before its retry delay.
+        assert run_due_jobs() == (0, 0)
+        Job.objects.update(run_at=timezone.now())
+        assert run_due_jobs() == (0, 1)
+        job = Job.objects.get()
+        assert job.status == Job.Status.FAILED
+        assert job.attempts == 2
+        assert run_due_jobs() == (0, 0)
+
+    def test_unknown_task(self) -> None:
+        """Test the jobs of an unknown task fail, and it can not be enqueued."""
+        Job.objects.create(task='tests.unknown')
+        assert run_due_jobs() == (0, 1)
+        assert Job.objects.get().status == Job.Status.FAILED
+        with pytest.raises(LookupError):
+            queue.enqueue('tests.unknown', {})
+
+    def test_release_stale_jobs(self) -> None:
+        """Test the jobs claimed by a stopped worker are claimed again."""
+        queue.enqueue('tests.record', {'id': 1})
+        assert len(queue.claim('stopped', limit=10)) == 1
+        assert queue.claim('worker', limit=10) == []
+
+        assert queue.release_stale(60) == 0
+        Job.objects.update(claimed_at=timezone.now() - timedelta(seconds=61))
+        assert queue.release_stale(60) == 1
+        assert [job.attempts for job in queue.claim('worker', limit=10)] == [2]
+
+    def test_run_jobs_command(self) -> None:
+        """Test the command run the due jobs."""
+        queue.enqueue('tests.record', {'id': 1}, {'id': 2}, {'id': 3})
+        stdout = io.StringIO()
+        call_command('run_jobs', '--once', '--executor', 'inline', '--tasks', 'tests.record', stdout=stdout)
+        assert 'Ran 3 jobs, 0 failed' in stdout.getvalue()
+        assert not Job.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_jobs_on_threads() -> None:
+    """Test the thread executor run the batches on its own connections."""
+    queue.enqueue('tests.record', *[{'id': index} for index in range(5)])
+    assert run_due_jobs('thread') == (5, 0)
+    assert sorted(payload['id'] for batch in calls for payload in batch) == [0, 1, 2, 3, 4]
+    assert not Job.objects.exists()
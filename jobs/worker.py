@@ -0,0 +1,116 @@
+"""
+Worker running the background jobs, started by the `run_jobs` command.
+
+The worker claims the due jobs, splits them into the batches of their
+tasks and runs the batches on its executor: `thread`, a pool of threads
+for the tasks waiting on the database or the cache, `process`, a pool of
+processes for the CPU bound tasks, or `inline`, in the worker thread.
+"""
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, List, Optional, Tuple
+
+import django
+from django.conf import settings
+from django.db import close_old_connections
+
+from jobs import queue
+
+EXECUTORS = ('thread', 'process', 'inline')
+
+
+class InlineExecutor(Executor):
+    """Executor running the calls in the calling thread."""
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exception:
+            future.set_exception(exception)
+        return future
+
+
+def run_pooled_batch(job_ids: List[int]) -> Tuple[int, int]:
+    """Run a batch on a thread or a process of a pool, see `queue.run_batch()`."""
+    # The pooled threads and processes keep their connections between the batches.
+    close_old_connections()
+    try:
+        return queue.run_batch(job_ids)
+    finally:
+        close_old_connections()
+
+
+class Worker:
+    """
+    Worker claiming and running the due jobs.
+
+    Args:
+        executor: one of `EXECUTORS`
+        concurrency: number of threads or processes of the pool
+        tasks: only run the jobs of these tasks, None for all the tasks
+    """
+
+    def __init__(self, executor: str = 'thread', concurrency: int = 1, tasks: Optional[List[str]] = None) -> None:
+        self.name = '{host}-{pid}-{id}'.format(host=socket.gethostname(), pid=os.getpid(), id=uuid.uuid4().hex[:8])
+        self.tasks = tasks
+        self.inline = executor == 'inline'
+        if executor == 'thread':
+            self.executor: Executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='jobs-worker')
+        elif executor == 'process':
+            # Spawned rather than forked, so the processes do not share the
+            # connections of the worker.
+            self.executor = ProcessPoolExecutor(
+                max_workers=concurrency,
+                mp_context=get_context('spawn'),
+                initializer=django.setup,
+            )
+        else:
+            self.executor = InlineExecutor()
+
+    def __enter__(self) -> 'Worker':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.executor.shutdown()
+
+    def run_once(self) -> Tuple[int, int]:
+        """
+        Claim the due jobs and run them.
+
+        Returns:
+            the numbers of succeeded and failed jobs
+        """
+        queue.release_stale(settings.JOBS_CLAIM_TIMEOUT)
+        jobs = queue.claim(self.name, settings.JOBS_CLAIM_SIZE, self.tasks)
+        run = queue.run_batch if self.inline else run_pooled_batch
+        futures = [self.executor.submit(run, batch) for batch in queue.make_batches(jobs)]
+        results = [future.result() for future in futures]
+        return sum(done for done, _ in results), sum(failed for _, failed in results)
+
+    def run(self, stop: threading.Event, poll_interval: float, once: bool = False) -> Tuple[int, int]:
+        """
+        Run the due jobs until stopped, polling the queue when it is empty.
+
+        Args:
+            stop: event stopping the worker after its current jobs
+            poll_interval: number of seconds between two polls of an empty queue
+            once: stop when no job is due
+
+        Returns:
+            the total numbers of succeeded and failed jobs
+        """
+        total_done = total_failed = 0
+        while not stop.is_set():
+            done, failed = self.run_once()
+            total_done += done
+            total_failed += failed
+            if not done and not failed:
+                if once:
+                    break
+                stop.wait(poll_interval)
+        return total_done, total_failed
@@ -1,17 +1,80 @@
-from typing import Any
+import io
+import uuid
+from typing import Any, List, Set, Tuple, Type
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 
 from rest_framework import serializers
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 
-from notes.models import Note
-from notes.serializers import NoteSerializer, ShareNoteSerializer
+from notes import cache, search, sync, tasks, transfer
+from notes.models import Note, NoteChange, NoteImport, NoteShare
+from notes.pagination import (
+    ChangePagination,
+    KeysetPagination,
+    RankedPagination,
+    is_streaming,
+    streaming_response,
+)
+from notes.serializers import NoteSerializer, NoteSummarySerializer, NoteUpdateSerializer, ShareNoteSerializer
+
+# Number of skipped lines of an import whose errors are returned.
+IMPORT_MAX_ERRORS = 100
+
+VIEW_SERIALIZERS = {
+    'full': NoteSerializer,
+    'summary': NoteSummarySerializer,
+}
+
+
+def get_view_serializer(request: Request) -> Type[NoteSerializer]:
+    """
+    Get the serializer of the representation of the notes asked with `view`.
+
+    Args:
+        request: Http request, with `view=full` (default) or `view=summary`
+
+    Raises:
+        ValidationError: If the view is unknown.
+
+    Returns:
+        the serializer, with its fast read path `as_values()`
+    """
+    view = request.query_params.get('view', 'full')
+    if view not in VIEW_SERIALIZERS:
+        raise serializers.ValidationError(
+            {'view': ['Expected one of: {0}.'.format(', '.join(VIEW_SERIALIZERS))]},
+        )
+    return VIEW_SERIALIZERS[view]
+
+
+def get_archive_encoding(request: Request) -> str:
+    """
+    Get the archive encoding of an export or an import, asked with `compress`.
+
+    Raises:
+        ValidationError: If the encoding is not available.
+
+    Returns:
+        the encoding, empty for plain NDJSON
+    """
+    encoding = request.query_params.get('compress', '')
+    if encoding and encoding not in transfer.available_encodings():
+        raise serializers.ValidationError(
+            {'compress': ['Expected one of: {0}.'.format(', '.join(transfer.available_encodings()))]},
+        )
+    return encoding
 
 
 class NotesApiView(APIView):
@@ -19,22 +82,81 @@ class NotesApiView(APIView):
 
     permission_classes = [IsAuthenticated]
     serializer_class = NoteSerializer
+    pagination_class = KeysetPagination
     throttle_scope = 'high'
 
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
         Handle GET requests from `api/notes` and `api/notes/<int:id>`.
 
+        The notes owned by and shared with the request user are listed
+        together. The list is paginated on the note id: `page_size` sets the size of
+        a page and the `Link` header gives the url of the next page.
+        With `stream=1` the whole list is streamed chunk by chunk instead.
+        With `view=summary` the notes are summarized by their preview and
+        length, without reading their content.
+        Pages and notes are served from the cache of the request user.
+        The responses have an `ETag` and a `Last-Modified` header from the
+        latest change of the notes: a conditional request of the current
+        version gets a 304 without loading any note.
+
         Returns:
-            Http response with the list of notes for api/notes, 
+            Http response with the list of notes of the request user for api/notes, 
             or the note with the parameter id
         """
+        user = request.user
+        notes = Note.objects.accessible_by(user)
+        serializer_class = get_view_serializer(request)
+        kind, parts = self.get_cache_parts(request, kwargs)
+        validators = cache.make_validators(kind, parts, sync.latest_change(user.id, kwargs.get('id')))
+        response = cache.not_modified(request, validators)
+        if response is not None:
+            return response
+        # The entries of an older version are never served for a newer ETag.
+        parts = [*parts, validators and validators.etag]
+
         if kwargs.get('id'):
-            note = get_object_or_404(Note.objects.filter(id=kwargs.get('id')))
-            return Response(NoteSerializer(note, many=False).data)
-        else:  
-            notes = Note.objects.all()
-            return Response(NoteSerializer(notes, many=True).data)
+            response = cache.cached_response(
+                user.id,
+                kind,
+                parts,
+                lambda: Response(serializer_class.represent_row(
+                    get_object_or_404(serializer_class.as_values(notes), id=kwargs.get('id')),
+                )),
+            )
+        elif is_streaming(request):
+            response = streaming_response(serializer_class.as_values(notes), represent=serializer_class.represent_row)
+        else:
+            response = cache.cached_response(
+                user.id,
+                kind,
+                parts,
+                lambda: self.paginate(request, notes),
+            )
+        return cache.set_validators(response, validators)
+
+    @staticmethod
+    def get_cache_parts(request: Request, kwargs: dict) -> Tuple[str, list]:
+        """Get the kind of response of a GET request and the values identifying it."""
+        if kwargs.get('id'):
+            return 'note', [kwargs.get('id'), request.query_params.get('view', 'full')]
+        return 'list', sorted(request.query_params.lists())
+
+    def paginate(self, request: Request, notes: QuerySet) -> Response:
+        """
+        Build the response of a page of notes.
+
+        Args:
+            request: Http request
+            notes: the notes to paginate
+
+        Returns:
+            Http response with a page of notes
+        """
+        paginator = self.pagination_class()
+        serializer_class = get_view_serializer(request)
+        page = paginator.paginate_queryset(serializer_class.as_values(notes), request, view=self)
+        return paginator.get_paginated_response([serializer_class.represent_row(row) for row in page])
     
     def put(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
@@ -48,6 +170,24 @@ class NotesApiView(APIView):
         Returns:
             the HTTP response
         """
+        content = self.get_update_content(request, kwargs)
+        note = get_object_or_404(Note.objects.writable_by(request.user), id=kwargs.get('id'))
+        note.content = content
+        cache.invalidate(*self.save_note(note))
+
+        return Response('Udate note id: {id} successfully'.format(id=note.id))
+
+    @staticmethod
+    def get_update_content(request: Request, kwargs: dict) -> str:
+        """
+        Get the new content of the note of a PUT request.
+
+        Raises:
+            ValidationError: If the note id or the content is missing.
+
+        Returns:
+            the new content
+        """
         if not kwargs.get('id'):
             raise serializers.ValidationError(
                 'Parameter id is required.',
@@ -57,12 +197,7 @@ class NotesApiView(APIView):
             raise serializers.ValidationError(
                 'Parameter id is required.',
             )
-             
-        note = get_object_or_404(Note.objects.filter(id=kwargs.get('id')))
-        note.content = request.data.get('content')
-        note.save()
-
-        return Response('Udate note id: {id} successfully'.format(id=note.id))
+        return request.data.get('content')
 
     def post(
         self,
@@ -87,7 +222,8 @@ class NotesApiView(APIView):
 
         user = request.user
         note_data = serializer.validated_data
-        Note.objects.create(user=user, content=note_data['content'])
+        _, audience = self.create_note(user, note_data['content'])
+        cache.invalidate(*audience)
 
         return Response('Create the note: {content} successfully'.format(
             content=note_data['content'],
@@ -115,61 +251,588 @@ class NotesApiView(APIView):
                 'Parameter id is required.',
             )
         
-        note = get_object_or_404(Note, id=kwargs.get('id'))
-        note.delete()
+        note = get_object_or_404(Note.objects.filter(user=request.user), id=kwargs.get('id'))
+        cache.invalidate(*self.delete_note(note))
         return Response('Delete the note id: {id}'.format(id=kwargs.get('id')))
+
+    @staticmethod
+    def save_note(note: Note) -> Set[int]:
+        """
+        Save a note and record its change in the same transaction.
+
+        Args:
+            note: the updated note
+
+        Returns:
+            the ids of the users who can read the note
+        """
+        with transaction.atomic():
+            note.save()
+            return sync.record_changes([note.id])
+
+    @staticmethod
+    def create_note(user: User, content: str) -> Tuple[Note, Set[int]]:
+        """
+        Create a note and record its change in the same transaction.
+
+        The owner is locked before the insert, see `transfer.create_notes()`.
+
+        Args:
+            user: the owner of the note
+            content: the content of the note
+
+        Returns:
+            the note, and the ids of the users who can read it
+        """
+        with transaction.atomic():
+            sync.lock_users([user.id])
+            note = Note.objects.create(user=user, content=content)
+            return note, sync.record_changes([note.id])
+
+    @staticmethod
+    def delete_note(note: Note) -> Set[int]:
+        """
+        Delete a note and record its tombstones.
+
+        Args:
+            note: the note
+
+        Returns:
+            the ids of the users who could read the note
+        """
+        with transaction.atomic():
+            audience = sync.record_changes([note.id], deleted=True)
+            note.delete()
+        return audience
     
 
+class NoteSyncApiView(APIView):
+    """Api view for the delta sync of the notes"""
+
+    permission_classes = [IsAuthenticated]
+    pagination_class = ChangePagination
+    throttle_scope = 'high'
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests from `api/notes/sync`.
+
+        Only the notes changed since the version `since` are sent, the
+        clients keep the returned `version` for their next request. Without
+        `since`, every note readable by the request user is sent.
+
+        Args:
+            request: Http request.
+
+        Returns:
+            Http response with the `version`, the changed `notes` and the ids
+            of the `deleted` notes, and a `Link` header when there are more changes
+        """
+        user = request.user
+        paginator = self.pagination_class()
+        changes = paginator.paginate_queryset(
+            NoteChange.objects.filter(user=user).only('id', 'note_id', 'deleted'),
+            request,
+            view=self,
+        )
+        changed_ids = [change.note_id for change in changes if not change.deleted]
+        notes = list(NoteSerializer.as_values(Note.objects.accessible_by(user).filter(id__in=changed_ids)))
+        found = {note['id'] for note in notes}
+
+        if changes:
+            version = changes[-1].id
+        else:
+            version = paginator.decode_cursor(request) or 0
+        return paginator.get_paginated_response({
+            'version': paginator.encode_cursor(version),
+            'notes': notes,
+            # The notes the user can not read anymore are deleted for the client too.
+            'deleted': [change.note_id for change in changes if change.note_id not in found],
+        })
+
+
+class NoteBatchApiView(APIView):
+    """Api view for creating, updating and deleting notes in batches"""
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = NoteSerializer
+    throttle_scope = 'high'
+
+    def get_items(self, request: Request) -> list:
+        """
+        Get the items of a batch from the request body.
+
+        Args:
+            request: Http request.
+
+        Raises:
+            ValidationError: If the body is not a list or the batch is too large.
+
+        Returns:
+            the items of the batch
+        """
+        items = request.data
+        if not isinstance(items, list):
+            raise serializers.ValidationError('Expected a list of items.')
+        if len(items) > settings.NOTES_BATCH_MAX_SIZE:
+            raise serializers.ValidationError(
+                'A batch can not have more than {size} items.'.format(
+                    size=settings.NOTES_BATCH_MAX_SIZE,
+                ),
+            )
+        return items
+
+    @staticmethod
+    def validate_items(serializer_class: type, items: list) -> tuple:
+        """
+        Validate the items of a batch one by one.
+
+        Args:
+            serializer_class: the serializer of an item
+            items: the items of the batch
+
+        Returns:
+            the validated data of each item or None, and the errors of each item
+        """
+        serializer = serializer_class(data=items, many=True)
+        if serializer.is_valid():
+            return serializer.validated_data, [{}] * len(items)
+        errors = serializer.errors
+        validated_data = [
+            None if error else serializer.child.run_validation(item)
+            for item, error in zip(items, errors)
+        ]
+        return validated_data, errors
+
+    @staticmethod
+    def batch_response(results: list) -> Response:
+        """
+        Build the response of a batch.
+
+        Args:
+            results: the result of each item, with its `status`
+
+        Returns:
+            Http response with the results, 207 when only some items succeeded
+            and 400 when none did
+        """
+        failures = [result for result in results if result['status'] in ('invalid', 'not_found')]
+        if not failures:
+            status_code = status.HTTP_200_OK
+        elif len(failures) < len(results):
+            status_code = status.HTTP_207_MULTI_STATUS
+        else:
+            status_code = status.HTTP_400_BAD_REQUEST
+        return Response({'results': results}, status=status_code)
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle POST requests from `api/notes/batch` to create notes.
+
+        Args:
+            request: Http request with a list of `{"content": <str>}`.
+
+        Returns:
+            Http response with the id or the errors of each item
+        """
+        items = self.get_items(request)
+        validated_data, errors = self.validate_items(NoteSerializer, items)
+
+        user = request.user
+        notes = [
+            Note(user=user, content=data['content'])
+            for data in validated_data if data is not None
+        ]
+        # The notes and their changes are committed together, the sync sees every note.
+        with transaction.atomic():
+            transfer.create_notes(notes)
+            sync.record_changes([note.id for note in notes])
+        cache.invalidate(user.id)
+
+        created = iter(notes)
+        results = []
+        for index, error in enumerate(errors):
+            if error:
+                results.append({'index': index, 'status': 'invalid', 'errors': error})
+            else:
+                results.append({'index': index, 'status': 'created', 'id': next(created).id})
+        return self.batch_response(results)
+
+    def put(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle PUT requests from `api/notes/batch` to update notes.
+
+        Args:
+            request: Http request with a list of `{"id": <int>, "content": <str>}`.
+
+        Returns:
+            Http response with the status or the errors of each item
+        """
+        items = self.get_items(request)
+        validated_data, errors = self.validate_items(NoteUpdateSerializer, items)
+
+        user = request.user
+        ids = [data['id'] for data in validated_data if data is not None]
+        with transaction.atomic():
+            notes = Note.objects.writable_by(user).filter(id__in=ids).in_bulk()
+            # bulk_update() does not set the auto_now fields.
+            now = timezone.now()
+            for data in validated_data:
+                if data is not None and data['id'] in notes:
+                    notes[data['id']].content = data['content']
+                    notes[data['id']].updated_at = now
+            Note.objects.bulk_update(
+                notes.values(),
+                ['content', 'updated_at'],
+                batch_size=settings.NOTES_BATCH_MAX_SIZE,
+            )
+            tasks.reindex_notes(list(notes))
+            audience = sync.record_changes(list(notes))
+        cache.invalidate(user.id, *audience)
+
+        results = []
+        for index, (data, error) in enumerate(zip(validated_data, errors)):
+            if error:
+                results.append({'index': index, 'status': 'invalid', 'errors': error})
+            elif data['id'] not in notes:
+                results.append({'index': index, 'status': 'not_found', 'id': data['id']})
+            else:
+                results.append({'index': index, 'status': 'updated', 'id': data['id']})
+        return self.batch_response(results)
+
+    def delete(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle DELETE requests from `api/notes/batch` to delete notes.
+
+        Args:
+            request: Http request with a list of note ids.
+
+        Returns:
+            Http response with the status of each item
+        """
+        items = self.get_items(request)
+        user = request.user
+        valid = [isinstance(item, int) and not isinstance(item, bool) for item in items]
+        ids = [item for item, is_valid in zip(items, valid) if is_valid]
+        with transaction.atomic():
+            notes = Note.objects.filter(user=user, id__in=ids)
+            found = set(notes.select_for_update().values_list('id', flat=True))
+            audience = sync.record_changes(found, deleted=True)
+            notes.delete()
+        cache.invalidate(user.id, *audience)
+
+        results = []
+        for index, (item, is_valid) in enumerate(zip(items, valid)):
+            if not is_valid:
+                results.append({
+                    'index': index,
+                    'status': 'invalid',
+                    'errors': ['A valid integer is required.'],
+                })
+            elif item not in found:
+                results.append({'index': index, 'status': 'not_found', 'id': item})
+            else:
+                results.append({'index': index, 'status': 'deleted', 'id': item})
+        return self.batch_response(results)
+
+
+class NoteExportApiView(APIView):
+    """Api view for exporting the notes of a user"""
+
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'low'
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> StreamingHttpResponse:
+        """
+        Handle GET requests from `api/notes/export`.
+
+        The notes owned by the request user are streamed as NDJSON, one
+        note per line, read chunk by chunk. With `compress=gzip` (or `zstd`)
+        they are sent as a compressed archive. The `X-Notes-Count` header
+        gives the number of notes, to report the progress of the download.
+
+        Args:
+            request: Http request.
+
+        Raises:
+            ValidationError: If the archive encoding is not available.
+
+        Returns:
+            Http streaming response with the notes as an attachment
+        """
+        encoding = get_archive_encoding(request)
+        content_type, suffix = transfer.ARCHIVE_TYPES[encoding]
+        response = StreamingHttpResponse(
+            transfer.export_notes(request.user, encoding),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = 'attachment; filename="notes{suffix}"'.format(suffix=suffix)
+        response['X-Notes-Count'] = Note.objects.filter(user=request.user).count()
+        if encoding:
+            # Already compressed, the compression middleware sends it as is.
+            response['Cache-Control'] = 'no-transform'
+        return response
+
+
+class NoteImportApiView(APIView):
+    """Api view for importing notes exported by `api/notes/export`"""
+
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'low'
+    # The body is read as a stream, never parsed as a whole.
+    parser_classes: list = []
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests from `api/notes/import?key=<key>`.
+
+        Args:
+            request: Http request.
+
+        Returns:
+            Http response with the progress of an import of the request user
+        """
+        note_import = get_object_or_404(
+            NoteImport.objects.filter(user=request.user),
+            key=request.query_params.get('key', ''),
+        )
+        return Response(self.import_data(note_import))
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle POST requests from `api/notes/import`.
+
+        The body is an export of `api/notes/export`: NDJSON, or an archive
+        with `compress=gzip` (or `zstd`). The content of each line is
+        imported as a new note of the request user, in batches committed
+        one by one. An interrupted import posted again with its `key`
+        resumes after its last committed batch.
+
+        Args:
+            request: Http request.
+
+        Raises:
+            ValidationError: If the key or the archive encoding is invalid,
+                or the body can not be read.
+
+        Returns:
+            Http response with the key and the counters of the import, and the
+            errors of the first skipped lines
+        """
+        encoding = get_archive_encoding(request)
+        key = request.query_params.get('key') or uuid.uuid4().hex
+        if len(key) > NoteImport._meta.get_field('key').max_length:
+            raise serializers.ValidationError({'key': ['Ensure this field has no more than 64 characters.']})
+
+        errors: List[dict] = []
+
+        def report(note_import: NoteImport, batch_errors: list) -> None:
+            for line, line_errors in batch_errors[:IMPORT_MAX_ERRORS - len(errors)]:
+                errors.append({'line': line, 'errors': line_errors})
+
+        stream = request.stream or io.BytesIO()
+        try:
+            note_import = transfer.import_notes(
+                request.user,
+                transfer.open_lines(stream, encoding),
+                key,
+                progress=report,
+            )
+        except transfer.TransferError as error:
+            raise serializers.ValidationError({'key': key, 'detail': str(error)})
+        return Response({**self.import_data(note_import), 'errors': errors})
+
+    @staticmethod
+    def import_data(note_import: NoteImport) -> dict:
+        """Get the representation of an import."""
+        return {
+            'key': note_import.key,
+            'lines': note_import.lines,
+            'imported': note_import.imported,
+            'skipped': note_import.skipped,
+            'finished': note_import.finished_at is not None,
+        }
+
+
 class ShareNoteApiView(APIView):
     """Api view for share note"""
 
     permission_classes = [IsAuthenticated]
     serializer_class = ShareNoteSerializer
     throttle_scope = 'low'
+    # Upsert the shares, an existing share gets the new permission.
+    bulk_create_options = {'batch_size': settings.NOTES_BATCH_MAX_SIZE, **NoteShare.upsert_options()}
 
     def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
         Handle POST requests from `api/notes/<int:id>/share`.
 
+        The note, and the notes of `ids`, are shared with every user of
+        `username` and `usernames` with the given `permission`. The
+        recipients read the shared notes, nothing is copied. The changes
+        of the recipients are recorded by a background job: their delta
+        sync and their cached responses see the notes once it ran.
+
         Args:
             request: Http request.
 
         Returns:
-            Http response empty
+            Http response with the number of shares and the unknown usernames,
+            404 if none of the users exists
         """
         serializer = ShareNoteSerializer(data=request.data)
         # Validate received data. Return a 400 response if the data was invalid.
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
 
-        user = get_object_or_404(User, username=data['user']['username'])
-        note = get_object_or_404(Note, id=kwargs['id'])
-        new_note = Note(user=user, content=note.content)
-        new_note.save()
-        return Response()
-    
+        usernames = self.get_usernames(data)
+        users = list(User.objects.filter(username__in=usernames).exclude(id=request.user.id))
+
+        owned_notes = Note.objects.filter(user=request.user)
+        note = get_object_or_404(owned_notes, id=kwargs['id'])
+        note_ids = {note.id}
+        other_ids = set(data.get('ids', [])) - note_ids
+        if other_ids:
+            note_ids |= set(owned_notes.filter(id__in=other_ids).values_list('id', flat=True))
+
+        if users:
+            NoteShare.objects.bulk_create(
+                self.get_shares(users, note_ids, data['permission']),
+                **self.bulk_create_options,
+            )
+            tasks.record_shares.enqueue(self.get_share_changes(users, note_ids))
+        return self.share_response(request, usernames, users, note_ids, other_ids)
+
+    @staticmethod
+    def get_usernames(data: dict) -> List[str]:
+        """Get the usernames of `username` and `usernames` without duplicates."""
+        usernames = list(data.get('usernames', []))
+        if 'user' in data:
+            usernames.insert(0, data['user']['username'])
+        return list(dict.fromkeys(usernames))
+
+    @staticmethod
+    def get_share_changes(users: List[User], note_ids: Set[int]) -> dict:
+        """Build the payload of the `notes.record_shares` job of a share."""
+        return {'note_ids': sorted(note_ids), 'user_ids': [user.id for user in users]}
+
+    @staticmethod
+    def get_shares(users: List[User], note_ids: Set[int], permission: str) -> List[NoteShare]:
+        """Build the share of every note with every user."""
+        return [
+            NoteShare(note_id=note_id, recipient=user, permission=permission)
+            for user in users for note_id in sorted(note_ids)
+        ]
+
+    @staticmethod
+    def share_response(
+        request: Request,
+        usernames: List[str],
+        users: List[User],
+        note_ids: Set[int],
+        other_ids: Set[int],
+    ) -> Response:
+        """
+        Build the response of a share.
+
+        Args:
+            request: Http request
+            usernames: the requested usernames
+            users: the users the notes are shared with
+            note_ids: the ids of the shared notes
+            other_ids: the requested ids of `ids`
+
+        Returns:
+            Http response with the number of shares and the unknown usernames
+            and note ids, 404 if none of the users exists
+        """
+        found = {user.username for user in users} | {request.user.username}
+        return Response(
+            {
+                'shared': len(users) * len(note_ids),
+                'unknown_usernames': [username for username in usernames if username not in found],
+                'unknown_ids': sorted(other_ids - note_ids),
+            },
+            status=status.HTTP_200_OK if users else status.HTTP_404_NOT_FOUND,
+        )
+
 
 class SearchNoteApiView(APIView):
     """Api view for searching note"""
 
     permission_classes = [IsAuthenticated]
     serializer_class = NoteSerializer
+    pagination_class = RankedPagination
     throttle_scope = 'high'
 
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
         Handle GET requests from `api/notes/search/<str: query>`.
 
+        The notes owned by or shared with the request user containing every
+        word of the query, as a word or a word prefix, are served from the
+        search index, best match first.
+        The results are paginated with `page` and `page_size`, and
+        summarized with `view=summary`.
+
         Args:
             request: Http request.
 
         Raises:
             ParseError: If the query was not provided.
+            ValidationError: If the view is unknown.
 
         Returns:
             Http response with the list of notes for the request user.
         """
         user = request.user
         query = kwargs.get('query')
-        notes = Note.objects.filter(user=user, content__contains=query)
-        return Response(NoteSerializer(notes, many=True).data)
\ No newline at end of file
+        # An unknown view is rejected before reading the cache.
+        get_view_serializer(request)
+        return cache.cached_response(
+            user.id,
+            'search',
+            # The latest change keeps the workers whose cache was not invalidated from serving stale results.
+            [query, sorted(request.query_params.lists()), sync.latest_change(user.id)],
+            lambda: self.paginate(request, query),
+        )
+
+    def paginate(self, request: Request, query: str) -> Response:
+        """
+        Build the response of a page of search results.
+
+        Args:
+            request: Http request
+            query: the search query
+
+        Returns:
+            Http response with a page of notes
+        """
+        paginator = self.pagination_class()
+        serializer_class = get_view_serializer(request)
+        notes = serializer_class.as_values(self.get_queryset(request, query))
+        page = paginator.paginate_queryset(notes, request, view=self)
+        return paginator.get_paginated_response([serializer_class.represent_row(row) for row in page])
+
+    def get_queryset(self, request: Request, query: str) -> QuerySet:
+        """Get the notes of the request user matching a query, best match first."""
+        user = request.user
+        return search.get_backend().search(Note.objects.accessible_by(user), query, user)
+
+
+class NoteCacheStatsApiView(APIView):
+    """Api view for the hit and miss counters of the notes cache"""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests from `api/notes/cache/stats`.
+
+        Args:
+            request: Http request.
+
+        Returns:
+            Http response with the counters of this process, by kind of response.
+        """
+        return Response(cache.stats.snapshot())
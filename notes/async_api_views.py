@@ -0,0 +1,176 @@
+"""
+Async versions of the notes api views, routed when `ASYNC_VIEWS` is set.
+
+They share the logic of `notes.api_views` and only replace the database
+accesses with the async ORM, so one ASGI worker serves many concurrent
+requests while they wait on the database.
+"""
+from typing import Any
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from core.async_views import AsyncAPIView, aget_object_or_404
+from notes import cache, sync, tasks
+from notes.api_views import NotesApiView, SearchNoteApiView, ShareNoteApiView, get_view_serializer
+from notes.models import Note, NoteShare
+from notes.pagination import is_streaming
+from notes.serializers import NoteSerializer, ShareNoteSerializer
+
+
+class AsyncNotesApiView(AsyncAPIView, NotesApiView):
+    """Async version of `NotesApiView`."""
+
+    async def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests from `api/notes` and `api/notes/<int:id>`.
+
+        Raises:
+            ValidationError: If the list is asked with `stream=1`, Django 4.1
+                iterates the streamed content synchronously under ASGI.
+
+        Returns:
+            Http response with the list of notes of the request user for api/notes,
+            or the note with the parameter id
+        """
+        user = request.user
+        notes = Note.objects.accessible_by(user)
+        serializer_class = get_view_serializer(request)
+        if is_streaming(request) and not kwargs.get('id'):
+            raise serializers.ValidationError(
+                'Parameter stream is not supported by the async views.',
+            )
+
+        kind, parts = self.get_cache_parts(request, kwargs)
+        validators = cache.make_validators(kind, parts, await sync.alatest_change(user.id, kwargs.get('id')))
+        response = cache.not_modified(request, validators)
+        if response is not None:
+            return response
+        parts = [*parts, validators and validators.etag]
+
+        if kwargs.get('id'):
+            async def build() -> Response:
+                row = await aget_object_or_404(serializer_class.as_values(notes), id=kwargs.get('id'))
+                return Response(serializer_class.represent_row(row))
+
+            response = await cache.acached_response(user.id, kind, parts, build)
+        else:
+            response = await cache.acached_response(
+                user.id,
+                kind,
+                parts,
+                lambda: self.apaginate(request, notes),
+            )
+        return cache.set_validators(response, validators)
+
+    async def apaginate(self, request: Request, notes: Any) -> Response:
+        """Async version of `NotesApiView.paginate()`."""
+        paginator = self.pagination_class()
+        serializer_class = get_view_serializer(request)
+        page = await paginator.apaginate_queryset(serializer_class.as_values(notes), request, view=self)
+        return paginator.get_paginated_response([serializer_class.represent_row(row) for row in page])
+
+    async def put(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Handle a PUT request to update a note instance."""
+        content = self.get_update_content(request, kwargs)
+        note = await aget_object_or_404(Note.objects.writable_by(request.user), id=kwargs.get('id'))
+        note.content = content
+        audience = await sync_to_async(self.save_note)(note)
+        await cache.ainvalidate(*audience)
+
+        return Response('Udate note id: {id} successfully'.format(id=note.id))
+
+    async def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Handle a POST request to create a note instance."""
+        serializer = NoteSerializer(data=request.data)
+        # Validate received data. Return a 400 response if the data was invalid.
+        serializer.is_valid(raise_exception=True)
+
+        user = request.user
+        note_data = serializer.validated_data
+        _, audience = await sync_to_async(self.create_note)(user, note_data['content'])
+        await cache.ainvalidate(*audience)
+
+        return Response('Create the note: {content} successfully'.format(
+            content=note_data['content'],
+        ))
+
+    async def delete(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Handle a DELETE request to delete a note instance."""
+        if not kwargs.get('id'):
+            raise serializers.ValidationError(
+                'Parameter id is required.',
+            )
+
+        note = await aget_object_or_404(Note.objects.filter(user=request.user), id=kwargs.get('id'))
+        audience = await sync_to_async(self.delete_note)(note)
+        await cache.ainvalidate(*audience)
+        return Response('Delete the note id: {id}'.format(id=kwargs.get('id')))
+
+
+class AsyncShareNoteApiView(AsyncAPIView, ShareNoteApiView):
+    """Async version of `ShareNoteApiView`."""
+
+    async def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Handle POST requests from `api/notes/<int:id>/share`."""
+        serializer = ShareNoteSerializer(data=request.data)
+        # Validate received data. Return a 400 response if the data was invalid.
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        usernames = self.get_usernames(data)
+        users = [
+            user async for user in
+            User.objects.filter(username__in=usernames).exclude(id=request.user.id)
+        ]
+
+        owned_notes = Note.objects.filter(user=request.user)
+        note = await aget_object_or_404(owned_notes, id=kwargs['id'])
+        note_ids = {note.id}
+        other_ids = set(data.get('ids', [])) - note_ids
+        if other_ids:
+            note_ids |= {
+                note_id async for note_id in
+                owned_notes.filter(id__in=other_ids).values_list('id', flat=True)
+            }
+
+        if users:
+            await NoteShare.objects.abulk_create(
+                self.get_shares(users, note_ids, data['permission']),
+                **self.bulk_create_options,
+            )
+            await tasks.record_shares.aenqueue(self.get_share_changes(users, note_ids))
+        return self.share_response(request, usernames, users, note_ids, other_ids)
+
+
+class AsyncSearchNoteApiView(AsyncAPIView, SearchNoteApiView):
+    """Async version of `SearchNoteApiView`."""
+
+    async def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Handle GET requests from `api/notes/search/<str: query>`."""
+        user = request.user
+        query = kwargs.get('query')
+        # An unknown view is rejected before reading the cache.
+        get_view_serializer(request)
+        return await cache.acached_response(
+            user.id,
+            'search',
+            [query, sorted(request.query_params.lists()), await sync.alatest_change(user.id)],
+            lambda: self.apaginate(request, query),
+        )
+
+    async def apaginate(self, request: Request, query: str) -> Response:
+        """Async version of `SearchNoteApiView.paginate()`."""
+        paginator = self.pagination_class()
+        serializer_class = get_view_serializer(request)
+        page = await paginator.apaginate_queryset(
+            serializer_class.as_values(self.get_queryset(request, query)),
+            request,
+            view=self,
+        )
+        return paginator.get_paginated_response([serializer_class.represent_row(row) for row in page])
@@ -0,0 +1,18 @@
+"""App notes urls, with the async views where they exist"""
+from django.urls import path
+
+from notes import async_api_views
+from notes.urls import urlpatterns as sync_urlpatterns
+
+async_views = {
+    'notes-notes': async_api_views.AsyncNotesApiView,
+    'notes-note': async_api_views.AsyncNotesApiView,
+    'notes-share': async_api_views.AsyncShareNoteApiView,
+    'notes-search': async_api_views.AsyncSearchNoteApiView,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), async_views[pattern.name].as_view(), name=pattern.name)
+    if pattern.name in async_views else pattern
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,274 @@
+"""Per-user read-through cache of the notes api responses."""
+import hashlib
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import transaction
+from django.http import HttpRequest
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from rest_framework.response import Response
+
+
+class CacheStats:
+    """Thread safe hit and miss counters of the notes cache, by kind of response."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def record(self, kind: str, hit: bool) -> None:
+        """Count a hit or a miss of a kind of response."""
+        with self._lock:
+            counters = self._counters.setdefault(kind, {'hits': 0, 'misses': 0})
+            counters['hits' if hit else 'misses'] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the counters and hit ratios.
+
+        Returns:
+            the hits, misses and hit ratio of each kind of response
+        """
+        with self._lock:
+            counters = {kind: dict(values) for kind, values in self._counters.items()}
+        for values in counters.values():
+            total = values['hits'] + values['misses']
+            values['hit_ratio'] = values['hits'] / total if total else 0.0
+        return counters
+
+    def reset(self) -> None:
+        """Reset all the counters."""
+        with self._lock:
+            self._counters.clear()
+
+
+stats = CacheStats()
+
+
+def get_cache() -> BaseCache:
+    """Get the cache backend of the notes."""
+    return caches[settings.NOTES_CACHE_ALIAS]
+
+
+def _version_key(user_id: int) -> str:
+    return 'notes:version:{user_id}'.format(user_id=user_id)
+
+
+def get_version(user_id: int) -> str:
+    """
+    Get the current cache version of a user.
+
+    The version is a random token rather than a counter: if it was evicted,
+    a new one can never match entries cached before the eviction.
+
+    Args:
+        user_id: id of the user
+
+    Returns:
+        the cache version of the user
+    """
+    cache = get_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(user_id: int) -> str:
+    """Async version of `get_version()`."""
+    cache = get_cache()
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def _entry_key(user_id: int, version: str, kind: str, parts: tuple) -> str:
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return 'notes:{user_id}:{version}:{kind}:{digest}'.format(
+        user_id=user_id,
+        version=version,
+        kind=kind,
+        digest=digest,
+    )
+
+
+def _entry(response: Response) -> tuple:
+    """Get the cached part of a response: its data and the headers set by the view."""
+    headers = {
+        name: value for name, value in response.items() if name != 'Content-Type'
+    }
+    return response.data, headers
+
+
+def make_key(user_id: int, kind: str, *parts: Any) -> str:
+    """
+    Build the cache key of a response.
+
+    Args:
+        user_id: id of the user
+        kind: kind of response, e.g. `list`, `note` or `search`
+        parts: values identifying the response, e.g. the note id or query string
+
+    Returns:
+        the cache key
+    """
+    return _entry_key(user_id, get_version(user_id), kind, parts)
+
+
+def cached_response(
+    user_id: int,
+    kind: str,
+    parts: Iterable[Any],
+    build: Callable[[], Response],
+) -> Response:
+    """
+    Get a response from the cache, or build and cache it.
+
+    Only the data and the headers set by the view are cached, the response
+    is rendered again for every request.
+
+    Args:
+        user_id: id of the user
+        kind: kind of response, e.g. `list`, `note` or `search`
+        parts: values identifying the response
+        build: function building the response on a miss
+
+    Returns:
+        Http response
+    """
+    cache = get_cache()
+    key = make_key(user_id, kind, *parts)
+    cached: Optional[tuple] = cache.get(key)
+    stats.record(kind, hit=cached is not None)
+    if cached is not None:
+        data, headers = cached
+        return Response(data, headers=headers)
+
+    response = build()
+    cache.set(key, _entry(response), timeout=settings.NOTES_CACHE_TTL)
+    return response
+
+
+async def acached_response(
+    user_id: int,
+    kind: str,
+    parts: Iterable[Any],
+    build: Callable[[], Awaitable[Response]],
+) -> Response:
+    """Async version of `cached_response()`, with a coroutine function to build the response."""
+    cache = get_cache()
+    key = _entry_key(user_id, await aget_version(user_id), kind, tuple(parts))
+    cached: Optional[tuple] = await cache.aget(key)
+    stats.record(kind, hit=cached is not None)
+    if cached is not None:
+        data, headers = cached
+        return Response(data, headers=headers)
+
+    response = await build()
+    await cache.aset(key, _entry(response), timeout=settings.NOTES_CACHE_TTL)
+    return response
+
+
+def invalidate(*user_ids: int) -> None:
+    """
+    Invalidate all the cached responses of users.
+
+    A new version is set once the current transaction is committed, so a
+    concurrent read can not cache data older than the write under it.
+
+    Args:
+        user_ids: ids of the users
+    """
+    def bump_versions() -> None:
+        get_cache().set_many(
+            {_version_key(user_id): uuid.uuid4().hex for user_id in set(user_ids)},
+            timeout=None,
+        )
+
+    transaction.on_commit(bump_versions)
+
+
+# The transaction state is only reachable from a synchronous context.
+ainvalidate = sync_to_async(invalidate)
+
+
+@dataclass
+class Validators:
+    """Validators of a response for the conditional requests."""
+
+    etag: str
+    last_modified: int
+
+
+def make_validators(
+    kind: str,
+    parts: Iterable[Any],
+    change: Optional[Tuple[int, datetime]],
+) -> Optional[Validators]:
+    """
+    Build the validators of a response from the latest change of its notes.
+
+    The version of the change identifies the notes of the user, so the body
+    is not hashed: a strong ETag is built from the version and the values
+    identifying the response.
+
+    Args:
+        kind: kind of response, e.g. `list` or `note`
+        parts: values identifying the response, e.g. the query string
+        change: the version and the time of the latest change, see `sync.latest_change()`
+
+    Returns:
+        the validators, None without any change
+    """
+    if change is None:
+        return None
+    version, changed_at = change
+    digest = hashlib.md5(repr(tuple(parts)).encode('utf-8')).hexdigest()[:16]
+    return Validators(
+        etag='"{kind}-{version}-{digest}"'.format(kind=kind, version=version, digest=digest),
+        last_modified=int(changed_at.timestamp()),
+    )
+
+
+def not_modified(request: HttpRequest, validators: Optional[Validators]) -> Optional[HttpResponseBase]:
+    """
+    Answer a conditional request from the validators only.
+
+    Args:
+        request: Http request, with `If-None-Match` or `If-Modified-Since`
+        validators: the current validators of the response
+
+    Returns:
+        a 304 response when the client has the current version, otherwise None
+    """
+    if validators is None:
+        return None
+    response = get_conditional_response(
+        request,
+        etag=validators.etag,
+        last_modified=validators.last_modified,
+    )
+    return response and set_validators(response, validators)
+
+
+def set_validators(response: HttpResponseBase, validators: Optional[Validators]) -> HttpResponseBase:
+    """Set the `ETag` and `Last-Modified` headers of a response."""
+    if validators is not None and response.status_code in (200, 304):
+        response['ETag'] = validators.etag
+        response['Last-Modified'] = http_date(validators.last_modified)
+    return response
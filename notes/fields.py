@@ -0,0 +1,118 @@
+"""
+Text field storing its large values compressed.
+
+From `NOTES_CONTENT_COMPRESSION_MIN_SIZE` bytes, a value is compressed by
+the codec `NOTES_CONTENT_CODEC`, then stored in base64 after a marker of
+its codec: the column stays a text column, so the queries, the fixtures
+and the migrations see a text. The values read from the database are
+decompressed on their first use, e.g. when they are serialized, so the
+rows loaded but not rendered cost no decompression.
+
+The marker starts with the control character SOH (SQLite stops its
+string functions at a NUL). The rare values starting with it are stored
+as is, after the marker of the raw values.
+"""
+import base64
+import zlib
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import models
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.utils.functional import lazy
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+MARKER = '\x01'
+RAW = MARKER + '-'
+
+
+class ContentCodec(NamedTuple):
+    """Compression of the stored values, with the marker of its rows."""
+
+    marker: str
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+def available_codecs() -> Dict[str, ContentCodec]:
+    """Get the codecs whose package is installed, by name."""
+    codecs = {'zlib': ContentCodec(MARKER + 'z', zlib.compress, zlib.decompress)}
+    if zstandard is not None:
+        codecs['zstd'] = ContentCodec(
+            MARKER + 's',
+            lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+            lambda data: zstandard.ZstdDecompressor().decompress(data),
+        )
+    return codecs
+
+
+def encode(text: str) -> str:
+    """
+    Get the stored value of a text, compressed by `NOTES_CONTENT_CODEC` when it is large.
+
+    Args:
+        text: the text
+
+    Returns:
+        the value to store
+    """
+    data = text.encode('utf-8')
+    if settings.NOTES_CONTENT_CODEC and len(data) >= settings.NOTES_CONTENT_COMPRESSION_MIN_SIZE:
+        codec = available_codecs()[settings.NOTES_CONTENT_CODEC]
+        stored = codec.marker + base64.b64encode(codec.compress(data)).decode('ascii')
+        if len(stored) < len(data):
+            return stored
+    return RAW + text if text.startswith(MARKER) else text
+
+
+def decode(stored: str) -> str:
+    """Get the text of a stored value, see `encode()`."""
+    if not stored.startswith(MARKER):
+        return stored
+    if stored.startswith(RAW):
+        return stored[len(RAW):]
+    marker = stored[:len(RAW)]
+    for codec in available_codecs().values():
+        if codec.marker == marker:
+            return codec.decompress(base64.b64decode(stored[len(marker):])).decode('utf-8')
+    raise ValueError('Unknown codec marker {marker!r}.'.format(marker=marker))
+
+
+class StoredValue:
+    """A stored value, decoded once."""
+
+    __slots__ = ('stored', 'text')
+
+    def __init__(self, stored: str) -> None:
+        self.stored = stored
+        self.text: Optional[str] = None
+
+    def __reduce__(self) -> Any:
+        # The cached copies hold the text.
+        return StoredValue, (RAW + self.decode(),)
+
+    def decode(self) -> str:
+        if self.text is None:
+            self.text = decode(self.stored)
+        return self.text
+
+
+# A str proxy, decoded on the first use of a str method.
+lazy_text = lazy(StoredValue.decode, str)
+
+
+class CompressedTextField(models.TextField):
+    """`TextField` compressing its large values, see `notes.fields`."""
+
+    def from_db_value(self, value: Optional[str], expression: Any, connection: BaseDatabaseWrapper) -> Any:
+        if value is None or not value.startswith(MARKER):
+            return value
+        return lazy_text(StoredValue(value))
+
+    def get_prep_value(self, value: Any) -> Any:
+        value = super().get_prep_value(value)
+        return value if value is None else encode(value)
@@ -0,0 +1,66 @@
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import models, transaction
+from django.db.models.functions import Cast
+
+from notes import fields
+from notes.models import Note
+from notes.pagination import iter_chunks
+
+
+class Command(BaseCommand):
+    """Store the note contents again with the current compression settings."""
+
+    help = (
+        'Compress the note contents from NOTES_CONTENT_COMPRESSION_MIN_SIZE bytes with '
+        'NOTES_CONTENT_CODEC, or decompress them when it is empty, in batches. '
+        'Only the rows whose stored value changes are written, their notes are not modified.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.NOTES_STREAM_CHUNK_SIZE,
+            help='Number of notes read per query and written per transaction.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the sizes without changing anything.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        if settings.NOTES_CONTENT_CODEC and settings.NOTES_CONTENT_CODEC not in fields.available_codecs():
+            raise CommandError('The codec {0} is not available.'.format(settings.NOTES_CONTENT_CODEC))
+
+        # The stored values, as read by the database without decompression.
+        notes = Note.objects.only('id', 'content').annotate(stored=Cast('content', models.TextField()))
+        changed = before = after = 0
+        for chunk in iter_chunks(notes, options['batch_size']):
+            updates = []
+            for note in chunk:
+                text = str(note.content)
+                stored = fields.encode(text)
+                before += len(note.stored)
+                after += len(stored)
+                if stored != note.stored:
+                    note.content = text
+                    updates.append(note)
+            changed += len(updates)
+            if updates and not options['dry_run']:
+                with transaction.atomic():
+                    Note.objects.bulk_update(updates, ['content'])
+
+        self.stdout.write(self.style.SUCCESS(
+            '{verb} {count} notes, stored contents {before} -> {after} characters'.format(
+                verb='Would rewrite' if options['dry_run'] else 'Rewrote',
+                count=changed,
+                before=before,
+                after=after,
+            ),
+        ))
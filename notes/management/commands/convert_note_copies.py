@@ -0,0 +1,118 @@
+import hashlib
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+
+from notes import cache, sync
+from notes.models import Note, NoteShare
+from notes.pagination import iter_chunks
+
+
+class Command(BaseCommand):
+    """Turn the notes copied by the former share endpoint into shares."""
+
+    help = (
+        'Turn the copies of shared notes into shares of the original note. '
+        'A note is a copy when an older note of another user has the same content, '
+        'which the former share endpoint did not record: run with --dry-run first and '
+        'review the reported copies, two users may have written the same short note. '
+        'The copy is deleted, its user gets a write share of the older note, and the '
+        'shares of the copy are moved to the older note.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--min-length',
+            type=int,
+            required=True,
+            help='Ignore the notes shorter than this, short contents are likely not copies.',
+        )
+        parser.add_argument(
+            '--exclude',
+            type=int,
+            nargs='+',
+            default=[],
+            help='Ids of notes reported by --dry-run which are not copies.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the copies without changing anything.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['min_length'] < 1:
+            raise CommandError('--min-length must be positive.')
+        excluded = set(options['exclude'])
+        # Digest of a content -> (id, user id) of its oldest note.
+        originals: Dict[bytes, Tuple[int, int]] = {}
+        converted = 0
+        notes = Note.objects.only('id', 'user_id', 'content')
+        for chunk in iter_chunks(notes, settings.NOTES_STREAM_CHUNK_SIZE):
+            # Id of a copy -> (id, user id) of its original.
+            copies: Dict[int, Tuple[int, int]] = {}
+            shares = []
+            for note in chunk:
+                if len(note.content) < options['min_length'] or note.id in excluded:
+                    continue
+                digest = hashlib.sha256(note.content.encode('utf-8')).digest()
+                original = originals.setdefault(digest, (note.id, note.user_id))
+                if original[1] != note.user_id:
+                    self.stdout.write('Note {copy} of the user {user} is a copy of the note {original}'.format(
+                        copy=note.id, user=note.user_id, original=original[0],
+                    ))
+                    copies[note.id] = original
+                    # The user could update the copy.
+                    shares.append(NoteShare(
+                        note_id=original[0], recipient_id=note.user_id, permission=NoteShare.Permission.WRITE,
+                    ))
+            converted += len(copies)
+            if copies and not options['dry_run']:
+                self.convert(copies, shares)
+
+        self.stdout.write(self.style.SUCCESS(
+            '{verb} {count} copies into shares'.format(
+                verb='Would convert' if options['dry_run'] else 'Converted',
+                count=converted,
+            ),
+        ))
+
+    @staticmethod
+    def convert(copies: Dict[int, Tuple[int, int]], shares: List[NoteShare]) -> None:
+        """
+        Replace copies by shares of their originals.
+
+        Args:
+            copies: the id of each copy, and the id and the user id of its original
+            shares: the write shares of the originals with the users of the copies
+        """
+        with transaction.atomic():
+            # The shares of a copy are moved to its original, with its owner left out.
+            for share in NoteShare.objects.filter(note_id__in=list(copies)):
+                note_id, user_id = copies[share.note_id]
+                if share.recipient_id != user_id:
+                    shares.append(NoteShare(
+                        note_id=note_id, recipient_id=share.recipient_id, permission=share.permission,
+                    ))
+            # One share per note and recipient, write when any of them is.
+            permissions: Dict[Tuple[int, int], str] = {}
+            for share in shares:
+                key = (share.note_id, share.recipient_id)
+                if permissions.get(key) != NoteShare.Permission.WRITE:
+                    permissions[key] = share.permission
+            by_permission = defaultdict(list)
+            for (note_id, recipient_id), permission in permissions.items():
+                by_permission[permission].append(
+                    NoteShare(note_id=note_id, recipient_id=recipient_id, permission=permission),
+                )
+            # An existing share is upgraded to write, never downgraded to read.
+            NoteShare.objects.bulk_create(by_permission[NoteShare.Permission.READ], ignore_conflicts=True)
+            NoteShare.objects.bulk_create(by_permission[NoteShare.Permission.WRITE], **NoteShare.upsert_options())
+            recipients = {share.recipient_id for share in shares}
+            sync.record_changes({share.note_id for share in shares}, user_ids=recipients)
+            audience = sync.record_changes(list(copies), deleted=True)
+            Note.objects.filter(id__in=list(copies)).delete()
+        cache.invalidate(*recipients, *audience)
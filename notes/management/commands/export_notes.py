@@ -0,0 +1,66 @@
+import sys
+from typing import Any, BinaryIO
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from notes import transfer
+from notes.models import Note
+
+
+class Command(BaseCommand):
+    """Export the notes of a user as NDJSON."""
+
+    help = (
+        'Export the notes owned by a user as NDJSON, one note per line, optionally in a gzip '
+        'or zstd archive. The notes are read in chunks, the progress is written to stderr.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('username', help='The owner of the notes.')
+        parser.add_argument('path', help='The exported file, `-` for the standard output.')
+        parser.add_argument(
+            '--compress',
+            choices=transfer.available_encodings(),
+            help='Write a compressed archive, by default from the suffix of the path (.gz, .zst).',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Number of notes read per query, NOTES_STREAM_CHUNK_SIZE by default.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['chunk_size'] is not None and options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('The user {0} does not exist.'.format(options['username']))
+        encoding = options['compress'] or transfer.get_path_encoding(options['path'])
+        if encoding not in ('', *transfer.available_encodings()):
+            raise CommandError('The encoding {0} is not available.'.format(encoding))
+
+        total = Note.objects.filter(user=user).count()
+        chunks = transfer.export_notes(
+            user,
+            encoding,
+            options['chunk_size'],
+            progress=lambda exported: self.stderr.write('Exported {0}/{1} notes'.format(exported, total)),
+        )
+        with self.open_file(options['path']) as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stderr.write(self.style.SUCCESS(
+            'Exported the {total} notes of {username}'.format(total=total, username=user.username),
+        ))
+
+    @staticmethod
+    def open_file(path: str) -> BinaryIO:
+        if path == '-':
+            return open(sys.stdout.fileno(), 'wb', closefd=False)
+        try:
+            return open(path, 'wb')
+        except OSError as error:
+            raise CommandError(error)
+
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import sys
+import uuid
+from typing import Any, BinaryIO, List, Tuple
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from notes import transfer
+from notes.models import NoteImport
+
+
+class Command(BaseCommand):
+    """Import the notes of an NDJSON export for a user."""
+
+    help = (
+        'Import the notes of a file of export_notes or api/notes/export as new notes of a user, '
+        'in batches committed one by one. Started again with the same file (or --key), an '
+        'interrupted import resumes after its last committed batch. The invalid lines are skipped.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('username', help='The owner of the imported notes.')
+        parser.add_argument('path', help='The exported file, `-` for the standard input.')
+        parser.add_argument(
+            '--key',
+            help='Key of the import to resume, by default a hash of the absolute path of the file.',
+        )
+        parser.add_argument(
+            '--compress',
+            choices=transfer.available_encodings(),
+            help='Read a compressed archive, by default from the suffix of the path (.gz, .zst).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Number of lines imported per transaction, NOTES_BATCH_MAX_SIZE by default.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('The user {0} does not exist.'.format(options['username']))
+        path = options['path']
+        encoding = options['compress'] or transfer.get_path_encoding(path)
+        if encoding not in ('', *transfer.available_encodings()):
+            raise CommandError('The encoding {0} is not available.'.format(encoding))
+        key = options['key'] or self.get_key(path)
+        if len(key) > NoteImport._meta.get_field('key').max_length:
+            raise CommandError('--key must have at most 64 characters.')
+
+        resumed = NoteImport.objects.filter(user=user, key=key).values_list('lines', flat=True).first()
+        if resumed:
+            self.stderr.write('Resuming the import {key} after line {line}'.format(key=key, line=resumed))
+        with self.open_file(path) as input_file:
+            try:
+                note_import = transfer.import_notes(
+                    user,
+                    transfer.open_lines(input_file, encoding),
+                    key,
+                    options['batch_size'],
+                    progress=self.report,
+                )
+            except transfer.TransferError as error:
+                raise CommandError('{error} Run the command again to resume the import {key}.'.format(
+                    error=error,
+                    key=key,
+                ))
+
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {imported} notes, skipped {skipped} (import {key})'.format(
+                imported=note_import.imported,
+                skipped=note_import.skipped,
+                key=key,
+            ),
+        ))
+
+    @staticmethod
+    def get_key(path: str) -> str:
+        if path == '-':
+            return uuid.uuid4().hex
+        return hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def open_file(path: str) -> BinaryIO:
+        if path == '-':
+            return open(sys.stdin.fileno(), 'rb', closefd=False)
+        try:
+            return open(path, 'rb')
+        except OSError as error:
+            raise CommandError(error)
+
+    def report(self, note_import: NoteImport, errors: List[Tuple[int, object]]) -> None:
+        for line, reason in errors:
+            self.stderr.write('Skipped line {line}: {reason}'.format(line=line, reason=reason))
+        self.stderr.write('Imported {imported} notes up to line {line}'.format(
+            imported=note_import.imported,
+            line=note_import.lines,
+        ))
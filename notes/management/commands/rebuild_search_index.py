@@ -0,0 +1,18 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from notes import search
+
+
+class Command(BaseCommand):
+    """Rebuild the search index of the notes."""
+
+    help = 'Rebuild the search index of the notes, e.g. after changing NOTES_SEARCH_BACKEND.'
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        backend = search.get_backend()
+        backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS('Rebuilt the index of {0}'.format(type(backend).__name__)),
+        )
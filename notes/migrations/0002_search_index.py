@@ -0,0 +1,81 @@
+# Generated by Django 4.1.3 on 2026-10-18 16:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_fulltext_index(apps, schema_editor):
+    """Create the full-text index of the database, if it has one."""
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE notes_note_fts USING fts5("
+            "content, content='notes_note', content_rowid='id')"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER notes_note_fts_insert AFTER INSERT ON notes_note BEGIN "
+            "INSERT INTO notes_note_fts(rowid, content) VALUES (new.id, new.content); "
+            "END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER notes_note_fts_delete AFTER DELETE ON notes_note BEGIN "
+            "INSERT INTO notes_note_fts(notes_note_fts, rowid, content) "
+            "VALUES ('delete', old.id, old.content); "
+            "END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER notes_note_fts_update AFTER UPDATE OF content ON notes_note BEGIN "
+            "INSERT INTO notes_note_fts(notes_note_fts, rowid, content) "
+            "VALUES ('delete', old.id, old.content); "
+            "INSERT INTO notes_note_fts(rowid, content) VALUES (new.id, new.content); "
+            "END"
+        )
+        schema_editor.execute("INSERT INTO notes_note_fts(notes_note_fts) VALUES ('rebuild')")
+    elif schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'ALTER TABLE notes_note ADD FULLTEXT INDEX notes_note_content_ft (content)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    """Drop the full-text index of the database, if it has one."""
+    if schema_editor.connection.vendor == 'sqlite':
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute('DROP TRIGGER IF EXISTS notes_note_fts_{0}'.format(trigger))
+        schema_editor.execute('DROP TABLE IF EXISTS notes_note_fts')
+    elif schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE notes_note DROP INDEX notes_note_content_ft')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, verbose_name='Token')),
+                ('frequency', models.PositiveIntegerField(default=1, verbose_name='Frequency')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='notes.note', verbose_name='Note')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Note token',
+                'verbose_name_plural': 'Note tokens',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notetoken',
+            index=models.Index(fields=['user', 'token'], name='notes_token_user_token_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notetoken',
+            constraint=models.UniqueConstraint(fields=('note', 'token'), name='notes_token_unique_note_token'),
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
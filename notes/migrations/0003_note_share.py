@@ -0,0 +1,33 @@
+# Generated by Django 4.1.3 on 2026-10-18 16:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0002_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteShare',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('permission', models.CharField(choices=[('read', 'Read'), ('write', 'Write')], default='read', max_length=5, verbose_name='Permission')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shares', to='notes.note', verbose_name='Note')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='note_shares', to=settings.AUTH_USER_MODEL, verbose_name='Recipient')),
+            ],
+            options={
+                'verbose_name': 'Note share',
+                'verbose_name_plural': 'Note shares',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='noteshare',
+            constraint=models.UniqueConstraint(fields=('recipient', 'note'), name='notes_share_unique_recipient_note'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 4.1.3 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def restore_fts_triggers(apps, schema_editor):
+    """Create the triggers of the SQLite FTS5 index again, SQLite dropped them with the altered table."""
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS notes_note_fts_insert AFTER INSERT ON notes_note BEGIN "
+            "INSERT INTO notes_note_fts(rowid, content) VALUES (new.id, new.content); "
+            "END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS notes_note_fts_delete AFTER DELETE ON notes_note BEGIN "
+            "INSERT INTO notes_note_fts(notes_note_fts, rowid, content) "
+            "VALUES ('delete', old.id, old.content); "
+            "END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS notes_note_fts_update AFTER UPDATE OF content ON notes_note BEGIN "
+            "INSERT INTO notes_note_fts(notes_note_fts, rowid, content) "
+            "VALUES ('delete', old.id, old.content); "
+            "INSERT INTO notes_note_fts(rowid, content) VALUES (new.id, new.content); "
+            "END"
+        )
+
+
+def create_content_prefix_index(apps, schema_editor):
+    """Create the index of the content prefixes on MySQL, which can not index a whole TEXT."""
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE INDEX notes_note_user_content_idx ON notes_note (user_id, content(255))'
+        )
+
+
+def drop_content_prefix_index(apps, schema_editor):
+    """Drop the index of the content prefixes on MySQL."""
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX notes_note_user_content_idx ON notes_note')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0003_note_share'),
+    ]
+
+    operations = [
+        # Reverted last, after the table is altered back.
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.AlterModelOptions(
+            name='note',
+            options={'ordering': ['id'], 'verbose_name': 'Note', 'verbose_name_plural': 'Notes'},
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Created at'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Updated at'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'id'], name='notes_note_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'created_at'], name='notes_note_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'updated_at'], name='notes_note_user_updated_idx'),
+        ),
+        # The (user, id) index serves the foreign key, on MySQL too.
+        migrations.AlterField(
+            model_name='note',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notes', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.RunPython(create_content_prefix_index, drop_content_prefix_index),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+    ]
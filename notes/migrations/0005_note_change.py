@@ -0,0 +1,61 @@
+# Generated by Django 4.1.3 on 2026-10-18 17:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def record_existing_notes(apps, schema_editor):
+    """Record a change of every existing note for its owner and recipients, for the first sync."""
+    Note = apps.get_model('notes', 'Note')
+    NoteShare = apps.get_model('notes', 'NoteShare')
+    NoteChange = apps.get_model('notes', 'NoteChange')
+    last_id = 0
+    while True:
+        notes = list(
+            Note.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'user_id')[:1000]
+        )
+        if not notes:
+            break
+        last_id = notes[-1][0]
+        shares = NoteShare.objects.filter(
+            note_id__in=[note_id for note_id, _ in notes],
+        ).values_list('note_id', 'recipient_id')
+        NoteChange.objects.bulk_create(
+            [NoteChange(note_id=note_id, user_id=user_id) for note_id, user_id in notes]
+            + [NoteChange(note_id=note_id, user_id=user_id) for note_id, user_id in shares],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0004_note_timestamps_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_id', models.BigIntegerField(verbose_name='Note id')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Deleted')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, verbose_name='Changed at')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Note change',
+                'verbose_name_plural': 'Note changes',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notechange',
+            index=models.Index(fields=['user', 'id'], name='notes_change_user_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notechange',
+            constraint=models.UniqueConstraint(fields=('note_id', 'user'), name='notes_change_unique_note_user'),
+        ),
+        migrations.RunPython(record_existing_notes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.3 on 2026-10-18 17:34
+
+from django.db import migrations
+import notes.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0005_note_change'),
+    ]
+
+    operations = [
+        # The column stays a text column: only the state changes, SQLite
+        # would otherwise rebuild the table and drop its FTS5 triggers.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='note',
+                    name='content',
+                    field=notes.fields.CompressedTextField(verbose_name='Content'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.1.3 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+def restore_fts_triggers(apps, schema_editor):
+    """Create the triggers of the SQLite FTS5 index again, SQLite dropped them with the altered table."""
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS notes_note_fts_insert AFTER INSERT ON notes_note BEGIN "
+            "INSERT INTO notes_note_fts(rowid, content) VALUES (new.id, new.content); "
+            "END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS notes_note_fts_delete AFTER DELETE ON notes_note BEGIN "
+            "INSERT INTO notes_note_fts(notes_note_fts, rowid, content) "
+            "VALUES ('delete', old.id, old.content); "
+            "END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS notes_note_fts_update AFTER UPDATE OF content ON notes_note BEGIN "
+            "INSERT INTO notes_note_fts(notes_note_fts, rowid, content) "
+            "VALUES ('delete', old.id, old.content); "
+            "INSERT INTO notes_note_fts(rowid, content) VALUES (new.id, new.content); "
+            "END"
+        )
+
+
+def fill_summaries(apps, schema_editor):
+    """Set the preview and the content length of the existing notes."""
+    Note = apps.get_model('notes', 'Note')
+    last_id = 0
+    while True:
+        notes = list(Note.objects.filter(id__gt=last_id).order_by('id').only('id', 'content')[:1000])
+        if not notes:
+            break
+        last_id = notes[-1].id
+        for note in notes:
+            content = str(note.content)
+            note.preview = content[:200]
+            note.content_length = len(content)
+        Note.objects.bulk_update(notes, ['preview', 'content_length'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0006_note_content_compression'),
+    ]
+
+    operations = [
+        # Reverted last, after the table is altered back.
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.AddField(
+            model_name='note',
+            name='content_length',
+            field=models.PositiveIntegerField(default=0, verbose_name='Content length'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='preview',
+            field=models.CharField(blank=True, default='', max_length=200, verbose_name='Preview'),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
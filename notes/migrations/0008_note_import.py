@@ -0,0 +1,38 @@
+# Generated by Django 4.1.3 on 2026-10-18 17:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0007_note_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, verbose_name='Key')),
+                ('lines', models.PositiveBigIntegerField(default=0, verbose_name='Lines')),
+                ('imported', models.PositiveBigIntegerField(default=0, verbose_name='Imported')),
+                ('skipped', models.PositiveBigIntegerField(default=0, verbose_name='Skipped')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished at')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Note import',
+                'verbose_name_plural': 'Note imports',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='noteimport',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='notes_import_unique_user_key'),
+        ),
+    ]
@@ -1,6 +1,69 @@
-from django.db import models
+from typing import Any, Iterable, List
+
+from django.db import connection, models
+from django.db.models import FilteredRelation, Q
 from django.contrib.auth.models import User
 
+from notes.fields import CompressedTextField
+
+# Number of characters of the content kept in the preview of a note.
+PREVIEW_LENGTH = 200
+
+SUMMARY_FIELDS = ['preview', 'content_length']
+
+
+class NoteQuerySet(models.QuerySet):
+    """Queryset of the notes."""
+
+    def accessible_by(self, user: User) -> 'NoteQuerySet':
+        """
+        Filter the notes owned by or shared with a user.
+
+        The shares of the user are joined with a filtered LEFT JOIN, so
+        there is at most one row per note in a single query.
+
+        Args:
+            user: the user
+
+        Returns:
+            the notes the user can read
+        """
+        return self.annotate(
+            user_share=FilteredRelation('shares', condition=Q(shares__recipient=user)),
+        ).filter(Q(user=user) | Q(user_share__isnull=False))
+
+    def writable_by(self, user: User) -> 'NoteQuerySet':
+        """
+        Filter the notes owned by or shared for writing with a user.
+
+        Args:
+            user: the user
+
+        Returns:
+            the notes the user can update
+        """
+        return self.annotate(
+            user_share=FilteredRelation('shares', condition=Q(shares__recipient=user)),
+        ).filter(Q(user=user) | Q(user_share__permission=NoteShare.Permission.WRITE))
+
+    def bulk_create(self, objs: Iterable['Note'], *args: Any, **kwargs: Any) -> List['Note']:
+        """Insert notes with their summaries, see `Note.set_summary()`."""
+        objs = list(objs)
+        for note in objs:
+            note.set_summary()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs: Iterable['Note'], fields: Iterable[str], *args: Any, **kwargs: Any) -> int:
+        """Update notes, with their summaries when their content is updated."""
+        fields = list(fields)
+        if 'content' in fields:
+            objs = list(objs)
+            for note in objs:
+                note.set_summary()
+            fields += SUMMARY_FIELDS
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
 class Note(models.Model):
     """Model Note."""
 
@@ -9,12 +72,253 @@ class Note(models.Model):
         verbose_name='User',
         related_name='notes',
         on_delete=models.CASCADE,
+        # Served by the (user, id) index.
+        db_index=False,
     )
 
-    content = models.TextField(
+    # The large contents are compressed, see notes.fields.
+    content = CompressedTextField(
         verbose_name='Content',
     )
 
+    # Summary of the content, kept in sync on writes by set_summary().
+    preview = models.CharField(
+        verbose_name='Preview',
+        max_length=PREVIEW_LENGTH,
+        blank=True,
+        default='',
+    )
+
+    content_length = models.PositiveIntegerField(
+        verbose_name='Content length',
+        default=0,
+    )
+
+    created_at = models.DateTimeField(
+        verbose_name='Created at',
+        auto_now_add=True,
+    )
+
+    updated_at = models.DateTimeField(
+        verbose_name='Updated at',
+        auto_now=True,
+    )
+
+    objects = NoteQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Note'
         verbose_name_plural = 'Notes'
+        # The keyset pagination and the batches walk the notes by id.
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id'], name='notes_note_user_id_idx'),
+            models.Index(fields=['user', 'created_at'], name='notes_note_user_created_idx'),
+            models.Index(fields=['user', 'updated_at'], name='notes_note_user_updated_idx'),
+        ]
+
+    def set_summary(self) -> None:
+        """Set the preview and the length of the content."""
+        content = str(self.content)
+        self.preview = content[:PREVIEW_LENGTH]
+        self.content_length = len(content)
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        update_fields = kwargs.get('update_fields')
+        # Without its content loaded, only the other fields are saved.
+        if 'content' not in self.get_deferred_fields() and (update_fields is None or 'content' in update_fields):
+            self.set_summary()
+            if update_fields is not None:
+                kwargs['update_fields'] = [*update_fields, *SUMMARY_FIELDS]
+        super().save(*args, **kwargs)
+
+
+class NoteShare(models.Model):
+    """Model NoteShare, a note shared with a user without copying it."""
+
+    class Permission(models.TextChoices):
+        READ = 'read', 'Read'
+        WRITE = 'write', 'Write'
+
+    note = models.ForeignKey(
+        to=Note,
+        verbose_name='Note',
+        related_name='shares',
+        on_delete=models.CASCADE,
+    )
+
+    recipient = models.ForeignKey(
+        to=User,
+        verbose_name='Recipient',
+        related_name='note_shares',
+        on_delete=models.CASCADE,
+    )
+
+    permission = models.CharField(
+        verbose_name='Permission',
+        max_length=5,
+        choices=Permission.choices,
+        default=Permission.READ,
+    )
+
+    class Meta:
+        verbose_name = 'Note share'
+        verbose_name_plural = 'Note shares'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipient', 'note'],
+                name='notes_share_unique_recipient_note',
+            ),
+        ]
+
+    @staticmethod
+    def upsert_options() -> dict:
+        """Get the options of `bulk_create()` giving the existing shares their new permission."""
+        options = {'update_conflicts': True, 'update_fields': ['permission']}
+        # MySQL upserts on any unique key, it does not take the conflict target.
+        if connection.features.supports_update_conflicts_with_target:
+            options['unique_fields'] = ['recipient_id', 'note_id']
+        return options
+
+
+class NoteToken(models.Model):
+    """Entry of the inverted token index of the notes."""
+
+    user = models.ForeignKey(
+        to=User,
+        verbose_name='User',
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+
+    note = models.ForeignKey(
+        to=Note,
+        verbose_name='Note',
+        related_name='tokens',
+        on_delete=models.CASCADE,
+    )
+
+    token = models.CharField(
+        verbose_name='Token',
+        max_length=64,
+    )
+
+    frequency = models.PositiveIntegerField(
+        verbose_name='Frequency',
+        default=1,
+    )
+
+    class Meta:
+        verbose_name = 'Note token'
+        verbose_name_plural = 'Note tokens'
+        indexes = [
+            models.Index(fields=['user', 'token'], name='notes_token_user_token_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['note', 'token'], name='notes_token_unique_note_token'),
+        ]
+
+
+class NoteChange(models.Model):
+    """
+    Latest change of a note for a user who can read it, read by the delta sync.
+
+    Each (user, note) pair keeps one row, inserted again on every change: its
+    id is the version of the change. The row of a deleted note is a tombstone.
+    """
+
+    user = models.ForeignKey(
+        to=User,
+        verbose_name='User',
+        related_name='+',
+        on_delete=models.CASCADE,
+        # Served by the (user, id) index.
+        db_index=False,
+    )
+
+    # Not a foreign key: the tombstones outlive their notes.
+    note_id = models.BigIntegerField(
+        verbose_name='Note id',
+    )
+
+    deleted = models.BooleanField(
+        verbose_name='Deleted',
+        default=False,
+    )
+
+    changed_at = models.DateTimeField(
+        verbose_name='Changed at',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Note change'
+        verbose_name_plural = 'Note changes'
+        indexes = [
+            models.Index(fields=['user', 'id'], name='notes_change_user_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['note_id', 'user'], name='notes_change_unique_note_user'),
+        ]
+
+
+class NoteImport(models.Model):
+    """
+    Progress of an import of notes, see `notes.transfer.import_notes()`.
+
+    Its counters are committed with each batch of notes, so an import
+    started again with the same key resumes after the last committed batch.
+    """
+
+    user = models.ForeignKey(
+        to=User,
+        verbose_name='User',
+        related_name='+',
+        on_delete=models.CASCADE,
+        # Served by the (user, key) unique index.
+        db_index=False,
+    )
+
+    key = models.CharField(
+        verbose_name='Key',
+        max_length=64,
+    )
+
+    # Number of lines of the file read in the committed batches.
+    lines = models.PositiveBigIntegerField(
+        verbose_name='Lines',
+        default=0,
+    )
+
+    imported = models.PositiveBigIntegerField(
+        verbose_name='Imported',
+        default=0,
+    )
+
+    skipped = models.PositiveBigIntegerField(
+        verbose_name='Skipped',
+        default=0,
+    )
+
+    created_at = models.DateTimeField(
+        verbose_name='Created at',
+        auto_now_add=True,
+    )
+
+    updated_at = models.DateTimeField(
+        verbose_name='Updated at',
+        auto_now=True,
+    )
+
+    finished_at = models.DateTimeField(
+        verbose_name='Finished at',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'Note import'
+        verbose_name_plural = 'Note imports'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='notes_import_unique_user_key'),
+        ]
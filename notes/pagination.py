@@ -0,0 +1,347 @@
+"""Pagination and streaming helpers for the notes api."""
+import base64
+import binascii
+from typing import Any, Callable, Iterator, Optional, Type
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+from rest_framework import serializers
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class LinkHeaderPagination(BasePagination):
+    """
+    Base pagination of the notes api.
+
+    The body stays a plain list, the next page is advertised with a
+    `Link: <url>; rel="next"` header.
+    """
+
+    page_size_query_param = 'page_size'
+
+    def __init__(self) -> None:
+        self.base_url: Optional[str] = None
+
+    def get_page_size(self, request: Request) -> int:
+        """
+        Get the page size from the query string, bounded by the settings.
+
+        Args:
+            request: Http request.
+
+        Raises:
+            ValidationError: If the page size is not a positive integer.
+
+        Returns:
+            the number of notes in a page
+        """
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is None:
+            return settings.NOTES_PAGE_SIZE
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            page_size = 0
+        if page_size < 1:
+            raise serializers.ValidationError(
+                'Parameter page_size must be a positive integer.',
+            )
+        return min(page_size, settings.NOTES_MAX_PAGE_SIZE)
+
+    def get_page_queryset(self, queryset: QuerySet, request: Request) -> QuerySet:
+        """Get the query of the page of the request, with one more row than the page size."""
+        raise NotImplementedError('get_page_queryset() must be implemented.')
+
+    def set_page(self, rows: list) -> list:
+        """Read the rows of the page query and return the page."""
+        raise NotImplementedError('set_page() must be implemented.')
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet,
+        request: Request,
+        view: Any = None,
+    ) -> list:
+        """
+        Fetch one page of the queryset.
+
+        Args:
+            queryset: the queryset to paginate
+            request: Http request
+            view: the api view
+
+        Returns:
+            the model instances of the page
+        """
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(
+        self,
+        queryset: QuerySet,
+        request: Request,
+        view: Any = None,
+    ) -> list:
+        """Async version of `paginate_queryset()`."""
+        return self.set_page([row async for row in self.get_page_queryset(queryset, request)])
+
+    def get_next_link(self) -> Optional[str]:
+        """Get the url of the next page, None on the last page."""
+        raise NotImplementedError('get_next_link() must be implemented.')
+
+    def get_paginated_response(self, data: Any) -> Response:
+        """
+        Build the response of a page.
+
+        Args:
+            data: the serialized page
+
+        Returns:
+            Http response with the page and a `Link` header to the next page
+        """
+        headers = {}
+        next_link = self.get_next_link()
+        if next_link:
+            headers['Link'] = '<{url}>; rel="next"'.format(url=next_link)
+        return Response(data, headers=headers)
+
+
+class KeysetPagination(LinkHeaderPagination):
+    """
+    Cursor pagination on the primary key.
+
+    Every page is a `pk > <last pk>` range scan limited to the page size,
+    so the cost of a page does not depend on its position in the list.
+    """
+
+    cursor_query_param = 'cursor'
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.page_size = 0
+        self.next_position: Optional[int] = None
+
+    def decode_cursor(self, request: Request) -> Optional[int]:
+        """
+        Decode the cursor of the query string into the last seen pk.
+
+        Args:
+            request: Http request.
+
+        Raises:
+            ValidationError: If the cursor is malformed.
+
+        Returns:
+            the last seen pk, None for the first page
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            return int(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise serializers.ValidationError('Invalid cursor.')
+
+    @staticmethod
+    def encode_cursor(position: int) -> str:
+        """Encode a pk into an opaque cursor."""
+        return base64.urlsafe_b64encode(str(position).encode('ascii')).decode('ascii')
+
+    def get_page_queryset(self, queryset: QuerySet, request: Request) -> QuerySet:
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        self.base_url = request.build_absolute_uri()
+
+        if position is not None:
+            queryset = queryset.filter(pk__gt=position)
+        # Fetch one more row to know if there is a next page.
+        return queryset.order_by('pk')[:self.page_size + 1]
+
+    def set_page(self, rows: list) -> list:
+        page = rows[:self.page_size]
+        self.next_position = get_position(page[-1]) if len(rows) > self.page_size else None
+        return page
+
+    def get_next_link(self) -> Optional[str]:
+        """Get the url of the next page, None on the last page."""
+        if self.next_position is None:
+            return None
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+
+class ChangePagination(KeysetPagination):
+    """
+    Keyset pagination of the note changes.
+
+    The cursor `since` is the version of the last change seen by the client.
+    """
+
+    cursor_query_param = 'since'
+
+
+class RankedPagination(LinkHeaderPagination):
+    """
+    Page number pagination of a ranked queryset.
+
+    Ranked results have no stable key to seek on, pages are fetched with
+    `LIMIT`/`OFFSET` and without any `COUNT` query.
+    """
+
+    page_query_param = 'page'
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.page_size = 0
+        self.page_number = 1
+        self.next_page: Optional[int] = None
+
+    def get_page_number(self, request: Request) -> int:
+        """
+        Get the page number from the query string.
+
+        Args:
+            request: Http request.
+
+        Raises:
+            ValidationError: If the page number is not a positive integer,
+                or is above `NOTES_SEARCH_MAX_PAGE`.
+
+        Returns:
+            the page number, starting from 1
+        """
+        try:
+            page = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            page = 0
+        if page < 1:
+            raise serializers.ValidationError(
+                'Parameter page must be a positive integer.',
+            )
+        if page > settings.NOTES_SEARCH_MAX_PAGE:
+            raise serializers.ValidationError(
+                'Parameter page must be at most {max_page}.'.format(max_page=settings.NOTES_SEARCH_MAX_PAGE),
+            )
+        return page
+
+    def get_page_queryset(self, queryset: QuerySet, request: Request) -> QuerySet:
+        self.page_size = self.get_page_size(request)
+        self.page_number = self.get_page_number(request)
+        self.base_url = request.build_absolute_uri()
+
+        offset = (self.page_number - 1) * self.page_size
+        # Fetch one more row to know if there is a next page.
+        return queryset[offset:offset + self.page_size + 1]
+
+    def set_page(self, rows: list) -> list:
+        self.next_page = self.page_number + 1 if len(rows) > self.page_size else None
+        return rows[:self.page_size]
+
+    def get_next_link(self) -> Optional[str]:
+        """Get the url of the next page, None on the last page."""
+        if self.next_page is None:
+            return None
+        return replace_query_param(self.base_url, self.page_query_param, self.next_page)
+
+
+def is_streaming(request: Request) -> bool:
+    """Check if the client asked for a streamed list with `?stream=1`."""
+    return request.query_params.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def get_position(row: Any) -> int:
+    """Get the pk of a model instance, or of the values of a row with the `id` field."""
+    return row['id'] if isinstance(row, dict) else row.pk
+
+
+def iter_chunks(queryset: QuerySet, chunk_size: int) -> Iterator[list]:
+    """
+    Iterate over a queryset in chunks of rows.
+
+    Each chunk is a separate `pk > <last pk>` query, so at most one chunk
+    is held in memory whatever the database driver buffers.
+
+    Args:
+        queryset: the queryset to iterate over
+        chunk_size: the number of rows per query
+
+    Yields:
+        lists of at most `chunk_size` model instances, or values
+    """
+    queryset = queryset.order_by('pk')
+    position = None
+    while True:
+        chunk_queryset = queryset if position is None else queryset.filter(pk__gt=position)
+        chunk = list(chunk_queryset[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        position = get_position(chunk[-1])
+
+
+def stream_json_list(
+    queryset: QuerySet,
+    serializer_class: Optional[Type[serializers.Serializer]] = None,
+    chunk_size: Optional[int] = None,
+    represent: Optional[Callable[[dict], dict]] = None,
+) -> Iterator[bytes]:
+    """
+    Serialize a queryset into a JSON array, one chunk at a time.
+
+    Args:
+        queryset: the queryset to serialize
+        serializer_class: the serializer of a model instance, None when the
+            queryset gives rows of values, e.g. `NoteSerializer.as_values()`
+        chunk_size: the number of rows per query
+        represent: the representation of a row of values, e.g.
+            `NoteSerializer.represent_row()`, None when the rows are
+            the representations
+
+    Yields:
+        the JSON array as bytes
+    """
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    separator = b'['
+    for chunk in iter_chunks(queryset, chunk_size or settings.NOTES_STREAM_CHUNK_SIZE):
+        if serializer_class:
+            items = serializer_class(chunk, many=True).data
+        else:
+            items = map(represent, chunk) if represent else chunk
+        yield separator + b','.join(
+            encoder.encode(item).encode('utf-8') for item in items
+        )
+        separator = b','
+    yield b'[]' if separator == b'[' else b']'
+
+
+def streaming_response(
+    queryset: QuerySet,
+    serializer_class: Optional[Type[serializers.Serializer]] = None,
+    represent: Optional[Callable[[dict], dict]] = None,
+) -> StreamingHttpResponse:
+    """
+    Build a streaming JSON response of a queryset.
+
+    Args:
+        queryset: the queryset to serialize
+        serializer_class: the serializer of a model instance, see `stream_json_list()`
+        represent: the representation of a row of values, see `stream_json_list()`
+
+    Returns:
+        Http streaming response with a JSON array
+    """
+    return StreamingHttpResponse(
+        stream_json_list(queryset, serializer_class, represent=represent),
+        content_type='application/json',
+    )
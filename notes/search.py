@@ -0,0 +1,212 @@
+"""Full-text search backends of the notes."""
+import re
+from collections import Counter
+from typing import Iterable, List
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import BooleanField, FloatField, OuterRef, Q, QuerySet, Subquery, Sum
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils.module_loading import import_string
+
+from notes.models import Note, NoteToken
+from notes.pagination import iter_chunks
+
+TOKEN_PATTERN = re.compile(r'\w+')
+TOKEN_MAX_LENGTH = NoteToken._meta.get_field('token').max_length
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into lower case word tokens.
+
+    Args:
+        text: the text to split
+
+    Returns:
+        the tokens of the text, in order and with duplicates
+    """
+    return [token[:TOKEN_MAX_LENGTH] for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+class SearchBackend:
+    """
+    Base search backend.
+
+    A query matches the notes containing every one of its terms,
+    as a word or as the prefix of a word.
+    """
+
+    # Whether the index is maintained by index_notes() and remove_notes()
+    # rather than by the database.
+    indexed_by_application = False
+
+    def search(self, queryset: QuerySet, query: str, user: User) -> QuerySet:
+        """
+        Filter and rank the notes matching a query.
+
+        Args:
+            queryset: the notes to search in
+            query: the search query
+            user: the user searching
+
+        Returns:
+            the matching notes annotated with `rank`, best match first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return queryset.none()
+        return self.match(queryset, terms, user).order_by('-rank', 'id')
+
+    def match(self, queryset: QuerySet, terms: List[str], user: User) -> QuerySet:
+        """Filter the notes matching all the terms and annotate their `rank`."""
+        raise NotImplementedError('match() must be implemented.')
+
+    def index_notes(self, notes: Iterable[Note]) -> None:
+        """Add or refresh notes in the index, when it is not maintained by the database."""
+
+    def remove_notes(self, note_ids: Iterable[int]) -> None:
+        """Remove notes from the index, when it is not maintained by the database."""
+
+    def rebuild(self) -> None:
+        """Rebuild the whole index."""
+
+
+class TokenIndexBackend(SearchBackend):
+    """
+    Search backend on the `NoteToken` inverted index.
+
+    The index is maintained by the application on each note write.
+    It works on any database and looks up the terms with the
+    (user, token) index.
+    """
+
+    indexed_by_application = True
+
+    def match(self, queryset: QuerySet, terms: List[str], user: User) -> QuerySet:
+        # The tokens are indexed under the owner of the note.
+        tokens = NoteToken.objects.filter(Q(user=user) | Q(note__shares__recipient=user))
+        for term in terms:
+            queryset = queryset.filter(
+                id__in=tokens.filter(token__startswith=term).values('note_id'),
+            )
+
+        term_filter = Q()
+        for term in terms:
+            term_filter |= Q(token__startswith=term)
+        frequencies = (
+            NoteToken.objects.filter(term_filter, note=OuterRef('pk'))
+            .values('note')
+            .annotate(total=Sum('frequency'))
+            .values('total')
+        )
+        return queryset.annotate(
+            rank=Coalesce(Subquery(frequencies), 0, output_field=FloatField()),
+        )
+
+    def index_notes(self, notes: Iterable[Note]) -> None:
+        notes = list(notes)
+        with transaction.atomic():
+            NoteToken.objects.filter(note__in=[note.pk for note in notes]).delete()
+            NoteToken.objects.bulk_create(
+                [
+                    NoteToken(
+                        user_id=note.user_id,
+                        note_id=note.pk,
+                        token=token,
+                        frequency=frequency,
+                    )
+                    for note in notes
+                    for token, frequency in Counter(tokenize(note.content)).items()
+                ],
+                batch_size=1000,
+            )
+
+    def remove_notes(self, note_ids: Iterable[int]) -> None:
+        NoteToken.objects.filter(note__in=list(note_ids)).delete()
+
+    def rebuild(self) -> None:
+        NoteToken.objects.all().delete()
+        for chunk in iter_chunks(Note.objects.all(), settings.NOTES_STREAM_CHUNK_SIZE):
+            self.index_notes(chunk)
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """
+    Search backend on a SQLite FTS5 virtual table.
+
+    The `notes_note_fts` table indexes `notes_note.content` as an
+    external content table, kept up to date by triggers.
+    """
+
+    table = 'notes_note_fts'
+
+    def match(self, queryset: QuerySet, terms: List[str], user: User) -> QuerySet:
+        expression = ' '.join('"{term}"*'.format(term=term) for term in terms)
+        return queryset.extra(
+            select={'rank': '-bm25({table})'.format(table=self.table)},
+            tables=[self.table],
+            where=[
+                '{table}.rowid = {note_table}.id'.format(
+                    table=self.table,
+                    note_table=Note._meta.db_table,
+                ),
+                '{table} MATCH %s'.format(table=self.table),
+            ],
+            params=[expression],
+        )
+
+    def rebuild(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO {table}({table}) VALUES ('rebuild')".format(table=self.table),
+            )
+
+
+class MySQLFullTextBackend(SearchBackend):
+    """
+    Search backend on a MySQL FULLTEXT index of `notes_note.content`.
+
+    The index is maintained by InnoDB. Words shorter than
+    `innodb_ft_min_token_size` and stopwords are not indexed.
+    """
+
+    def match(self, queryset: QuerySet, terms: List[str], user: User) -> QuerySet:
+        expression = ' '.join('+{term}*'.format(term=term) for term in terms)
+        sql = 'MATCH ({table}.content) AGAINST (%s IN BOOLEAN MODE)'.format(
+            table=Note._meta.db_table,
+        )
+        return queryset.filter(
+            RawSQL(sql, [expression], output_field=BooleanField()),
+        ).annotate(
+            rank=RawSQL(sql, [expression], output_field=FloatField()),
+        )
+
+
+ENGINE_BACKENDS = {
+    'django.db.backends.sqlite3': 'notes.search.SQLiteFTS5Backend',
+    'django.db.backends.mysql': 'notes.search.MySQLFullTextBackend',
+}
+
+
+def get_backend() -> SearchBackend:
+    """
+    Get the search backend.
+
+    `NOTES_SEARCH_BACKEND` selects a backend by its dotted path. When it
+    is empty the backend is selected by `DATABASES['default']['ENGINE']`,
+    with the token index for the databases without a full-text backend,
+    and when `NOTES_CONTENT_CODEC` compresses the contents.
+
+    Returns:
+        an instance of the search backend
+    """
+    if settings.NOTES_SEARCH_BACKEND:
+        path = settings.NOTES_SEARCH_BACKEND
+    elif settings.NOTES_CONTENT_CODEC:
+        path = 'notes.search.TokenIndexBackend'
+    else:
+        path = ENGINE_BACKENDS.get(settings.DATABASES['default']['ENGINE'], 'notes.search.TokenIndexBackend')
+    return import_string(path)()
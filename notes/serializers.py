@@ -1,22 +1,121 @@
+from django.conf import settings
+from django.db.models import QuerySet
+
 from rest_framework import serializers
 
-from notes.models import Note
+from core.metrics import TimedSerializerMixin
+
+from notes.models import Note, NoteShare
 
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Model note serializer."""
 
     class Meta:
         model = Note
         fields = ['id', 'content']
 
+    @classmethod
+    def as_values(cls, queryset: QuerySet) -> QuerySet:
+        """
+        Fast read path: the representations of the notes straight from the database.
+
+        The fields are plain model columns, so the rows of `values()` are
+        the representations of the serializer, without building the model
+        instances nor calling `to_representation()` field by field.
+
+        Args:
+            queryset: the notes
+
+        Returns:
+            the queryset of the rows of the notes, see `represent_row()`
+        """
+        return queryset.values(*cls.Meta.fields)
+
+    @classmethod
+    def represent_row(cls, row: dict) -> dict:
+        """
+        Get the representation of a row of `as_values()`.
 
-class ShareNoteSerializer(serializers.ModelSerializer):
-    """Api ShareNote serializer."""
+        Args:
+            row: the values of a note
 
-    username = serializers.CharField(source='user.username')
+        Returns:
+            the representation of the note, the row itself
+        """
+        return row
+
+
+class NoteSummarySerializer(NoteSerializer):
+    """
+    Note summary serializer, for the lists with `view=summary`.
+
+    Its fields are the precomputed preview and length of the content, so
+    the content is never read.
+    """
 
     class Meta:
         model = Note
-        fields = ['id', 'username']
-        extra_kwargs = {'username': {'required': True}}
+        fields = ['id', 'preview', 'content_length', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+    @classmethod
+    def represent_row(cls, row: dict) -> dict:
+        """
+        Get the representation of a row of `as_values()`.
+
+        The timestamps are formatted as by the serializer, in `TIME_ZONE`:
+        the renderers would send the UTC datetimes of the rows otherwise.
+
+        Args:
+            row: the values of a note
+
+        Returns:
+            the representation of the note
+        """
+        field = serializers.DateTimeField()
+        return {
+            **row,
+            'created_at': field.to_representation(row['created_at']),
+            'updated_at': field.to_representation(row['updated_at']),
+        }
+
+
+class NoteUpdateSerializer(NoteSerializer):
+    """Note serializer of a batch update, with the id of the note."""
+
+    id = serializers.IntegerField()
+
+
+class ShareNoteSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Api ShareNote serializer, with one or several users and notes.
+
+    A plain serializer: its fields are declared, there is no model field to
+    introspect on each request.
+    """
+
+    username = serializers.CharField(source='user.username', required=False)
+    usernames = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        max_length=settings.NOTES_BATCH_MAX_SIZE,
+    )
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        max_length=settings.NOTES_BATCH_MAX_SIZE,
+    )
+    permission = serializers.ChoiceField(
+        choices=NoteShare.Permission.choices,
+        default=NoteShare.Permission.READ,
+    )
+
+    def validate(self, attrs: dict) -> dict:
+        """Ensure at least one user is given, with `username` or `usernames`."""
+        if 'user' not in attrs and not attrs.get('usernames'):
+            raise serializers.ValidationError(
+                {'username': [self.fields['username'].error_messages['required']]},
+                code='required',
+            )
+        return attrs
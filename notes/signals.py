@@ -0,0 +1,20 @@
+"""Signal receivers of the app notes."""
+from typing import Any
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from notes import search, tasks
+from notes.models import Note
+
+
+@receiver(post_save, sender=Note)
+def index_note(sender: type, instance: Note, **kwargs: Any) -> None:
+    """Enqueue the indexing of a created or updated note."""
+    tasks.reindex_notes([instance.pk])
+
+
+@receiver(post_delete, sender=Note)
+def unindex_note(sender: type, instance: Note, **kwargs: Any) -> None:
+    """Remove a deleted note from the search index."""
+    search.get_backend().remove_notes([instance.pk])
@@ -0,0 +1,131 @@
+"""
+Change log of the notes, read by the delta sync of the clients.
+
+The write paths of the api and the management commands record their
+changes with `record_changes()`, next to the invalidation of the cache.
+"""
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from notes.models import Note, NoteChange, NoteShare
+
+
+def note_audiences(note_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    """
+    Get the users who can read each note.
+
+    Args:
+        note_ids: ids of the notes
+
+    Returns:
+        the ids of the owner and the recipients of each existing note
+    """
+    note_ids = list(note_ids)
+    audiences: Dict[int, Set[int]] = {}
+    for note_id, user_id in Note.objects.filter(id__in=note_ids).order_by().values_list('id', 'user_id'):
+        audiences.setdefault(note_id, set()).add(user_id)
+    shares = NoteShare.objects.filter(note__in=note_ids).values_list('note_id', 'recipient_id')
+    for note_id, recipient_id in shares:
+        audiences.setdefault(note_id, set()).add(recipient_id)
+    return audiences
+
+
+def lock_users(user_ids: Iterable[int]) -> None:
+    """
+    Lock the rows of users until the end of the transaction.
+
+    The rows are locked in the order of their ids, as by every writer, so
+    two writers never wait for each other.
+
+    Args:
+        user_ids: ids of the users
+    """
+    if connection.features.has_select_for_update:
+        list(User.objects.select_for_update().filter(id__in=set(user_ids)).order_by('id').values_list('id'))
+
+
+def record_changes(
+    note_ids: Iterable[int],
+    user_ids: Optional[Iterable[int]] = None,
+    deleted: bool = False,
+) -> Set[int]:
+    """
+    Record a change of notes for the users who can read them.
+
+    The previous change of each (user, note) is replaced, so the log grows
+    with the number of notes and not with the number of writes. Deleted
+    notes have no audience anymore: record their tombstones before
+    deleting them.
+
+    Args:
+        note_ids: ids of the changed notes
+        user_ids: only record the changes for these users, who can read the notes,
+            e.g. the recipients of a share; by default the owners and recipients
+        deleted: whether the notes are being deleted
+
+    Returns:
+        the ids of the users the changes were recorded for
+    """
+    if user_ids is None:
+        audiences = note_audiences(note_ids)
+    else:
+        user_ids = set(user_ids)
+        audiences = {note_id: user_ids for note_id in note_ids}
+
+    # Notes with the same audience replace their changes in one query.
+    groups: Dict[FrozenSet[int], List[int]] = {}
+    for note_id, audience in audiences.items():
+        if audience:
+            groups.setdefault(frozenset(audience), []).append(note_id)
+    users = set().union(*groups)
+    if not users:
+        return users
+
+    with transaction.atomic():
+        # The versions of a user are allocated while holding the lock of the
+        # user, so they are committed in order and a client never skips a
+        # version committed after a greater one.
+        lock_users(users)
+        for audience, group_note_ids in groups.items():
+            NoteChange.objects.filter(note_id__in=group_note_ids, user__in=audience).delete()
+        NoteChange.objects.bulk_create(
+            [
+                NoteChange(user_id=user_id, note_id=note_id, deleted=deleted)
+                for audience, group_note_ids in groups.items()
+                for note_id in group_note_ids
+                for user_id in sorted(audience)
+            ],
+            batch_size=settings.NOTES_BATCH_MAX_SIZE,
+        )
+    return users
+
+
+def _latest_change_query(user_id: int, note_id: Optional[int]) -> QuerySet:
+    changes = NoteChange.objects.filter(user_id=user_id)
+    if note_id is not None:
+        changes = changes.filter(note_id=note_id, deleted=False)
+    return changes.order_by('-id').values_list('id', 'changed_at')
+
+
+def latest_change(user_id: int, note_id: Optional[int] = None) -> Optional[Tuple[int, datetime]]:
+    """
+    Get the latest change of the notes a user can read, or of one of them.
+
+    Args:
+        user_id: id of the user
+        note_id: id of the note, None for all the notes of the user
+
+    Returns:
+        the version and the time of the change, None without any change
+    """
+    return _latest_change_query(user_id, note_id).first()
+
+
+async def alatest_change(user_id: int, note_id: Optional[int] = None) -> Optional[Tuple[int, datetime]]:
+    """Async version of `latest_change()`."""
+    return await _latest_change_query(user_id, note_id).afirst()
@@ -0,0 +1,37 @@
+"""
+Background tasks of the app notes, run by the `run_jobs` workers, see `jobs.queue`.
+
+The side effects of the writes which the writer does not need to read
+back at once run there: the search index of the application, and the
+change log and the caches of the recipients of a share.
+"""
+from typing import Iterable, List
+
+from jobs import queue
+from notes import cache, search, sync
+from notes.models import Note
+
+
+@queue.register('notes.index_notes', batch_size=500, key=lambda payload: str(payload['id']))
+def index_notes(payloads: List[dict]) -> None:
+    """Index the current content of notes, and invalidate the caches of their readers."""
+    note_ids = [payload['id'] for payload in payloads]
+    # The deleted notes are removed from the index by notes.signals.
+    search.get_backend().index_notes(Note.objects.filter(id__in=note_ids).only('id', 'user_id', 'content'))
+    # Their searches were cached before the index was up to date.
+    cache.invalidate(*set().union(*sync.note_audiences(note_ids).values()))
+
+
+def reindex_notes(note_ids: Iterable[int]) -> None:
+    """Enqueue the indexing of notes, when the search index is maintained by the application."""
+    if search.get_backend().indexed_by_application:
+        index_notes.enqueue(*[{'id': note_id} for note_id in note_ids])
+
+
+@queue.register('notes.record_shares', batch_size=100)
+def record_shares(payloads: List[dict]) -> None:
+    """Record the changes of shared notes for their recipients, and invalidate their caches."""
+    recipients = set()
+    for payload in payloads:
+        recipients |= sync.record_changes(payload['note_ids'], user_ids=payload['user_ids'])
+    cache.invalidate(*recipients)
@@ -1,11 +1,35 @@
+import gzip
+import io
+import json
+import pytest
+import zlib
+
 from http import HTTPStatus
+from typing import Any
+
+from asgiref.sync import async_to_sync
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.db.models import TextField
+from django.db.models.functions import Cast
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
 from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.functional import Promise
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
-from notes.models import Note
+from core.renderers import MessagePackRenderer
+from jobs.models import Job
+from notes import cache, sync, transfer
+from notes.async_api_views import AsyncNotesApiView
+from notes.models import Note, NoteChange, NoteImport, NoteShare, NoteToken
+from notes.serializers import NoteSerializer, NoteSummarySerializer
 
 
 class TestNotesUrls:  # unit tests
@@ -29,6 +53,30 @@ class TestNotesUrls:  # unit tests
         assert reverse('notes:notes-share', kwargs={'id': 123}) == path
         assert resolve(path).view_name == 'notes:notes-share'
 
+    def test_notes_batch(self) -> None:
+        """Ensure notes batch url is defined."""
+        path = '/api/notes/batch'
+        assert reverse('notes:notes-batch') == path
+        assert resolve(path).view_name == 'notes:notes-batch'
+
+    def test_notes_sync(self) -> None:
+        """Ensure notes sync url is defined."""
+        path = '/api/notes/sync'
+        assert reverse('notes:notes-sync') == path
+        assert resolve(path).view_name == 'notes:notes-sync'
+
+    def test_notes_export_and_import(self) -> None:
+        """Ensure notes export and import urls are defined."""
+        for name, path in (('notes:notes-export', '/api/notes/export'), ('notes:notes-import', '/api/notes/import')):
+            assert reverse(name) == path
+            assert resolve(path).view_name == name
+
+    def test_notes_cache_stats(self) -> None:
+        """Ensure notes cache stats url is defined."""
+        path = '/api/notes/cache/stats'
+        assert reverse('notes:notes-cache-stats') == path
+        assert resolve(path).view_name == 'notes:notes-cache-stats'
+
     def test_notes_search(self) -> None:
         """Ensure search note url is defined."""
         path = '/api/search/test'
@@ -54,6 +102,30 @@ class TestNoteApiView:  # integration tests
         assert response.data == 'Create the note: test1 successfully'
         assert notes.content == 'test1'
 
+    def test_create_and_update_note_with_their_changes(
+        self,
+        api_client: APIClient,
+        admin_user: User,
+        monkeypatch: Any,
+    ) -> None:
+        """Test the api create or update no note when its change can not be recorded."""
+        def fail(*args: Any, **kwargs: Any) -> None:
+            raise DatabaseError('change log unavailable')
+
+        note = Note.objects.create(user=admin_user, content='test1')
+        monkeypatch.setattr(sync, 'record_changes', fail)
+        api_client.force_login(user=admin_user)
+        api_client.raise_request_exception = False
+        response = api_client.post(reverse('notes:notes-notes'), data={'content': 'test2'}, format='json')
+        assert response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+        response = api_client.put(
+            reverse('notes:notes-note', kwargs={'id': note.id}),
+            data={'content': 'new_test'},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+        assert list(Note.objects.values_list('content', flat=True)) == ['test1']
+
     def test_get_one_note(self, api_client: APIClient, admin_user: User) -> None:
         """Test the api get a note with note id for a user."""
         api_client.force_login(user=admin_user)
@@ -111,9 +183,15 @@ class TestNoteApiView:  # integration tests
             format='json',
         )
 
-        new_note = Note.objects.filter(user=normal_user).first()
+        share = NoteShare.objects.get(recipient=normal_user)
         assert response.status_code == HTTPStatus.OK
-        assert new_note.content == note.content
+        assert share.note == note
+        assert share.permission == NoteShare.Permission.READ
+        assert Note.objects.count() == 1
+
+        api_client.force_login(user=normal_user)
+        response = api_client.get(reverse('notes:notes-note', kwargs={'id': note.id}))
+        assert response.data['content'] == note.content
 
     def test_search_notes(self, api_client: APIClient, admin_user: User) -> None:
         """Test the api search the notes with note keywords."""
@@ -184,5 +262,901 @@ class TestNoteApiView:  # integration tests
         assert str(response.data) == '{0}'.format(
             "{'username': [ErrorDetail(string='This field is required.', code='required')]}",
         )
-    
-    
+
+    def test_list_notes_paginated(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api list the notes of a user page by page."""
+        api_client.force_login(user=admin_user)
+        other_user = User.objects.create(username='other_user')
+        Note.objects.create(user=other_user, content='other')
+        for index in range(5):
+            Note.objects.create(user=admin_user, content='test{0}'.format(index))
+
+        response = api_client.get(reverse('notes:notes-notes'), {'page_size': 2})
+        assert response.status_code == HTTPStatus.OK
+        assert [note['content'] for note in response.data] == ['test0', 'test1']
+
+        contents = [note['content'] for note in response.data]
+        while 'Link' in response:
+            next_url = response['Link'].split(';')[0].strip('<>')
+            response = api_client.get(next_url)
+            contents += [note['content'] for note in response.data]
+        assert contents == ['test0', 'test1', 'test2', 'test3', 'test4']
+
+    def test_list_notes_fast_path(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the fast read path returns the representations of the serializer."""
+        api_client.force_login(user=admin_user)
+        for index in range(3):
+            Note.objects.create(user=admin_user, content='test{0}'.format(index))
+        notes = Note.objects.filter(user=admin_user)
+        assert list(NoteSerializer.as_values(notes)) == NoteSerializer(notes, many=True).data
+
+        response = api_client.get(reverse('notes:notes-notes'), HTTP_ACCEPT='application/msgpack')
+        assert response.status_code == HTTPStatus.OK
+        assert response['Content-Type'] == 'application/msgpack'
+        assert response.content == MessagePackRenderer().render(NoteSerializer(notes, many=True).data)
+
+    def test_list_notes_summary(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api list the note summaries without reading their content."""
+        api_client.force_login(user=admin_user)
+        long_content = 'x' * 300
+        api_client.post(reverse('notes:notes-notes'), data={'content': long_content}, format='json')
+        api_client.post(reverse('notes:notes-batch'), data=[{'content': 'batch note'}], format='json')
+        long_note, batch_note = Note.objects.order_by('id')
+        assert (long_note.preview, long_note.content_length) == ('x' * 200, 300)
+        api_client.put(
+            reverse('notes:notes-batch'),
+            data=[{'id': batch_note.id, 'content': 'updated batch note'}],
+            format='json',
+        )
+        batch_note.refresh_from_db()
+        assert (batch_note.preview, batch_note.content_length) == ('updated batch note', 18)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(reverse('notes:notes-notes'), {'view': 'summary'})
+        assert response.status_code == HTTPStatus.OK
+        assert [note['preview'] for note in response.data] == ['x' * 200, 'updated batch note']
+        assert set(response.data[0]) == {'id', 'preview', 'content_length', 'created_at', 'updated_at'}
+        assert not any('"content"' in query['sql'] for query in queries.captured_queries)
+        # The timestamps are formatted as by the serializer.
+        assert response.data[0] == NoteSummarySerializer(long_note).data
+        assert response.json()[0]['created_at'] == NoteSummarySerializer(long_note).data['created_at']
+
+        response = api_client.get(reverse('notes:notes-note', kwargs={'id': long_note.id}), {'view': 'summary'})
+        assert response.data == NoteSummarySerializer(long_note).data
+        response = api_client.get(reverse('notes:notes-notes'), {'view': 'summary', 'stream': 1})
+        assert json.loads(b''.join(response.streaming_content)) == NoteSummarySerializer(
+            [long_note, batch_note], many=True,
+        ).data
+        response = api_client.get(reverse('notes:notes-search', kwargs={'query': 'batch'}), {'view': 'summary'})
+        assert response.data == [NoteSummarySerializer(batch_note).data]
+        response = api_client.get(reverse('notes:notes-notes'), {'view': 'titles'})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_list_notes_invalid_cursor(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api list the notes with a malformed cursor."""
+        api_client.force_login(user=admin_user)
+
+        response = api_client.get(reverse('notes:notes-notes'), {'cursor': '!!'})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_list_notes_streaming(
+        self,
+        api_client: APIClient,
+        admin_user: User,
+        settings,
+    ) -> None:
+        """Test the api stream the notes of a user in chunks."""
+        settings.NOTES_STREAM_CHUNK_SIZE = 2
+        api_client.force_login(user=admin_user)
+
+        response = api_client.get(reverse('notes:notes-notes'), {'stream': 1})
+        assert response.streaming
+        assert json.loads(b''.join(response.streaming_content)) == []
+
+        for index in range(5):
+            Note.objects.create(user=admin_user, content='test{0}'.format(index))
+        response = api_client.get(reverse('notes:notes-notes'), {'stream': 1})
+        notes = json.loads(b''.join(response.streaming_content))
+        assert [note['content'] for note in notes] == [
+            'test0', 'test1', 'test2', 'test3', 'test4',
+        ]
+
+    def test_list_notes_compressed(self, api_client: APIClient, admin_user: User, settings) -> None:
+        """Test the api compresses the note lists for the clients accepting gzip."""
+        settings.NOTES_STREAM_CHUNK_SIZE = 20
+        settings.COMPRESSION_ENCODINGS = ['gzip']
+        api_client.force_login(user=admin_user)
+        url = reverse('notes:notes-notes')
+        api_client.post(url, data={'content': 'compressed note 0'}, format='json')
+        for index in range(1, 50):
+            Note.objects.create(user=admin_user, content='compressed note {0}'.format(index))
+
+        response = api_client.get(url)
+        assert not response.has_header('Content-Encoding')
+        assert response['Vary'] == 'Accept, Cookie, Accept-Encoding'
+
+        response = api_client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        assert response['Content-Encoding'] == 'gzip'
+        assert int(response['Content-Length']) == len(response.content)
+        notes = json.loads(gzip.decompress(response.content))
+        assert len(notes) == 50
+        assert response['ETag'].startswith('W/"list-')
+        response = api_client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+        response = api_client.get(url, {'stream': 1}, HTTP_ACCEPT_ENCODING='gzip')
+        assert response['Content-Encoding'] == 'gzip'
+        # One flushed member per chunk of notes.
+        chunks = list(response.streaming_content)
+        assert len(chunks) > 3
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        notes = json.loads(b''.join(decompressor.decompress(chunk) for chunk in chunks))
+        assert [note['content'] for note in notes][:2] == ['compressed note 0', 'compressed note 1']
+
+    def test_search_notes_ranked_and_paginated(
+        self,
+        api_client: APIClient,
+        admin_user: User,
+        settings: Any,
+    ) -> None:
+        """Test the api search rank the notes and paginate the results."""
+        api_client.force_login(user=admin_user)
+        other_user = User.objects.create(username='other_user')
+        Note.objects.create(user=other_user, content='shopping list')
+        Note.objects.create(user=admin_user, content='shopping list: milk')
+        Note.objects.create(user=admin_user, content='list of books')
+        best = Note.objects.create(user=admin_user, content='shopping list, shopping day')
+
+        response = api_client.get(
+            reverse('notes:notes-search', kwargs={'query': 'shop list'}),
+            {'page_size': 1},
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert [note['id'] for note in response.data] == [best.id]
+
+        next_url = response['Link'].split(';')[0].strip('<>')
+        response = api_client.get(next_url)
+        assert [note['content'] for note in response.data] == ['shopping list: milk']
+        assert 'Link' not in response
+
+        for page in (0, 'invalid', settings.NOTES_SEARCH_MAX_PAGE + 1, 9999999999999999999):
+            response = api_client.get(reverse('notes:notes-search', kwargs={'query': 'shop list'}), {'page': page})
+            assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_search_notes_token_index(
+        self,
+        api_client: APIClient,
+        admin_user: User,
+        settings,
+    ) -> None:
+        """Test the api search the notes with the token index backend."""
+        settings.NOTES_SEARCH_BACKEND = 'notes.search.TokenIndexBackend'
+        api_client.force_login(user=admin_user)
+        note1 = Note.objects.create(user=admin_user, content='Meeting notes')
+        Note.objects.create(user=admin_user, content='meeting, meeting room')
+        assert NoteToken.objects.filter(note=note1).count() == 2
+
+        response = api_client.get(reverse('notes:notes-search', kwargs={'query': 'meet'}))
+        assert [note['content'] for note in response.data] == [
+            'meeting, meeting room', 'Meeting notes',
+        ]
+
+        note1.content = 'agenda'
+        note1.save()
+        response = api_client.get(reverse('notes:notes-search', kwargs={'query': 'note'}))
+        assert response.data == []
+
+        note1.delete()
+        assert not NoteToken.objects.filter(note_id=note1.id).exists()
+
+    def test_rebuild_search_index(self, admin_user: User, settings) -> None:
+        """Test the command rebuild the token index."""
+        Note.objects.create(user=admin_user, content='test1 test2')
+        settings.NOTES_SEARCH_BACKEND = 'notes.search.TokenIndexBackend'
+        assert not NoteToken.objects.exists()
+
+        call_command('rebuild_search_index')
+
+        assert set(NoteToken.objects.values_list('token', flat=True)) == {'test1', 'test2'}
+
+    def test_notes_cache(
+        self,
+        api_client: APIClient,
+        admin_user: User,
+        django_capture_on_commit_callbacks,
+    ) -> None:
+        """Test the api serve the notes from the cache until a write."""
+        api_client.force_login(user=admin_user)
+        note = Note.objects.create(user=admin_user, content='test1')
+        cache.stats.reset()
+
+        for _ in range(2):
+            response = api_client.get(reverse('notes:notes-note', kwargs={'id': note.id}))
+            assert response.data['content'] == 'test1'
+            response = api_client.get(reverse('notes:notes-notes'))
+            assert [note['content'] for note in response.data] == ['test1']
+        assert cache.stats.snapshot()['note'] == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+        assert cache.stats.snapshot()['list'] == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.put(
+                reverse('notes:notes-note', kwargs={'id': note.id}),
+                data={'content': 'new_test'},
+                format='json',
+            )
+        response = api_client.get(reverse('notes:notes-note', kwargs={'id': note.id}))
+        assert response.data['content'] == 'new_test'
+        response = api_client.get(reverse('notes:notes-notes'))
+        assert [note['content'] for note in response.data] == ['new_test']
+
+    def test_notes_cache_without_invalidation(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api serve no stale search from a cache the write did not invalidate, e.g. of another worker."""
+        api_client.force_login(user=admin_user)
+        note = Note.objects.create(user=admin_user, content='test1')
+        search_url = reverse('notes:notes-search', kwargs={'query': 'test'})
+        assert [note['content'] for note in api_client.get(search_url).data] == ['test1']
+
+        # Without the commit callbacks, the versions of the cache are not bumped.
+        api_client.put(reverse('notes:notes-note', kwargs={'id': note.id}), data={'content': 'test2'}, format='json')
+        assert [note['content'] for note in api_client.get(search_url).data] == ['test2']
+
+    def test_get_note_of_another_user(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api do not get a note of another user."""
+        api_client.force_login(user=admin_user)
+        other_user = User.objects.create(username='other_user')
+        note = Note.objects.create(user=other_user, content='other')
+
+        response = api_client.get(reverse('notes:notes-note', kwargs={'id': note.id}))
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_notes_cache_stats(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api get the counters of the notes cache."""
+        normal_user = User.objects.create(username='normal_user')
+        api_client.force_login(user=normal_user)
+        response = api_client.get(reverse('notes:notes-cache-stats'))
+        assert response.status_code == HTTPStatus.FORBIDDEN
+
+        api_client.force_login(user=admin_user)
+        cache.stats.reset()
+        api_client.get(reverse('notes:notes-search', kwargs={'query': 'test'}))
+        response = api_client.get(reverse('notes:notes-cache-stats'))
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == {'search': {'hits': 0, 'misses': 1, 'hit_ratio': 0.0}}
+
+    def test_batch_create_notes(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api create notes in a batch, with an invalid item."""
+        api_client.force_login(user=admin_user)
+
+        response = api_client.post(
+            reverse('notes:notes-batch'),
+            data=[{'content': 'test1'}, {}, {'content': 'test2'}],
+            format='json',
+        )
+
+        notes = list(Note.objects.filter(user=admin_user).order_by('id'))
+        assert response.status_code == HTTPStatus.MULTI_STATUS
+        assert [note.content for note in notes] == ['test1', 'test2']
+        assert response.data['results'] == [
+            {'index': 0, 'status': 'created', 'id': notes[0].id},
+            {
+                'index': 1,
+                'status': 'invalid',
+                'errors': {'content': ['This field is required.']},
+            },
+            {'index': 2, 'status': 'created', 'id': notes[1].id},
+        ]
+
+    def test_batch_create_notes_with_their_changes(
+        self,
+        api_client: APIClient,
+        admin_user: User,
+        monkeypatch: Any,
+    ) -> None:
+        """Test the api create no note when their changes can not be recorded."""
+        def fail(*args: Any, **kwargs: Any) -> None:
+            raise DatabaseError('change log unavailable')
+
+        monkeypatch.setattr(sync, 'record_changes', fail)
+        api_client.force_login(user=admin_user)
+        api_client.raise_request_exception = False
+        response = api_client.post(reverse('notes:notes-batch'), data=[{'content': 'test1'}], format='json')
+        assert response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+        assert not Note.objects.exists()
+
+    def test_batch_create_notes_without_returned_ids(
+        self,
+        api_client: APIClient,
+        admin_user: User,
+        monkeypatch: Any,
+    ) -> None:
+        """Test the api create notes in one insert when the database does not return their ids, as MySQL."""
+        monkeypatch.setattr(type(connection.features), 'can_return_rows_from_bulk_insert', False)
+        # Every note is created at the same time: the ids do not depend on the timestamps.
+        now = timezone.now()
+        monkeypatch.setattr(timezone, 'now', lambda: now)
+        api_client.force_login(user=admin_user)
+        Note.objects.create(user=admin_user, content='existing')
+
+        counts = []
+        for size in (2, 20):
+            with CaptureQueriesContext(connection) as queries:
+                response = api_client.post(
+                    reverse('notes:notes-batch'),
+                    data=[{'content': 'test{index}'.format(index=index)} for index in range(size)],
+                    format='json',
+                )
+            assert response.status_code == HTTPStatus.OK
+            inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "notes_note"')]
+            assert len(inserts) == 1
+            ids = [result['id'] for result in response.data['results']]
+            assert list(Note.objects.filter(id__in=ids).values_list('content', flat=True)) == [
+                'test{index}'.format(index=index) for index in range(size)
+            ]
+            counts.append(len(queries))
+        # The ids are read back in one query, whatever the number of notes.
+        assert counts[0] == counts[1]
+
+    def test_batch_update_notes(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api update notes in a batch."""
+        api_client.force_login(user=admin_user)
+        other_user = User.objects.create(username='other_user')
+        other_note = Note.objects.create(user=other_user, content='other')
+        note1 = Note.objects.create(user=admin_user, content='test1')
+        note2 = Note.objects.create(user=admin_user, content='test2')
+        created_at = note1.created_at
+
+        response = api_client.put(
+            reverse('notes:notes-batch'),
+            data=[
+                {'id': note1.id, 'content': 'new_test1'},
+                {'id': note2.id, 'content': 'new_test2'},
+                {'id': other_note.id, 'content': 'new_other'},
+            ],
+            format='json',
+        )
+
+        assert response.status_code == HTTPStatus.MULTI_STATUS
+        assert [result['status'] for result in response.data['results']] == [
+            'updated', 'updated', 'not_found',
+        ]
+        note1.refresh_from_db()
+        other_note.refresh_from_db()
+        assert note1.content == 'new_test1'
+        assert note1.created_at == created_at
+        assert note1.updated_at > created_at
+        assert other_note.content == 'other'
+
+        response = api_client.get(
+            reverse('notes:notes-search', kwargs={'query': 'new_test2'}),
+        )
+        assert [note['id'] for note in response.data] == [note2.id]
+
+    def test_batch_delete_notes(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api delete notes in a batch."""
+        api_client.force_login(user=admin_user)
+        note1 = Note.objects.create(user=admin_user, content='test1')
+        note2 = Note.objects.create(user=admin_user, content='test2')
+
+        response = api_client.delete(
+            reverse('notes:notes-batch'),
+            data=[note1.id, note2.id],
+            format='json',
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert [result['status'] for result in response.data['results']] == [
+            'deleted', 'deleted',
+        ]
+        assert not Note.objects.exists()
+
+        response = api_client.delete(
+            reverse('notes:notes-batch'),
+            data=[note1.id, 'x'],
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert [result['status'] for result in response.data['results']] == [
+            'not_found', 'invalid',
+        ]
+
+    def test_batch_too_large(self, api_client: APIClient, admin_user: User, settings) -> None:
+        """Test the api refuse a batch larger than the maximum size."""
+        settings.NOTES_BATCH_MAX_SIZE = 1
+        api_client.force_login(user=admin_user)
+
+        response = api_client.post(
+            reverse('notes:notes-batch'),
+            data=[{'content': 'test1'}, {'content': 'test2'}],
+            format='json',
+        )
+
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert not Note.objects.exists()
+
+    def test_share_notes_with_many_users(
+        self,
+        api_client: APIClient,
+        admin_user: User,
+        django_assert_max_num_queries,
+    ) -> None:
+        """Test the api share several notes with several users in one request."""
+        api_client.force_login(user=admin_user)
+        user1 = User.objects.create(username='user1')
+        user2 = User.objects.create(username='user2')
+        note1 = Note.objects.create(user=admin_user, content='test1')
+        note2 = Note.objects.create(user=admin_user, content='test2')
+
+        with django_assert_max_num_queries(10):
+            response = api_client.post(
+                reverse('notes:notes-share', kwargs={'id': note1.id}),
+                data={
+                    'usernames': ['user1', 'unknown', 'user2'],
+                    'ids': [note2.id, 999],
+                },
+                format='json',
+            )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == {
+            'shared': 4,
+            'unknown_usernames': ['unknown'],
+            'unknown_ids': [999],
+        }
+        for user in (user1, user2):
+            assert sorted(Note.objects.accessible_by(user).values_list('content', flat=True)) == [
+                'test1', 'test2',
+            ]
+        assert Note.objects.count() == 2
+
+    def test_share_note_with_unknown_users(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api share a note with unknown users only."""
+        api_client.force_login(user=admin_user)
+        note = Note.objects.create(user=admin_user, content='test1')
+
+        response = api_client.post(
+            reverse('notes:notes-share', kwargs={'id': note.id}),
+            data={'username': 'unknown'},
+            format='json',
+        )
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        assert response.data['unknown_usernames'] == ['unknown']
+        assert Note.objects.count() == 1
+
+    def test_list_owned_and_shared_notes(
+        self,
+        api_client: APIClient,
+        admin_user: User,
+        django_assert_num_queries,
+    ) -> None:
+        """Test the api list and search the owned and shared notes together."""
+        api_client.force_login(user=admin_user)
+        user1 = User.objects.create(username='user1')
+        user2 = User.objects.create(username='user2')
+        owned = Note.objects.create(user=admin_user, content='test owned')
+        shared = Note.objects.create(user=user1, content='test shared')
+        Note.objects.create(user=user1, content='test private')
+        NoteShare.objects.create(note=shared, recipient=admin_user)
+        # A share of an owned note with another user does not duplicate it.
+        NoteShare.objects.create(note=owned, recipient=user2)
+
+        with django_assert_num_queries(4):  # session, user, latest change and notes
+            response = api_client.get(reverse('notes:notes-notes'))
+        assert [note['id'] for note in response.data] == [owned.id, shared.id]
+
+        response = api_client.get(reverse('notes:notes-search', kwargs={'query': 'test'}))
+        assert [note['id'] for note in response.data] == [owned.id, shared.id]
+
+    def test_conditional_get(
+        self,
+        api_client: APIClient,
+        admin_user: User,
+        django_assert_num_queries,
+    ) -> None:
+        """Test the api get notes answers 304 to the clients with the current version."""
+        api_client.force_login(user=admin_user)
+        api_client.post(reverse('notes:notes-notes'), data={'content': 'test1'}, format='json')
+        note = Note.objects.get(user=admin_user)
+        list_url = reverse('notes:notes-notes')
+        note_url = reverse('notes:notes-note', kwargs={'id': note.id})
+
+        response = api_client.get(list_url)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+        assert etag.startswith('"list-')
+        note_etag = api_client.get(note_url)['ETag']
+        assert note_etag.startswith('"note-')
+        assert api_client.get(list_url, {'page_size': 1})['ETag'] != etag
+
+        with django_assert_num_queries(3):  # session, user and latest change
+            response = api_client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert response['ETag'] == etag
+        response = api_client.get(note_url, HTTP_IF_NONE_MATCH=note_etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        response = api_client.get(list_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+        api_client.put(note_url, data={'content': 'new_test1'}, format='json')
+        response = api_client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == [{'id': note.id, 'content': 'new_test1'}]
+        response = api_client.get(note_url, HTTP_IF_NONE_MATCH=note_etag)
+        assert response.status_code == HTTPStatus.OK
+
+    def test_update_shared_note(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api update a shared note only with the write permission."""
+        owner = User.objects.create(username='owner')
+        note = Note.objects.create(user=owner, content='test1')
+        share = NoteShare.objects.create(note=note, recipient=admin_user)
+        api_client.force_login(user=admin_user)
+        url = reverse('notes:notes-note', kwargs={'id': note.id})
+
+        response = api_client.put(url, data={'content': 'new_test'}, format='json')
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+        share.permission = NoteShare.Permission.WRITE
+        share.save()
+        response = api_client.put(url, data={'content': 'new_test'}, format='json')
+        assert response.status_code == HTTPStatus.OK
+        note.refresh_from_db()
+        assert note.content == 'new_test'
+
+        response = api_client.delete(url)
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_background_jobs(self, api_client: APIClient, admin_user: User, settings) -> None:
+        """Test the api enqueue the indexing and the share changes for the workers."""
+        settings.JOBS_EAGER = False
+        settings.NOTES_SEARCH_BACKEND = 'notes.search.TokenIndexBackend'
+        user1 = User.objects.create(username='user1')
+        api_client.force_login(user=admin_user)
+        note = Note.objects.create(user=admin_user, content='first')
+        url = reverse('notes:notes-note', kwargs={'id': note.id})
+        for content in ('second', 'third'):
+            api_client.put(url, data={'content': content}, format='json')
+        response = api_client.post(
+            reverse('notes:notes-share', kwargs={'id': note.id}),
+            data={'username': 'user1'},
+            format='json',
+        )
+        assert response.data['shared'] == 1
+
+        # The updates of the note are indexed once.
+        assert sorted(Job.objects.values_list('task', flat=True)) == ['notes.index_notes', 'notes.record_shares']
+        assert not NoteToken.objects.exists()
+        assert not NoteChange.objects.filter(user=user1).exists()
+
+        call_command('run_jobs', '--once', '--executor', 'inline', stdout=io.StringIO())
+        assert list(NoteToken.objects.values_list('token', flat=True)) == ['third']
+        assert list(NoteChange.objects.filter(user=user1).values_list('note_id', flat=True)) == [note.id]
+        assert not Job.objects.exists()
+
+    def test_export_and_import_notes(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api export the notes of a user as NDJSON and import them for another user."""
+        api_client.force_login(user=admin_user)
+        contents = ['first note', 'second\nnote', 'third note']
+        for content in contents:
+            Note.objects.create(user=admin_user, content=content)
+        shared_note = Note.objects.create(user=User.objects.create(username='owner'), content='shared')
+        NoteShare.objects.create(note=shared_note, recipient=admin_user)
+
+        response = api_client.get(reverse('notes:notes-export'), {'compress': 'gzip'})
+        assert response.status_code == HTTPStatus.OK
+        assert response['Content-Type'] == 'application/gzip'
+        assert response['X-Notes-Count'] == '3'
+        archive = b''.join(response.streaming_content)
+        lines = gzip.decompress(archive).decode('utf-8').splitlines()
+        assert [json.loads(line)['content'] for line in lines] == contents
+        response = api_client.get(reverse('notes:notes-export'), {'compress': 'rar'})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+        user1 = User.objects.create(username='user1')
+        api_client.force_login(user=user1)
+        body = archive + gzip.compress(b'\n{"content": ""}\nnot json\n')
+        url = reverse('notes:notes-import') + '?compress=gzip&key=backup'
+        response = api_client.post(url, data=body, content_type='application/gzip')
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == {
+            'key': 'backup',
+            'lines': 6,
+            'imported': 3,
+            'skipped': 2,
+            'finished': True,
+            'errors': [
+                {'line': 5, 'errors': {'content': ['This field may not be blank.']}},
+                {'line': 6, 'errors': ['Invalid JSON: Expecting value: line 1 column 1 (char 0)']},
+            ],
+        }
+        assert list(Note.objects.filter(user=user1).values_list('content', flat=True)) == contents
+        assert NoteChange.objects.filter(user=user1).count() == 3
+
+        # The import is done: posted again, nothing is imported twice.
+        response = api_client.post(url, data=body, content_type='application/gzip')
+        assert response.data['imported'] == 3
+        assert Note.objects.filter(user=user1).count() == 3
+        response = api_client.get(reverse('notes:notes-import'), {'key': 'backup'})
+        assert response.data['lines'] == 6
+
+        response = api_client.post(url, data=b'not gzip', content_type='application/gzip')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_export_and_import_notes_commands(self, admin_user: User, tmp_path) -> None:
+        """Test the commands export the notes and resume an interrupted import."""
+        for index in range(5):
+            Note.objects.create(user=admin_user, content='note {0}'.format(index))
+        user1 = User.objects.create(username='user1')
+        path = str(tmp_path / 'notes.ndjson.gz')
+
+        stderr = io.StringIO()
+        call_command('export_notes', 'admin', path, '--chunk-size', '2', stderr=stderr)
+        assert 'Exported 4/5 notes' in stderr.getvalue()
+        with gzip.open(path) as export:
+            assert len(export.readlines()) == 5
+
+        # An import interrupted after its first batch of 2 lines.
+        key = 'interrupted'
+        NoteImport.objects.create(user=user1, key=key, lines=2, imported=2)
+        stdout = io.StringIO()
+        call_command('import_notes', 'user1', path, '--key', key, '--batch-size', '2', stdout=stdout, stderr=stderr)
+        assert 'Resuming the import interrupted after line 2' in stderr.getvalue()
+        assert 'Imported 5 notes, skipped 0' in stdout.getvalue()
+        assert list(Note.objects.filter(user=user1).values_list('content', flat=True)) == [
+            'note 2', 'note 3', 'note 4',
+        ]
+
+    def test_import_notes_without_returned_ids(self, admin_user: User, monkeypatch: Any) -> None:
+        """Test an import inserts each batch at once when the database does not return the ids, as MySQL."""
+        monkeypatch.setattr(type(connection.features), 'can_return_rows_from_bulk_insert', False)
+        counts = []
+        for key, size in (('small', 10), ('large', 40)):
+            lines = [json.dumps({'content': '{key} {index}'.format(key=key, index=index)}) for index in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                note_import = transfer.import_notes(admin_user, lines, key, batch_size=10)
+            assert note_import.imported == size
+            inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "notes_note"')]
+            assert len(inserts) == size // 10
+            counts.append(len(queries) / (size // 10))
+        # The queries grow with the batches, not with their notes.
+        assert counts[1] <= counts[0]
+        assert sorted(Note.objects.filter(content__startswith='large').values_list('content', flat=True)) == sorted(
+            'large {index}'.format(index=index) for index in range(40)
+        )
+        note_ids = Note.objects.filter(user=admin_user).values_list('id', flat=True)
+        assert NoteChange.objects.filter(note_id__in=list(note_ids)).count() == 50
+
+    def test_compressed_content(self, api_client: APIClient, admin_user: User, settings) -> None:
+        """Test the large contents are stored compressed and served decompressed."""
+        settings.NOTES_CONTENT_CODEC = 'zlib'
+        settings.NOTES_CONTENT_COMPRESSION_MIN_SIZE = 100
+        api_client.force_login(user=admin_user)
+        content = ', '.join(['meeting minutes'] * 50)
+        api_client.post(reverse('notes:notes-notes'), data={'content': content}, format='json')
+        note = Note.objects.create(user=admin_user, content='\x01short')
+
+        stored = dict(Note.objects.annotate(stored=Cast('content', TextField())).values_list('id', 'stored'))
+        note = Note.objects.get(id=note.id)
+        long_note = Note.objects.exclude(id=note.id).get()
+        assert stored[long_note.id].startswith('\x01z')
+        assert len(stored[long_note.id]) < len(content)
+        assert stored[note.id] == '\x01-\x01short'
+        # Decompressed on the first use.
+        assert isinstance(long_note.content, Promise)
+        assert long_note.content == content
+        assert note.content == '\x01short'
+
+        response = api_client.get(reverse('notes:notes-notes'))
+        assert [note['content'] for note in response.data] == [content, '\x01short']
+        response = api_client.get(reverse('notes:notes-notes'), {'stream': 1})
+        assert json.loads(b''.join(response.streaming_content))[0]['content'] == content
+        response = api_client.get(reverse('notes:notes-search', kwargs={'query': 'minutes'}))
+        assert [note['id'] for note in response.data] == [long_note.id]
+
+    def test_compress_notes(self, admin_user: User, settings) -> None:
+        """Test the command compress and decompress the stored contents."""
+        settings.NOTES_CONTENT_COMPRESSION_MIN_SIZE = 100
+        contents = ['short', 'large note ' * 50, 'another large note ' * 50]
+        for content in contents:
+            Note.objects.create(user=admin_user, content=content)
+        notes = Note.objects.annotate(stored=Cast('content', TextField()))
+
+        settings.NOTES_CONTENT_CODEC = 'zlib'
+        stdout = io.StringIO()
+        call_command('compress_notes', '--batch-size', '2', stdout=stdout)
+        assert 'Rewrote 2 notes' in stdout.getvalue()
+        assert [note.stored.startswith('\x01z') for note in notes.all()] == [False, True, True]
+        assert [note.content for note in notes.all()] == contents
+
+        settings.NOTES_CONTENT_CODEC = ''
+        call_command('compress_notes', stdout=io.StringIO())
+        assert [note.stored for note in notes.all()] == contents
+
+    def test_convert_note_copies(self, admin_user: User) -> None:
+        """Test the command turn the copies of shared notes into write shares, with their shares."""
+        user1 = User.objects.create(username='user1')
+        user2 = User.objects.create(username='user2')
+        original = Note.objects.create(user=admin_user, content='shared content')
+        own_duplicate = Note.objects.create(user=admin_user, content='shared content')
+        copy = Note.objects.create(user=user1, content='shared content')
+        kept = Note.objects.create(user=user1, content='own content')
+        NoteShare.objects.create(note=copy, recipient=user2)
+        # Two users wrote the same short note.
+        todo = Note.objects.create(user=admin_user, content='TODO')
+        other_todo = Note.objects.create(user=user1, content='TODO')
+        excluded = Note.objects.create(user=user2, content='own content')
+
+        with pytest.raises(CommandError):
+            call_command('convert_note_copies', '--dry-run')
+        stdout = io.StringIO()
+        call_command('convert_note_copies', '--min-length', '5', '--dry-run', stdout=stdout)
+        assert 'Note {copy} of the user {user} is a copy of the note {original}'.format(
+            copy=copy.id, user=user1.id, original=original.id,
+        ) in stdout.getvalue()
+        assert 'Would convert 2 copies into shares' in stdout.getvalue()
+        assert Note.objects.count() == 7
+
+        call_command('convert_note_copies', '--min-length', '5', '--exclude', str(excluded.id), stdout=io.StringIO())
+        assert set(Note.objects.values_list('id', flat=True)) == {
+            original.id, own_duplicate.id, kept.id, todo.id, other_todo.id, excluded.id,
+        }
+        assert set(NoteShare.objects.values_list('note_id', 'recipient_id', 'permission')) == {
+            (original.id, user1.id, NoteShare.Permission.WRITE),
+            (original.id, user2.id, NoteShare.Permission.READ),
+        }
+        assert set(NoteChange.objects.filter(user=user1).values_list('note_id', 'deleted')) == {
+            (original.id, False), (copy.id, True),
+        }
+        assert set(NoteChange.objects.filter(user=user2).values_list('note_id', 'deleted')) == {
+            (original.id, False), (copy.id, True),
+        }
+
+    def test_sync_notes(self, api_client: APIClient, admin_user: User) -> None:
+        """Test the api sync sends only the changes since a version."""
+        api_client.force_login(user=admin_user)
+        owner = User.objects.create(username='owner')
+        url = reverse('notes:notes-sync')
+        for content in ['test1', 'test2', 'test3']:
+            api_client.post(reverse('notes:notes-notes'), data={'content': content}, format='json')
+        note1, note2, note3 = Note.objects.filter(user=admin_user)
+
+        response = api_client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        assert [note['id'] for note in response.data['notes']] == [note1.id, note2.id, note3.id]
+        assert response.data['deleted'] == []
+        version = response.data['version']
+
+        response = api_client.get(url, {'since': version})
+        assert response.data == {'version': version, 'notes': [], 'deleted': []}
+
+        shared = Note.objects.create(user=owner, content='shared')
+        api_client.force_login(user=owner)
+        api_client.post(
+            reverse('notes:notes-share', kwargs={'id': shared.id}),
+            data={'username': admin_user.username},
+            format='json',
+        )
+        api_client.force_login(user=admin_user)
+        api_client.put(
+            reverse('notes:notes-note', kwargs={'id': note1.id}),
+            data={'content': 'new_test1'},
+            format='json',
+        )
+        api_client.delete(reverse('notes:notes-note', kwargs={'id': note2.id}))
+
+        changes = api_client.get(url, {'since': version})
+        assert changes.data['notes'] == [
+            {'id': note1.id, 'content': 'new_test1'},
+            {'id': shared.id, 'content': 'shared'},
+        ]
+        assert changes.data['deleted'] == [note2.id]
+
+        response = api_client.get(url, {'since': version, 'page_size': 2})
+        assert len(response.data['notes']) + len(response.data['deleted']) == 2
+        assert 'rel="next"' in response['Link']
+        response = api_client.get(url, {'since': response.data['version']})
+        assert response.data['version'] == changes.data['version']
+        assert response.data['deleted'] == [note2.id]
+
+        response = api_client.get(url, {'since': 'invalid'})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.usefixtures('async_views')
+class TestAsyncNoteApiView:  # integration tests
+    """Test the apis served by the async views"""
+
+    def request(self, user: User, method: str, path: str, **kwargs: Any) -> Any:
+        """Send a request to the ASGI handler, authenticated by token."""
+        token, _ = Token.objects.get_or_create(user=user)
+        # The async client of Django 4.1 sends the extra arguments as headers.
+        kwargs['authorization'] = 'Token {key}'.format(key=token.key)
+
+        async def send() -> Any:
+            return await getattr(AsyncClient(), method)(path, **kwargs)
+
+        return async_to_sync(send)()
+
+    def test_resolve_async_views(self) -> None:
+        """Ensure the api urls resolve to the async views."""
+        assert resolve('/api/notes/').func.view_class is AsyncNotesApiView
+        assert resolve('/api/notes/123').func.view_class is AsyncNotesApiView
+
+    def test_create_list_and_get_notes(self, admin_user: User) -> None:
+        """Test the async apis create, list and get notes."""
+        response = self.request(
+            admin_user, 'post', reverse('notes:notes-notes'),
+            data={'content': 'test1'}, content_type='application/json',
+        )
+        assert response.status_code == HTTPStatus.OK
+
+        note = Note.objects.get(user=admin_user)
+        response = self.request(admin_user, 'get', reverse('notes:notes-notes'))
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == [{'id': note.id, 'content': 'test1'}]
+
+        response = self.request(admin_user, 'get', reverse('notes:notes-note', kwargs={'id': note.id}))
+        assert response.json() == {'id': note.id, 'content': 'test1'}
+
+        response = self.request(
+            admin_user, 'get', reverse('notes:notes-note', kwargs={'id': note.id}),
+            **{'if-none-match': response['ETag']},
+        )
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+        response = self.request(admin_user, 'get', reverse('notes:notes-notes'), data={'stream': 1})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_update_share_search_and_delete_note(self, admin_user: User) -> None:
+        """Test the async apis update, share, search and delete a note."""
+        user1 = User.objects.create(username='user1')
+        note = Note.objects.create(user=admin_user, content='test1')
+        url = reverse('notes:notes-note', kwargs={'id': note.id})
+
+        response = self.request(
+            admin_user, 'put', url,
+            data={'content': 'new_test'}, content_type='application/json',
+        )
+        assert response.status_code == HTTPStatus.OK
+
+        response = self.request(
+            admin_user, 'post', reverse('notes:notes-share', kwargs={'id': note.id}),
+            data={'username': 'user1'}, content_type='application/json',
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert NoteShare.objects.get(recipient=user1).note == note
+
+        response = self.request(user1, 'get', reverse('notes:notes-search', kwargs={'query': 'new'}))
+        assert response.json() == [{'id': note.id, 'content': 'new_test'}]
+
+        response = self.request(user1, 'delete', url)
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        response = self.request(admin_user, 'delete', url)
+        assert response.status_code == HTTPStatus.OK
+        assert not Note.objects.exists()
+
+    def test_create_and_update_note_with_their_changes(self, admin_user: User, monkeypatch: Any) -> None:
+        """Test the async apis create or update no note when its change can not be recorded."""
+        def fail(*args: Any, **kwargs: Any) -> None:
+            raise DatabaseError('change log unavailable')
+
+        note = Note.objects.create(user=admin_user, content='test1')
+        monkeypatch.setattr(sync, 'record_changes', fail)
+        with pytest.raises(DatabaseError):
+            self.request(
+                admin_user, 'post', reverse('notes:notes-notes'),
+                data={'content': 'test2'}, content_type='application/json',
+            )
+        with pytest.raises(DatabaseError):
+            self.request(
+                admin_user, 'put', reverse('notes:notes-note', kwargs={'id': note.id}),
+                data={'content': 'new_test'}, content_type='application/json',
+            )
+        assert list(Note.objects.values_list('content', flat=True)) == ['test1']
+
+    def test_unauthenticated(self) -> None:
+        """Test the async apis reject anonymous requests."""
+        async def send() -> Any:
+            return await AsyncClient().get(reverse('notes:notes-notes'))
+
+        response = async_to_sync(send)()
+        assert response.status_code == HTTPStatus.FORBIDDEN
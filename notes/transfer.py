@@ -0,0 +1,277 @@
+"""
+Export and import of the notes of a user as NDJSON, one note per line.
+
+The export reads the notes by keyset queries of `NOTES_STREAM_CHUNK_SIZE`
+rows and the import writes them in batches of `NOTES_BATCH_MAX_SIZE`, so
+the memory used does not grow with the number of notes. Both can go
+through a gzip archive, or zstd with the `zstandard` package.
+
+Each batch of an import is committed with the number of lines read so
+far in its `NoteImport`: an interrupted import started again with the
+same key skips the lines of the committed batches.
+"""
+import collections
+import gzip
+import io
+import itertools
+import json
+import os
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from core import compression
+from notes import cache, sync, tasks
+from notes.models import Note, NoteImport
+from notes.pagination import iter_chunks
+from notes.serializers import NoteSerializer
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Errors of a file which is not valid for its encoding, or not UTF-8.
+READ_ERRORS: Tuple[type, ...] = (OSError, EOFError, UnicodeDecodeError)
+if zstandard is not None:
+    READ_ERRORS += (zstandard.ZstdError,)
+
+EXPORT_FIELDS = ['id', 'content', 'created_at', 'updated_at']
+
+# Media type and file suffix of the exports, by archive encoding.
+ARCHIVE_TYPES = {
+    '': ('application/x-ndjson', '.ndjson'),
+    'gzip': ('application/gzip', '.ndjson.gz'),
+    'zstd': ('application/zstd', '.ndjson.zst'),
+}
+SUFFIX_ENCODINGS = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+class TransferError(ValueError):
+    """The file of an import can not be read."""
+
+
+class ReadStream(io.RawIOBase):
+    """Binary file over an object with only a `read()` method, e.g. a request body."""
+
+    def __init__(self, stream: Any) -> None:
+        self.stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def available_encodings() -> List[str]:
+    """Get the archive encodings whose package is installed."""
+    return ['gzip', 'zstd'] if zstandard is not None else ['gzip']
+
+
+def create_notes(notes: List[Note]) -> None:
+    """
+    Insert notes in one transaction and enqueue their indexing.
+
+    Args:
+        notes: the unsaved notes, their ids are set on return
+    """
+    with transaction.atomic():
+        if notes and not connection.features.can_return_rows_from_bulk_insert:
+            insert_notes_locked(notes)
+        else:
+            Note.objects.bulk_create(notes, batch_size=settings.NOTES_BATCH_MAX_SIZE)
+        # bulk_create does not send post_save.
+        tasks.reindex_notes([note.id for note in notes])
+
+
+def insert_notes_locked(notes: List[Note]) -> None:
+    """
+    Insert notes with a bulk insert which does not return their ids, e.g. on MySQL, and set their ids.
+
+    The owners are locked, as by `sync.record_changes()` and the note
+    creation of the api, so their notes after the greatest id before the
+    insert are the inserted notes, in the order of their ids.
+
+    Args:
+        notes: the unsaved notes, in the order of the insertion
+
+    Raises:
+        IntegrityError: If a note of the owners was inserted without their lock.
+    """
+    owners = {note.user_id for note in notes}
+    sync.lock_users(owners)
+    owned = Note.objects.filter(user_id__in=owners)
+    last_id = owned.aggregate(last_id=Max('id'))['last_id'] or 0
+    Note.objects.bulk_create(notes, batch_size=settings.NOTES_BATCH_MAX_SIZE)
+    ids = list(owned.filter(id__gt=last_id).order_by('id').values_list('id', flat=True))
+    if len(ids) != len(notes):
+        raise IntegrityError('Notes of the owners were inserted without their lock.')
+    for note, note_id in zip(notes, ids):
+        note.id = note_id
+
+
+def export_notes(
+    user: User,
+    encoding: str = '',
+    chunk_size: Optional[int] = None,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Iterator[bytes]:
+    """
+    Export the notes owned by a user.
+
+    Args:
+        user: the user
+        encoding: archive encoding of `available_encodings()`, empty for plain NDJSON
+        chunk_size: the number of notes per query
+        progress: function called after each chunk with the number of notes exported so far
+
+    Returns:
+        the NDJSON lines of the notes chunk by chunk, compressed with the encoding
+    """
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    notes = Note.objects.filter(user=user).values(*EXPORT_FIELDS)
+
+    def encode_chunks() -> Iterator[bytes]:
+        exported = 0
+        for chunk in iter_chunks(notes, chunk_size or settings.NOTES_STREAM_CHUNK_SIZE):
+            yield b''.join(encoder.encode(note).encode('utf-8') + b'\n' for note in chunk)
+            exported += len(chunk)
+            if progress is not None:
+                progress(exported)
+
+    if not encoding:
+        return encode_chunks()
+    return compression.available_codecs()[encoding]().compress_stream(encode_chunks())
+
+
+def get_path_encoding(path: str) -> str:
+    """Get the archive encoding of a file from its suffix, `.gz` or `.zst`."""
+    return SUFFIX_ENCODINGS.get(os.path.splitext(path)[1], '')
+
+
+def open_lines(stream: BinaryIO, encoding: str = '') -> Iterator[str]:
+    """
+    Read the lines of an export, decompressed as they are read.
+
+    Args:
+        stream: binary file of the export, or an object with a `read()` method
+        encoding: archive encoding of `available_encodings()`, empty for plain NDJSON
+
+    Raises:
+        TransferError: If the file is not valid for its encoding, or not UTF-8.
+
+    Yields:
+        the lines of the file
+    """
+    if not isinstance(stream, io.IOBase):
+        stream = io.BufferedReader(ReadStream(stream))
+    if encoding == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    elif encoding == 'zstd':
+        stream = zstandard.ZstdDecompressor().stream_reader(stream)
+    try:
+        yield from io.TextIOWrapper(stream, encoding='utf-8')
+    except READ_ERRORS as error:
+        raise TransferError('The file can not be read: {error}'.format(error=error)) from error
+
+
+def parse_batch(user: User, batch: List[Tuple[int, str]]) -> Tuple[List[Note], List[Tuple[int, object]]]:
+    """
+    Build the notes of a batch of lines.
+
+    Only the `content` of a line is imported, the notes get new ids and
+    timestamps. The blank lines are ignored.
+
+    Args:
+        user: the owner of the notes
+        batch: the line numbers and the lines
+
+    Returns:
+        the unsaved notes of the valid lines, and the line number and the errors of the others
+    """
+    items = []
+    errors: List[Tuple[int, object]] = []
+    for number, line in batch:
+        if not line.strip():
+            continue
+        try:
+            items.append((number, json.loads(line)))
+        except ValueError as error:
+            errors.append((number, ['Invalid JSON: {error}'.format(error=error)]))
+
+    # One list serializer builds the fields once for the whole batch.
+    serializer = NoteSerializer(data=[item for _, item in items], many=True)
+    if serializer.is_valid():
+        return [Note(user=user, content=data['content']) for data in serializer.validated_data], errors
+    notes = []
+    for (number, item), item_errors in zip(items, serializer.errors):
+        if item_errors:
+            errors.append((number, item_errors))
+        else:
+            notes.append(Note(user=user, content=serializer.child.run_validation(item)['content']))
+    errors.sort(key=lambda error: error[0])
+    return notes, errors
+
+
+def import_notes(
+    user: User,
+    lines: Iterable[str],
+    key: str,
+    batch_size: Optional[int] = None,
+    progress: Optional[Callable[[NoteImport, List[Tuple[int, object]]], None]] = None,
+) -> NoteImport:
+    """
+    Import the notes of an export for a user, resuming an interrupted import of the same key.
+
+    Args:
+        user: the owner of the imported notes
+        lines: the lines of the export, see `open_lines()`
+        key: the key of the import, e.g. the path of its file
+        batch_size: the number of lines per transaction
+        progress: function called after each committed batch with the import
+            and the errors of the skipped lines of the batch
+
+    Raises:
+        TransferError: If the file can not be read, the previous batches stay
+            imported, or if the same import runs concurrently.
+
+    Returns:
+        the finished import, with its counters
+    """
+    batch_size = batch_size or settings.NOTES_BATCH_MAX_SIZE
+    note_import, _ = NoteImport.objects.get_or_create(user=user, key=key)
+    numbered = enumerate(lines, start=1)
+    # The lines of the committed batches are read again, not imported.
+    collections.deque(itertools.islice(numbered, note_import.lines), maxlen=0)
+    while True:
+        batch = list(itertools.islice(numbered, batch_size))
+        if not batch:
+            break
+        notes, errors = parse_batch(user, batch)
+        with transaction.atomic():
+            committed = NoteImport.objects.select_for_update().filter(id=note_import.id)
+            if list(committed.values_list('lines', flat=True)) != [note_import.lines]:
+                raise TransferError('The import {key} is run by another request.'.format(key=key))
+            create_notes(notes)
+            sync.record_changes([note.id for note in notes])
+            note_import.lines = batch[-1][0]
+            note_import.imported += len(notes)
+            note_import.skipped += len(errors)
+            note_import.save(update_fields=['lines', 'imported', 'skipped', 'updated_at'])
+        cache.invalidate(user.id)
+        if progress is not None:
+            progress(note_import, errors)
+
+    if note_import.finished_at is None:
+        note_import.finished_at = timezone.now()
+        note_import.save(update_fields=['finished_at', 'updated_at'])
+    return note_import
@@ -9,6 +9,26 @@ urlpatterns = [
         api_views.NotesApiView.as_view(),
         name='notes-notes',
     ),
+    path(
+        'notes/batch', 
+        api_views.NoteBatchApiView.as_view(),
+        name='notes-batch',
+    ),
+    path(
+        'notes/sync', 
+        api_views.NoteSyncApiView.as_view(),
+        name='notes-sync',
+    ),
+    path(
+        'notes/export', 
+        api_views.NoteExportApiView.as_view(),
+        name='notes-export',
+    ),
+    path(
+        'notes/import', 
+        api_views.NoteImportApiView.as_view(),
+        name='notes-import',
+    ),
     path(
         'notes/<int:id>', 
         api_views.NotesApiView.as_view(),
@@ -19,6 +39,11 @@ urlpatterns = [
         api_views.ShareNoteApiView.as_view(),
         name='notes-share',
     ),
+    path(
+        'notes/cache/stats', 
+        api_views.NoteCacheStatsApiView.as_view(),
+        name='notes-cache-stats',
+    ),
     path(
         'search/<str:query>', 
         api_views.SearchNoteApiView.as_view(),
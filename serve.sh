@@ -0,0 +1,8 @@
+#!/bin/bash
+# Start the server of SERVER_MODE: `runserver` (default, development) or `production` (gunicorn.conf.py).
+
+if [ "$SERVER_MODE" = "production" ]
+then
+    exec gunicorn --config gunicorn.conf.py
+fi
+exec python manage.py runserver 0.0.0.0:8888
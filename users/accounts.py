@@ -0,0 +1,120 @@
+"""
+Creation of the user accounts, with their token.
+
+The unique indexes of `auth_user` check the usernames and the emails:
+a conflict is reported from the `IntegrityError` of the insert, without
+a query before it. The emails are unique whatever their case.
+"""
+from typing import Iterable, Optional
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import CharField, Func, QuerySet, Value
+from django.db.models.functions import Lower
+
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+
+UNIQUE_MESSAGES = {
+    'username': User._meta.get_field('username').error_messages['unique'],
+    'email': 'A user with that email already exists.',
+}
+
+
+def conflict_field(error: IntegrityError) -> Optional[str]:
+    """
+    Get the field of a unique conflict on `auth_user`.
+
+    SQLite names the column or the index in its message, MySQL the key:
+    `auth_user.username`, or `username` before MySQL 8.0.19.
+
+    Args:
+        error: the error of an insert
+
+    Returns:
+        `username` or `email`, None for another error
+    """
+    message = str(error)
+    for field in UNIQUE_MESSAGES:
+        patterns = ('auth_user.{0}', 'auth_user_{0}', "key '{0}'")
+        if any(pattern.format(field) in message for pattern in patterns):
+            return field
+    return None
+
+
+class EmailKey(Func):
+    """
+    The email of a user lowercased, NULL when empty: the expression of the unique index of the emails.
+
+    The empty string is written in the SQL, SQLite does not use an
+    expression index for an expression with a parameter.
+    """
+
+    template = "LOWER(NULLIF(%(expressions)s, ''))"
+    output_field = CharField()
+
+
+def filter_emails(users: QuerySet, emails: Iterable[str]) -> QuerySet:
+    """
+    Filter users by email, ignoring the case.
+
+    The lookup is the expression of the unique index of the emails, which
+    serves it.
+
+    Args:
+        users: the users
+        emails: the emails
+
+    Returns:
+        the users with one of the emails
+    """
+    return users.alias(email_key=EmailKey('email')).filter(
+        email_key__in=[Lower(Value(email)) for email in emails],
+    )
+
+
+def build_user(user_data: dict, password: str) -> User:
+    """
+    Build a user, not saved yet.
+
+    Args:
+        user_data: the validated data of `SignupSerializer`
+        password: the hashed password
+
+    Returns:
+        the user
+    """
+    return User(
+        username=user_data['username'],
+        password=password,
+        email=user_data['email'],
+        first_name=user_data.get('first_name', ''),
+        last_name=user_data.get('last_name', ''),
+    )
+
+
+def create_user(user_data: dict, password: str) -> User:
+    """
+    Insert a user and its token in one transaction.
+
+    Args:
+        user_data: the validated data of `SignupSerializer`
+        password: the hashed password
+
+    Raises:
+        ValidationError: If the username or the email is already used.
+
+    Returns:
+        the created user
+    """
+    user = build_user(user_data, password)
+    try:
+        with transaction.atomic():
+            user.save(force_insert=True)
+            Token.objects.create(user=user)
+    except IntegrityError as error:
+        field = conflict_field(error)
+        if field is None:
+            raise
+        raise serializers.ValidationError({field: [UNIQUE_MESSAGES[field]]}, code='unique')
+    return user
@@ -1,15 +1,17 @@
-from typing import Any
+from typing import Any, List, Optional
 
-from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.http import Http404
 
 from rest_framework import serializers
-from rest_framework.authtoken.models import Token
-from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAdminUser
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from users import accounts, hashers
+from users.authentication import token_cache
 from users.serializers import LoginSerializer, SignupSerializer
 
 
@@ -27,6 +29,9 @@ class SignupApiView(APIView):
         """
         Handle POST requests from `api/auth/signup`.
 
+        The user, with its hashed password, and its token are inserted in
+        one transaction. The unique indexes check the username and email.
+
         Args:
             request: HTTP request
             args: varied amount of non-keyword arguments
@@ -40,24 +45,8 @@ class SignupApiView(APIView):
         serializer.is_valid(raise_exception=True)
 
         user_data = serializer.validated_data
-        username = user_data['username']
-        password = user_data['password']
-    
-        if not 'first_name' in user_data:
-            user_data['first_name'] = ''
-        elif not 'last_name' in user_data:
-            user_data['last_name'] = ''
-       
-        user = User.objects.create(
-            username=username,
-            password=password,
-            email=user_data['email'],
-            first_name=user_data['first_name'],
-            last_name=user_data['last_name'],
-        )
-        user.set_password(password)
-        user.save()
-        Token.objects.create(user=user)
+        password = hashers.submit_make_password(user_data['password']).result()
+        accounts.create_user(user_data, password)
         return Response('Signup successfully')
 
 
@@ -68,43 +57,110 @@ class LoginApiView(APIView):
 
     def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
-        Handle GET requests from `api/auth/login`.
+        Handle POST requests from `api/auth/login`.
+
+        The user and its token are read in one query and the password is
+        checked on the worker pool of `users.hashers`. A password hashed
+        by an outdated hasher or cost is rehashed.
 
         Args:
-            request: Http request.
+            request: HTTP request
+            args: varied amount of non-keyword arguments
+            kwargs: varied amount of keyword arguments
 
         Raises:
-            ParseError: If the user or the token does not exist.
+            ValidationError: If neither a username nor an email is given,
+                the user or the token does not exist, or the password is
+                invalid.
+            Http404: If no user has the email.
 
         Returns:
-            Http response with the toke of the login user.
+            HTTP `Response` with the token of the login user
         """
         serializer = LoginSerializer(data=request.data)
         # Validate received data. Return a 400 response if the data was invalid.
         serializer.is_valid(raise_exception=True)
 
         user_data = serializer.validated_data['user']
-        password = user_data['password']
-
-        user = None
+        users = self.get_login_queryset(user_data)
+        user = self.get_login_user(user_data, list(users[:2]))
+        valid, rehashed = hashers.submit_verify_password(
+            user_data['password'],
+            user.password if user else None,
+        ).result()
+        self.check_login(user, valid)
+        if rehashed:
+            User.objects.filter(pk=user.pk).update(password=rehashed)
+        return Response({'token': user.auth_token.key})
+
+    @staticmethod
+    def get_login_queryset(user_data: dict) -> QuerySet:
+        """Get the user of a username or an email, with its token in the same query."""
+        users = User.objects.select_related('auth_token').only(
+            'id', 'password', 'is_active', 'auth_token__key', 'auth_token__user_id',
+        )
         if 'username' in user_data:
-            username = user_data['username']
-            user = authenticate(username=username, password=password)
-        elif 'email' in user_data:
-            email = user_data['email']
-            user = get_object_or_404(User, email=email)
-            if not user.check_password(password):
-                user = None
-        if not user:
+            return users.filter(username=user_data['username'])
+        if 'email' in user_data:
+            return accounts.filter_emails(users, [user_data['email']])
+        return users.none()
+
+    @staticmethod
+    def get_login_user(user_data: dict, users: List[User]) -> Optional[User]:
+        """
+        Get the user logging in from the rows of `get_login_queryset()`.
+
+        Args:
+            user_data: the validated username or email
+            users: at most two rows of `get_login_queryset()`
+
+        Raises:
+            Http404: If no user has the email.
+
+        Returns:
+            the user, None if no user has the username, several have the email
+            or neither was given
+        """
+        if not users and 'username' not in user_data and 'email' in user_data:
+            raise Http404('No User matches the given query.')
+        return users[0] if len(users) == 1 else None
+
+    @staticmethod
+    def check_login(user: Optional[User], valid: bool) -> None:
+        """
+        Check the password of an active user was valid, and the user has a token.
+
+        Args:
+            user: the user logging in, None if unknown
+            valid: whether the password was valid
+
+        Raises:
+            ValidationError: If the user or the token does not exist, the
+                user is inactive or the password is invalid.
+        """
+        if not user or not valid or not user.is_active:
             raise serializers.ValidationError(
                 'The user does not exist or the password is invalid.',
             )
-        try:
-            token = Token.objects.get(user=user)
-        except Token.DoesNotExist:
+        if not hasattr(user, 'auth_token'):
             raise serializers.ValidationError(
                 'The user does not have a token.',
             )
-        return Response({'token': token.key})
 
 
+class TokenCacheStatsApiView(APIView):
+    """Api view for the counters of the token authentication cache"""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Handle GET requests from `api/auth/token-cache/stats`.
+
+        Args:
+            request: Http request.
+
+        Returns:
+            Http response with the hits, misses and hit ratio of this process.
+        """
+        return Response(token_cache.snapshot())
@@ -0,0 +1,57 @@
+"""
+Async versions of the users api views, routed when `ASYNC_VIEWS` is set.
+
+Password hashing is CPU bound: it runs in a thread so it does not block
+the event loop, the worker pool of `users.hashers` for the logins.
+"""
+import asyncio
+from typing import Any
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from core.async_views import AsyncAPIView
+from users import accounts, hashers
+from users.api_views import LoginApiView, SignupApiView
+from users.serializers import LoginSerializer, SignupSerializer
+
+
+class AsyncSignupApiView(AsyncAPIView, SignupApiView):
+    """Async version of `SignupApiView`."""
+
+    async def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Handle POST requests from `api/auth/signup`."""
+        serializer = SignupSerializer(data=request.data)
+        # Validate received data. Return a 400 response if the data was invalid.
+        serializer.is_valid(raise_exception=True)
+
+        user_data = serializer.validated_data
+        password = await asyncio.wrap_future(hashers.submit_make_password(user_data['password']))
+        await sync_to_async(accounts.create_user)(user_data, password)
+        return Response('Signup successfully')
+
+
+class AsyncLoginApiView(AsyncAPIView, LoginApiView):
+    """Async version of `LoginApiView`."""
+
+    async def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Handle POST requests from `api/auth/login`."""
+        serializer = LoginSerializer(data=request.data)
+        # Validate received data. Return a 400 response if the data was invalid.
+        serializer.is_valid(raise_exception=True)
+
+        user_data = serializer.validated_data['user']
+        users = [user async for user in self.get_login_queryset(user_data)[:2]]
+        user = self.get_login_user(user_data, users)
+        valid, rehashed = await asyncio.wrap_future(hashers.submit_verify_password(
+            user_data['password'],
+            user.password if user else None,
+        ))
+        self.check_login(user, valid)
+        if rehashed:
+            await User.objects.filter(pk=user.pk).aupdate(password=rehashed)
+        return Response({'token': user.auth_token.key})
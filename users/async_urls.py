@@ -0,0 +1,16 @@
+"""App users urls, with the async views"""
+from django.urls import path
+
+from users import async_api_views
+from users.urls import urlpatterns as sync_urlpatterns
+
+async_views = {
+    'user-signup': async_api_views.AsyncSignupApiView,
+    'user-login': async_api_views.AsyncLoginApiView,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), async_views[pattern.name].as_view(), name=pattern.name)
+    if pattern.name in async_views else pattern
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,158 @@
+"""
+Token authentication without a query per request.
+
+`CachedTokenAuthentication` resolves the tokens through a bounded LRU
+cache in process, then optionally through a shared cache backend, before
+the database. The receivers of `users.signals` invalidate the entries of
+a deleted token and of a saved or deleted user, e.g. a deactivated one:
+in the process that made the change and in the shared cache. The other
+processes keep their entries until `AUTH_TOKEN_CACHE_TTL`.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import BaseCache, caches
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def _shared_key(key: str) -> str:
+    return 'auth:token:{key}'.format(key=key)
+
+
+def get_shared_cache() -> Optional[BaseCache]:
+    """Get the shared cache backend of the tokens, None when it is disabled."""
+    alias = settings.AUTH_TOKEN_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+class TokenCache:
+    """Thread safe LRU cache of the tokens with their user, whose entries expire."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[Token, float]]' = OrderedDict()
+        self._keys_by_user: Dict[int, Set[str]] = {}
+        self._counters = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key: str) -> Optional[Token]:
+        """
+        Get a token and its user, from this process then from the shared cache.
+
+        Args:
+            key: the key of the token
+
+        Returns:
+            the token, None when it is not cached
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+
+        shared_cache = get_shared_cache()
+        token = shared_cache.get(_shared_key(key)) if shared_cache is not None else None
+        with self._lock:
+            self._counters['shared_hits' if token is not None else 'misses'] += 1
+        if token is not None:
+            self.set(token, shared=False)
+        return token
+
+    def set(self, token: Token, shared: bool = True) -> None:
+        """
+        Cache a token with its user.
+
+        Args:
+            token: the token, with its user
+            shared: also store it in the shared cache
+        """
+        with self._lock:
+            self._remove(token.key)
+            self._entries[token.key] = (token, time.monotonic() + settings.AUTH_TOKEN_CACHE_TTL)
+            self._keys_by_user.setdefault(token.user_id, set()).add(token.key)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self._remove(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+        shared_cache = get_shared_cache()
+        if shared and shared_cache is not None:
+            shared_cache.set(_shared_key(token.key), token, settings.AUTH_TOKEN_CACHE_TTL)
+
+    def invalidate(self, keys: Set[str] = frozenset(), user_id: Optional[int] = None) -> None:
+        """
+        Remove tokens from this process and from the shared cache.
+
+        Args:
+            keys: the keys of the tokens
+            user_id: also remove the tokens of this user cached in this process
+        """
+        keys = set(keys)
+        with self._lock:
+            if user_id is not None:
+                keys |= self._keys_by_user.get(user_id, set())
+            for key in keys:
+                self._remove(key)
+            self._counters['invalidations'] += len(keys)
+        shared_cache = get_shared_cache()
+        if keys and shared_cache is not None:
+            shared_cache.delete_many([_shared_key(key) for key in keys])
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_keys = self._keys_by_user.get(entry[0].user_id)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[entry[0].user_id]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the counters and hit ratio.
+
+        Returns:
+            the hits in this process and in the shared cache, the misses,
+            evictions and invalidations, the hit ratio and the number of
+            cached tokens
+        """
+        with self._lock:
+            counters: Dict[str, Any] = dict(self._counters)
+            counters['size'] = len(self._entries)
+        total = counters['hits'] + counters['shared_hits'] + counters['misses']
+        counters['hit_ratio'] = (counters['hits'] + counters['shared_hits']) / total if total else 0.0
+        return counters
+
+    def clear(self) -> None:
+        """Remove all the tokens of this process and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """`TokenAuthentication` resolving the tokens through `token_cache`."""
+
+    def authenticate_credentials(self, key: str) -> Tuple[User, Token]:
+        token = token_cache.get(key)
+        if token is None:
+            # Raises AuthenticationFailed for an unknown token or an inactive user.
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(token)
+        # The cached user is shared by the requests: each one gets its copy.
+        return copy.copy(token.user), token
@@ -0,0 +1,79 @@
+"""
+Password hashing of the logins and signups, on a bounded pool of worker threads.
+
+Hashing a password is CPU bound and by design slow: under a login storm
+the request threads would all hash at once. The hashes run on at most
+`AUTH_HASHER_WORKERS` threads instead, the hashers of hashlib release
+the GIL while they run.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher with the cost of `PASSWORD_HASH_ITERATIONS`.
+
+    It keeps the algorithm name of Django's hasher: it verifies its
+    passwords, and those hashed with another number of iterations are
+    rehashed at the next login.
+    """
+
+    @property
+    def iterations(self) -> int:
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the worker pool of the password hashes, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.AUTH_HASHER_WORKERS,
+                thread_name_prefix='password-hasher',
+            )
+        return _executor
+
+
+def verify_password(password: str, encoded: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password against its hash, and rehash it when its hasher is outdated.
+
+    Without a hash, the password is hashed anyway so an unknown user takes
+    as long as a known one.
+
+    Args:
+        password: the raw password
+        encoded: the hash of the user, None for an unknown user
+
+    Returns:
+        whether the password is valid, and its new hash when it must be saved
+    """
+    if encoded is None:
+        hashers.make_password(password)
+        return False, None
+    rehashed: List[str] = []
+    valid = hashers.check_password(
+        password,
+        encoded,
+        setter=lambda raw_password: rehashed.append(hashers.make_password(raw_password)),
+    )
+    return valid, rehashed[0] if rehashed else None
+
+
+def submit_verify_password(password: str, encoded: Optional[str]) -> 'Future[Tuple[bool, Optional[str]]]':
+    """Run `verify_password()` on the worker pool."""
+    return get_executor().submit(verify_password, password, encoded)
+
+
+def submit_make_password(password: str) -> 'Future[str]':
+    """Run `make_password()` on the worker pool."""
+    return get_executor().submit(hashers.make_password, password)
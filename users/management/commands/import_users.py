@@ -0,0 +1,157 @@
+import csv
+import itertools
+import sys
+from typing import Any, Iterator, List, Set, Tuple
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import IntegrityError, transaction
+
+from rest_framework.authtoken.models import Token
+
+from users import accounts, hashers
+from users.serializers import SignupSerializer
+
+
+class Command(BaseCommand):
+    """Create user accounts in bulk, with their tokens."""
+
+    help = (
+        'Create the users of a CSV file with the columns username, email, password and '
+        'optionally first_name and last_name, and their tokens, in batched inserts. '
+        'The rows that are invalid or whose username or email is already used are skipped.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('path', help='The CSV file, `-` for the standard input.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users inserted per transaction.',
+        )
+        parser.add_argument(
+            '--hashed',
+            action='store_true',
+            help='The passwords are already hashed, e.g. exported from another Django project.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        self.seen_usernames: Set[str] = set()
+        self.seen_emails: Set[str] = set()
+        created = skipped = 0
+        with self.open_file(options['path']) as csv_file:
+            rows = enumerate(csv.DictReader(csv_file), start=2)
+            while True:
+                batch = list(itertools.islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                batch_created, batch_skipped = self.import_batch(batch, options['hashed'])
+                created += batch_created
+                skipped += batch_skipped
+
+        self.stdout.write(self.style.SUCCESS(
+            'Created {created} users, skipped {skipped}'.format(created=created, skipped=skipped),
+        ))
+
+    @staticmethod
+    def open_file(path: str) -> Any:
+        if path == '-':
+            return open(sys.stdin.fileno(), newline='', closefd=False)
+        try:
+            return open(path, newline='', encoding='utf-8')
+        except OSError as error:
+            raise CommandError(error)
+
+    def import_batch(self, batch: List[Tuple[int, dict]], hashed: bool) -> Tuple[int, int]:
+        """
+        Create the valid and new users of a batch of rows, with their tokens.
+
+        Args:
+            batch: the line numbers and the rows of the batch
+            hashed: whether the passwords are already hashed
+
+        Returns:
+            the numbers of created and skipped users
+        """
+        valid = list(self.validate(batch))
+        usernames = {data['username'] for _, data in valid}
+        emails = {data['email'] for _, data in valid if data['email']}
+        used_usernames = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # The emails are unique whatever their case.
+        used_emails = {
+            email.lower() for email in accounts.filter_emails(User.objects.all(), emails).values_list('email', flat=True)
+        }
+        new = []
+        for line, data in valid:
+            if data['username'] in used_usernames or (data['email'] and data['email'].lower() in used_emails):
+                self.skip(line, 'the username or the email is already used')
+            else:
+                new.append((line, data))
+
+        if hashed:
+            passwords = [data['password'] for _, data in new]
+        else:
+            # The hashes of the batch run on the worker pool.
+            futures = [hashers.submit_make_password(data['password']) for _, data in new]
+            passwords = [future.result() for future in futures]
+        users = [accounts.build_user(data, password) for (_, data), password in zip(new, passwords)]
+        try:
+            self.insert_users(users)
+        except IntegrityError:
+            # A user created meanwhile: the users of the batch are inserted one by one.
+            created = 0
+            for (line, data), password in zip(new, passwords):
+                try:
+                    self.insert_users([accounts.build_user(data, password)])
+                except IntegrityError as error:
+                    field = accounts.conflict_field(error)
+                    if field is None:
+                        raise
+                    self.skip(line, accounts.UNIQUE_MESSAGES[field])
+                else:
+                    created += 1
+            return created, len(batch) - created
+        return len(users), len(batch) - len(users)
+
+    @staticmethod
+    def insert_users(users: List[User]) -> None:
+        """
+        Insert users and their tokens in one transaction.
+
+        Args:
+            users: the unsaved users
+
+        Raises:
+            IntegrityError: If a username or an email is already used.
+        """
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            # MySQL does not return the ids of the inserted rows.
+            ids = User.objects.filter(
+                username__in=[user.username for user in users],
+            ).values_list('id', flat=True)
+            Token.objects.bulk_create(
+                [Token(key=Token.generate_key(), user_id=user_id) for user_id in ids],
+            )
+
+    def validate(self, batch: List[Tuple[int, dict]]) -> Iterator[Tuple[int, dict]]:
+        """Yield the line number and validated data of the valid rows, new in the file."""
+        for line, row in batch:
+            serializer = SignupSerializer(data={key: value for key, value in row.items() if value})
+            if not serializer.is_valid():
+                self.skip(line, dict(serializer.errors))
+                continue
+            data = serializer.validated_data
+            if data['username'] in self.seen_usernames or data['email'].lower() in self.seen_emails:
+                self.skip(line, 'duplicate of a previous row')
+                continue
+            self.seen_usernames.add(data['username'])
+            if data['email']:
+                self.seen_emails.add(data['email'].lower())
+            yield line, data
+
+    def skip(self, line: int, reason: Any) -> None:
+        self.stderr.write('Skipped line {line}: {reason}'.format(line=line, reason=reason))
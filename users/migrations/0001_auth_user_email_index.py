@@ -0,0 +1,26 @@
+# Generated by Django 4.1.3 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+EMAIL_INDEX = models.Index(fields=['email'], name='users_auth_user_email_idx')
+
+
+def add_email_index(apps, schema_editor):
+    """Index auth_user.email for the logins with an email."""
+    schema_editor.add_index(apps.get_model('auth', 'User'), EMAIL_INDEX)
+
+
+def remove_email_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        # auth_user belongs to django.contrib.auth: the index is only in the database.
+        migrations.RunPython(add_email_index, remove_email_index),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.1.3 on 2026-10-18 19:05
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+from users.accounts import EmailKey
+
+# Users without an email have an empty one: only the other emails are
+# unique, whatever their case, as the logins look them up.
+EMAIL_UNIQUE = models.UniqueConstraint(EmailKey('email'), name='users_auth_user_email_unique')
+
+# The index of 0001: the lookups by email use the unique index instead.
+EMAIL_INDEX = models.Index(fields=['email'], name='users_auth_user_email_idx')
+
+# Number of duplicated emails listed when the migration fails.
+MAX_REPORTED = 20
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """
+    Fail with the duplicated emails before creating the unique index.
+
+    The signup did not check the emails before this migration: the
+    duplicates are left to the operator, e.g. to merge the accounts or to
+    change their emails, since deleting users would delete their notes.
+    """
+    User = apps.get_model('auth', 'User')
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias)
+        .exclude(email='')
+        .values(email_key=Lower('email'))
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .order_by('email_key')
+        .values_list('email_key', flat=True)[:MAX_REPORTED + 1]
+    )
+    if duplicates:
+        raise RuntimeError(
+            'Several users have the emails {emails}{more} (ignoring the case): give each user its own email, '
+            'then migrate again.'.format(
+                emails=', '.join(duplicates[:MAX_REPORTED]),
+                more=' and more' if len(duplicates) > MAX_REPORTED else '',
+            ),
+        )
+
+
+def add_email_unique(apps, schema_editor):
+    """Make the non-empty emails of auth_user unique, the signup relies on it."""
+    schema_editor.add_constraint(apps.get_model('auth', 'User'), EMAIL_UNIQUE)
+
+
+def remove_email_unique(apps, schema_editor):
+    schema_editor.remove_constraint(apps.get_model('auth', 'User'), EMAIL_UNIQUE)
+
+
+def remove_email_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), EMAIL_INDEX)
+
+
+def add_email_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('auth', 'User'), EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_auth_user_email_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        # auth_user belongs to django.contrib.auth: the constraint is only in the database.
+        migrations.RunPython(add_email_unique, remove_email_unique),
+        migrations.RunPython(remove_email_index, add_email_index),
+    ]
@@ -1,22 +1,30 @@
 from rest_framework import serializers
 
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
 
+from core.metrics import TimedSerializerMixin
 
-class SignupSerializer(serializers.ModelSerializer):
-    """Api signup serializer."""
+
+class SignupSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Api signup serializer.
+
+    The username has no `UniqueValidator`: the unique indexes check it and
+    the email on insert, see `users.accounts.create_user()`.
+    """
 
     class Meta:
         model = User
         fields = ['id', 'username', 'password', 'email', 'first_name', 'last_name']
         extra_kwargs = {
-            'username': {'required': True},
+            'username': {'required': True, 'validators': [UnicodeUsernameValidator()]},
             'password': {'required': True},
             'email': {'required': True},
         }
 
 # Use custom serializer instead, because of creating non-unique user issue
-class LoginSerializer(serializers.Serializer):
+class LoginSerializer(TimedSerializerMixin, serializers.Serializer):
     """Api login serializer."""
 
     username = serializers.CharField(source='user.username', required=False)
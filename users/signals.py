@@ -0,0 +1,29 @@
+"""Signal receivers of the app users."""
+from typing import Any
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from users.authentication import get_shared_cache, token_cache
+
+
+@receiver(post_delete, sender=Token)
+def uncache_token(sender: type, instance: Token, **kwargs: Any) -> None:
+    """Remove a deleted token from the token cache."""
+    token_cache.invalidate({instance.key}, instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def uncache_user_tokens(sender: type, instance: User, **kwargs: Any) -> None:
+    """Remove the tokens of a saved user, e.g. deactivated, or of a deleted user."""
+    if kwargs.get('created'):
+        return
+    keys = set()
+    if get_shared_cache() is not None:
+        # The keys cached by the other processes are only known from the database.
+        keys = set(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
+    token_cache.invalidate(keys, instance.pk)
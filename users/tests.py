@@ -1,13 +1,23 @@
-import copy, pytest
+import copy, importlib, io, pytest
 
 from http import HTTPStatus
+from typing import Any
 
+from asgiref.sync import async_to_sync
+
+from django.apps import apps
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient
 from django.urls import resolve, reverse
 
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
+from users import accounts
+from users.authentication import token_cache
+
 user_data: dict = {
     'username': 'user1',
     'email': 'user1@test.com',
@@ -31,6 +41,12 @@ class TestUsersUrls:  # unit tests
         assert reverse('users:user-login') == path
         assert resolve(path).view_name == 'users:user-login'
 
+    def test_token_cache_stats(self) -> None:
+        """Ensure token cache stats url is defined."""
+        path = '/api/auth/token-cache/stats'
+        assert reverse('users:user-token-cache-stats') == path
+        assert resolve(path).view_name == 'users:user-token-cache-stats'
+
 @pytest.mark.django_db()
 class TestUsersApiView:  # integration tests
     """Test the apis for UsersApiView"""
@@ -67,6 +83,88 @@ class TestUsersApiView:  # integration tests
             "{'username': [ErrorDetail(string='This field is required.', code='required')]}",
         )
 
+    def test_user_signup_conflicts(
+        self,
+        api_client: APIClient,
+        django_assert_max_num_queries: Any,
+    ) -> None:
+        """Test the api user signup writes once and reports the used usernames and emails."""
+        with django_assert_max_num_queries(4):
+            # The user and its token, in a transaction: no query before the inserts.
+            response = api_client.post(reverse('users:user-signup'), data=user_data, format='json')
+        assert response.status_code == HTTPStatus.OK
+
+        response = api_client.post(
+            reverse('users:user-signup'),
+            data=dict(user_data, email='other@test.com'),
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.data == {'username': ['A user with that username already exists.']}
+
+        for email in (user_data['email'], user_data['email'].upper()):
+            response = api_client.post(
+                reverse('users:user-signup'),
+                data=dict(user_data, username='user2', email=email),
+                format='json',
+            )
+            assert response.status_code == HTTPStatus.BAD_REQUEST
+            assert response.data == {'email': ['A user with that email already exists.']}
+        assert not User.objects.filter(username='user2').exists()
+        assert Token.objects.count() == 1
+
+    def test_import_users(self, tmp_path: Any, settings: Any) -> None:
+        """Test the users of a CSV file are created with their tokens."""
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        User.objects.create(username='existing', email='existing@test.com')
+        path = tmp_path / 'users.csv'
+        path.write_text(
+            'username,email,password,first_name\n'
+            'user1,user1@test.com,111,first\n'
+            'user2,user2@test.com,222,\n'
+            'existing,new@test.com,333,\n'
+            'user3,User1@test.com,444,\n'
+            'user4,,555,\n'
+            'user5,user5@test.com,666,\n'
+            'user6,EXISTING@test.com,777,\n',
+        )
+        stdout = io.StringIO()
+        call_command('import_users', str(path), '--batch-size', '2', stdout=stdout, stderr=io.StringIO())
+
+        assert 'Created 3 users, skipped 4' in stdout.getvalue()
+        users = User.objects.filter(username__startswith='user').order_by('username')
+        assert [user.username for user in users] == ['user1', 'user2', 'user5']
+        assert users[0].first_name == 'first'
+        assert users[0].check_password('111')
+        assert Token.objects.filter(user__in=users).count() == 3
+
+    def test_import_users_created_meanwhile(self, tmp_path: Any, settings: Any, monkeypatch: Any) -> None:
+        """Test the other users of a batch are created when one of its users was created meanwhile."""
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        build_user = accounts.build_user
+
+        def build_created_user(user_data: dict, password: str) -> User:
+            # Another request creates user2 once the batch has been checked.
+            if user_data['username'] == 'user2' and not User.objects.filter(username='user2').exists():
+                User.objects.create(username='user2', email='other@test.com')
+            return build_user(user_data, password)
+
+        monkeypatch.setattr(accounts, 'build_user', build_created_user)
+        path = tmp_path / 'users.csv'
+        path.write_text(
+            'username,email,password\n'
+            'user1,user1@test.com,111\n'
+            'user2,user2@test.com,222\n'
+            'user3,user3@test.com,333\n',
+        )
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_users', str(path), stdout=stdout, stderr=stderr)
+
+        assert 'Created 2 users, skipped 1' in stdout.getvalue()
+        assert 'Skipped line 3: A user with that username already exists.' in stderr.getvalue()
+        assert User.objects.get(username='user2').email == 'other@test.com'
+        assert Token.objects.filter(user__username__in=['user1', 'user3']).count() == 2
+
     def test_user_login(self, api_client: APIClient) -> None:
         """Test the api user login."""
         user = User.objects.create(
@@ -133,4 +231,203 @@ class TestUsersApiView:  # integration tests
         assert response.status_code == HTTPStatus.BAD_REQUEST
         assert str(response.data) == '{0}'.format(
             "{'password': [ErrorDetail(string='This field is required.', code='required')]}",
-        )
\ No newline at end of file
+        )
+
+    def test_user_login_without_username_and_email(self, api_client: APIClient) -> None:
+        """Test the api user login failed without a username and an email."""
+        User.objects.create(username=user_data['username'], email='')
+
+        response = api_client.post(
+            reverse('users:user-login'),
+            data={'password': user_data['password']},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.data == ['The user does not exist or the password is invalid.']
+
+    def test_user_login_single_query(
+        self,
+        api_client: APIClient,
+        django_assert_num_queries: Any,
+    ) -> None:
+        """Test the api user login reads the user and its token in one query."""
+        user = User.objects.create(username=user_data['username'], email=user_data['email'])
+        user.set_password(user_data['password'])
+        user.save()
+        token = Token.objects.create(user=user)
+
+        for field, value in (
+            ('username', user_data['username']),
+            ('email', user_data['email']),
+            ('email', user_data['email'].upper()),
+        ):
+            with django_assert_num_queries(1):
+                response = api_client.post(
+                    reverse('users:user-login'),
+                    data={field: value, 'password': user_data['password']},
+                    format='json',
+                )
+            assert response.status_code == HTTPStatus.OK
+            assert response.data['token'] == token.key
+
+        user.is_active = False
+        user.save()
+        response = api_client.post(
+            reverse('users:user-login'),
+            data={'username': user_data['username'], 'password': user_data['password']},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+        response = api_client.post(
+            reverse('users:user-login'),
+            data={'email': 'unknown@test.com', 'password': user_data['password']},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_user_login_rehash(self, api_client: APIClient, settings: Any) -> None:
+        """Test the api user login rehashes a password hashed with another cost."""
+        settings.PASSWORD_HASH_ITERATIONS = 1000
+        user = User.objects.create(username=user_data['username'], email=user_data['email'])
+        user.set_password(user_data['password'])
+        user.save()
+        Token.objects.create(user=user)
+        assert user.password.startswith('pbkdf2_sha256$1000$')
+
+        settings.PASSWORD_HASH_ITERATIONS = 2000
+        response = api_client.post(
+            reverse('users:user-login'),
+            data={'username': user_data['username'], 'password': user_data['password']},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.OK
+        user.refresh_from_db()
+        assert user.password.startswith('pbkdf2_sha256$2000$')
+        assert user.check_password(user_data['password'])
+
+
+@pytest.mark.django_db()
+class TestCachedTokenAuthentication:  # integration tests
+    """Test the token authentication through the token cache"""
+
+    def get_notes(self, token: Token) -> Any:
+        """Send an authenticated request to the notes api."""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token {key}'.format(key=token.key))
+        return client.get(reverse('notes:notes-notes'))
+
+    def test_cached_token(
+        self,
+        api_client: APIClient,
+        admin_user: User,
+        django_assert_num_queries: Any,
+    ) -> None:
+        """Test the token is read from the database once, then from the cache."""
+        user = User.objects.create(username=user_data['username'])
+        token = Token.objects.create(user=user)
+        assert self.get_notes(token).status_code == HTTPStatus.OK
+
+        with django_assert_num_queries(1):
+            # The version of the notes for the cached page, no token query.
+            assert self.get_notes(token).status_code == HTTPStatus.OK
+
+        api_client.force_login(user=admin_user)
+        response = api_client.get(reverse('users:user-token-cache-stats'))
+        assert response.status_code == HTTPStatus.OK
+        assert response.data['hits'] == 1
+        assert response.data['misses'] == 1
+        assert response.data['hit_ratio'] == 0.5
+        assert response.data['size'] == 1
+
+    def test_invalidate_token(self) -> None:
+        """Test a deleted token or a deactivated user is not authenticated anymore."""
+        user = User.objects.create(username=user_data['username'])
+        token = Token.objects.create(user=user)
+        assert self.get_notes(token).status_code == HTTPStatus.OK
+
+        user.is_active = False
+        user.save()
+        assert self.get_notes(token).status_code == HTTPStatus.FORBIDDEN
+
+        user.is_active = True
+        user.save()
+        assert self.get_notes(token).status_code == HTTPStatus.OK
+        token.delete()
+        assert self.get_notes(token).status_code == HTTPStatus.FORBIDDEN
+
+    def test_shared_cache(self, settings: Any) -> None:
+        """Test a token cached by another process is read from the shared cache."""
+        settings.AUTH_TOKEN_CACHE_ALIAS = 'default'
+        user = User.objects.create(username=user_data['username'])
+        token = Token.objects.create(user=user)
+        assert self.get_notes(token).status_code == HTTPStatus.OK
+
+        # Another process only has the shared cache.
+        token_cache.clear()
+        assert self.get_notes(token).status_code == HTTPStatus.OK
+        assert token_cache.snapshot()['shared_hits'] == 1
+
+        token_cache.clear()
+        user.is_active = False
+        user.save()
+        assert self.get_notes(token).status_code == HTTPStatus.FORBIDDEN
+
+
+@pytest.mark.django_db()
+@pytest.mark.usefixtures('async_views')
+class TestAsyncUsersApiView:  # integration tests
+    """Test the apis served by the async users views"""
+
+    def post(self, path: str, data: dict) -> Any:
+        """Send a POST request to the ASGI handler."""
+        async def send() -> Any:
+            return await AsyncClient().post(path, data=data, content_type='application/json')
+
+        return async_to_sync(send)()
+
+    def test_user_signup_and_login(self) -> None:
+        """Test the async apis user signup and login."""
+        response = self.post(reverse('users:user-signup'), user_data)
+        assert response.status_code == HTTPStatus.OK
+
+        user = User.objects.get(username=user_data['username'])
+        token = Token.objects.get(user=user)
+        assert user.check_password(user_data['password'])
+
+        for field in ('username', 'email'):
+            response = self.post(reverse('users:user-login'), {
+                field: user_data[field],
+                'password': user_data['password'],
+            })
+            assert response.status_code == HTTPStatus.OK
+            assert response.json()['token'] == token.key
+
+        response = self.post(reverse('users:user-login'), {
+            'email': user_data['email'],
+            'password': 'wrong',
+        })
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.django_db(transaction=True)
+def test_unique_emails_migration() -> None:
+    """Test the unique emails migration fails on the emails of several users, whatever their case."""
+    migration = importlib.import_module('users.migrations.0002_auth_user_email_unique')
+    with connection.schema_editor() as schema_editor:
+        migration.remove_email_unique(apps, schema_editor)
+    try:
+        User.objects.create(username='user1', email='user1@test.com')
+        User.objects.create(username='user2', email='')
+        User.objects.create(username='user3', email='')
+        with connection.schema_editor() as schema_editor:
+            migration.check_duplicate_emails(apps, schema_editor)
+
+        User.objects.create(username='user4', email='User1@test.com')
+        with pytest.raises(RuntimeError, match='user1@test.com'):
+            with connection.schema_editor() as schema_editor:
+                migration.check_duplicate_emails(apps, schema_editor)
+    finally:
+        User.objects.all().delete()
+        with connection.schema_editor() as schema_editor:
+            migration.add_email_unique(apps, schema_editor)
@@ -14,4 +14,9 @@ urlpatterns = [
         api_views.LoginApiView.as_view(),
         name='user-login',
     ),
+    path(
+        'auth/token-cache/stats',
+        api_views.TokenCacheStatsApiView.as_view(),
+        name='user-token-cache-stats',
+    ),
 ]